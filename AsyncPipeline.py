@@ -0,0 +1,103 @@
+"""
+Asyncio pipeline for breadth first solves: expand -> hash & dedupe -> persist, connected by queues.
+
+Expansion and dedupe run on the event loop while persistence runs in a single worker thread, so CPU bound
+expansion keeps going while a batch is written to shelve or Postgres. The queues between the stages are
+bounded: when persistence falls behind, dedupe blocks on the persist queue, the children queue fills up
+and expansion pauses until the writer catches up (back-pressure).
+
+The persist function is only ever called from the worker thread, so it may use stores that are not thread
+safe (shelve) as long as nothing else touches them during the solve.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+async def runPipeline(roots, expand, key, record, persist, queueSize=1024, persistBatchSize=256, executor=None):
+    """
+    :param roots: Initial nodes
+    :param expand: node -> list of children, CPU bound, runs on the event loop
+    :param key: node -> hashable key, nodes with a key seen before are dropped
+    :param record: node -> what is handed to persist
+    :param persist: list of records -> None, blocking, runs in the executor
+    :param queueSize: Capacity of the children and persist queues, in parent nodes
+    :param persistBatchSize: Number of records gathered before a persist call, when that many are waiting
+    :param executor: Executor for persist, a single thread by default
+    :return: Number of unique nodes
+    """
+    loop = asyncio.get_running_loop()
+    frontier = asyncio.Queue()
+    children = asyncio.Queue(queueSize)
+    records = asyncio.Queue(queueSize)
+    visited = set()
+
+    ownExecutor = executor is None
+    if ownExecutor:
+        executor = ThreadPoolExecutor(1)
+
+    async def expandStage():
+        expanded = 0
+        while True:
+            node = await frontier.get()
+            await children.put(expand(node))
+            expanded += 1
+            # put only yields on a full queue, let the persist stage hand its next batch to the executor
+            if expanded % 64 == 0:
+                await asyncio.sleep(0)
+
+    async def dedupeStage():
+        while True:
+            batch = await children.get()
+            newRecords = []
+            for child in batch:
+                childKey = key(child)
+                if childKey in visited:
+                    continue
+                visited.add(childKey)
+                newRecords.append(record(child))
+                frontier.put_nowait(child)
+            if newRecords:
+                await records.put(newRecords)
+            children.task_done()
+            # the parent is done once its children went through dedupe
+            frontier.task_done()
+
+    async def persistStage():
+        while True:
+            batches = [await records.get()]
+            size = len(batches[0])
+            while size < persistBatchSize and not records.empty():
+                batches.append(records.get_nowait())
+                size += len(batches[-1])
+            await loop.run_in_executor(executor, persist, [entry for batch in batches for entry in batch])
+            for _ in batches:
+                records.task_done()
+
+    async def drained():
+        await frontier.join()
+        await records.join()
+
+    workers = [asyncio.create_task(stage()) for stage in (expandStage, dedupeStage, persistStage)]
+    drainTask = None
+    try:
+        for root in roots:
+            rootKey = key(root)
+            if rootKey not in visited:
+                visited.add(rootKey)
+                await records.put([record(root)])
+                frontier.put_nowait(root)
+
+        drainTask = asyncio.create_task(drained())
+        await asyncio.wait([drainTask, *workers], return_when=asyncio.FIRST_COMPLETED)
+        # a stage only finishes by raising
+        for worker in workers:
+            if worker.done():
+                worker.result()
+    finally:
+        tasks = workers if drainTask is None else [drainTask, *workers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if ownExecutor:
+            executor.shutdown()
+    return len(visited)
@@ -0,0 +1,222 @@
+"""
+Benchmark harness for the solvers and the TranspositionTable backends.
+
+Every (workload, backend) pair runs in a fresh process so peak RSS is not polluted by earlier runs.
+Results are written as JSON lines, one object per run:
+    workload, backend, wallTime, stores, probes, hits, storesPerSecond, probesPerSecond, hitRate,
+    entries, peakRssBytes, bytesOnDisk
+and, for State based workloads, bytesPerNode (see State.bytesPerNode), and for backends with an in-memory
+tier the LRUTable counters under cache. With --expected-states every table gets a BloomFilter prefilter
+and its counters are reported under prefilter.
+
+Solve workloads run Solver.solve or PawnRevolt.Game.solve on a fixed game and board size. Synthetic
+workloads store a fixed key set and then probe it with uniform ("random") or Zipf distributed ("skewed")
+key streams, half of the uniform probes being misses.
+
+    python Benchmark.py --backends memory shelve --workloads hexapawn-3x3 synthetic-skewed --output results.jsonl
+"""
+import glob
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from TranspositionTable import TranspositionTable
+
+
+class InstrumentedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable counting stores, probes (contains / retrieve) and hits, and the time spent in them
+    """
+
+    def __init__(self, persitanceOption="shelve", name="table.db", **options):
+        super().__init__(persitanceOption, name, **options)
+        self.stores = 0
+        self.probes = 0
+        self.hits = 0
+        self.storeTime = 0.0
+        self.probeTime = 0.0
+
+    def store(self, state_hash, *args):
+        start = time.perf_counter()
+        super().store(state_hash, *args)
+        self.storeTime += time.perf_counter() - start
+        self.stores += 1
+
+    def retrieve(self, state_hash):
+        start = time.perf_counter()
+        entry = super().retrieve(state_hash)
+        self.probeTime += time.perf_counter() - start
+        self.probes += 1
+        self.hits += entry is not None
+        return entry
+
+    def contains(self, state_hash):
+        start = time.perf_counter()
+        found = super().contains(state_hash)
+        self.probeTime += time.perf_counter() - start
+        self.probes += 1
+        self.hits += found
+        return found
+
+
+def _solveHexapawn(sizeI, sizeJ):
+    def run(transpositionTable):
+        import Solver
+        from State import bytesPerNode
+        from example.Hexapawn import HexapawnState
+        root = HexapawnState(sizeI, sizeJ)
+        Solver.solve(root, transpositionTable=transpositionTable)
+        return {'bytesPerNode': bytesPerNode(root)}
+
+    return run
+
+
+def _solvePawnRevolt(sizeI, sizeJ):
+    def run(transpositionTable):
+        from PawnRevolt import Game
+        Game(sizeI, sizeJ).solve(transpositionTable)
+
+    return run
+
+
+def _zipfSampler(rng, population, exponent=1.1):
+    cumulativeWeights = []
+    total = 0.0
+    for rank in range(1, len(population) + 1):
+        total += 1.0 / rank ** exponent
+        cumulativeWeights.append(total)
+    return lambda k: rng.choices(population, cum_weights=cumulativeWeights, k=k)
+
+
+def _synthetic(distribution, keyCount=50000, probeCount=200000, seed=12345):
+    def run(transpositionTable):
+        rng = random.Random(seed)
+        keys = [rng.getrandbits(64) for _ in range(keyCount)]
+        for key in keys:
+            transpositionTable.store(key, None, 0, False, None, True, None)
+
+        if distribution == 'random':
+            probes = [rng.choice(keys) if rng.random() < 0.5 else rng.getrandbits(64) for _ in range(probeCount)]
+        else:
+            probes = _zipfSampler(rng, keys)(probeCount)
+        for key in probes:
+            transpositionTable.contains(key)
+
+    return run
+
+
+workloads = {
+    'hexapawn-3x3': _solveHexapawn(3, 3),
+    'hexapawn-4x3': _solveHexapawn(4, 3),
+    'pawnrevolt-4x3': _solvePawnRevolt(4, 3),
+    'synthetic-random': _synthetic('random'),
+    'synthetic-skewed': _synthetic('skewed'),
+}
+
+
+def _bytesOnDisk(name):
+    return sum(os.path.getsize(path) for path in glob.glob(name + '*') if os.path.isfile(path))
+
+
+def runBenchmark(workload, backend, directory, expectedStates=None):
+    """
+    Run one workload against one backend in the current process
+    :return: dict of measurements
+    """
+    name = os.path.join(directory, f'{workload}-{backend}.db')
+    transpositionTable = InstrumentedTranspositionTable(backend, name, expectedStates=expectedStates)
+    start = time.perf_counter()
+    extra = workloads[workload](transpositionTable) or {}
+    wallTime = time.perf_counter() - start
+    entries = len(transpositionTable)
+    cacheStats = transpositionTable.cacheStats()
+    if cacheStats is not None:
+        extra['cache'] = cacheStats
+    prefilterStats = transpositionTable.prefilterStats()
+    if prefilterStats is not None:
+        extra['prefilter'] = prefilterStats
+    transpositionTable.close()
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peakRssBytes = peakRss if sys.platform == 'darwin' else peakRss * 1024
+
+    return {
+        'workload': workload,
+        'backend': backend,
+        'wallTime': wallTime,
+        'stores': transpositionTable.stores,
+        'probes': transpositionTable.probes,
+        'hits': transpositionTable.hits,
+        'storesPerSecond': transpositionTable.stores / transpositionTable.storeTime if transpositionTable.storeTime else None,
+        'probesPerSecond': transpositionTable.probes / transpositionTable.probeTime if transpositionTable.probeTime else None,
+        'hitRate': transpositionTable.hits / transpositionTable.probes if transpositionTable.probes else None,
+        'entries': entries,
+        'peakRssBytes': peakRssBytes,
+        'bytesOnDisk': _bytesOnDisk(name),
+        **extra,
+    }
+
+
+def _runInChild(arguments, connection):
+    # the result, or the exception, goes back through the pipe
+    try:
+        connection.send((True, runBenchmark(*arguments)))
+    except Exception as exception:
+        connection.send((False, exception))
+    finally:
+        connection.close()
+
+
+def runAll(workloadNames=None, backendNames=None, expectedStates=None):
+    """
+    Run every (workload, backend) pair, each in its own process
+    :return: list of result dicts
+    """
+    workloadNames = list(workloads) if workloadNames is None else workloadNames
+    backendNames = list(TranspositionTable.backends) if backendNames is None else backendNames
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        for workload in workloadNames:
+            for backend in backendNames:
+                # a plain process rather than a Pool worker: pool workers are daemonic and backends such as
+                # "shared" start processes of their own
+                receiving, sending = context.Pipe(duplex=False)
+                process = context.Process(target=_runInChild,
+                                          args=((workload, backend, directory, expectedStates), sending))
+                process.start()
+                sending.close()
+                try:
+                    succeeded, result = receiving.recv()
+                except EOFError:
+                    succeeded, result = False, None
+                process.join()
+                if not succeeded:
+                    raise result or RuntimeError(f"{workload} on {backend} exited with code {process.exitcode}")
+                results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark solvers and transposition table backends')
+    parser.add_argument('--workloads', nargs='*', choices=list(workloads), default=None)
+    parser.add_argument('--backends', nargs='*', choices=list(TranspositionTable.backends), default=None)
+    parser.add_argument('--expected-states', type=int, default=None, help='size of a BloomFilter prefilter')
+    parser.add_argument('--output', default=None, help='JSON lines file, stdout if omitted')
+    arguments = parser.parse_args()
+
+    output = open(arguments.output, 'w') if arguments.output else sys.stdout
+    for result in runAll(arguments.workloads, arguments.backends, arguments.expected_states):
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+    if output is not sys.stdout:
+        output.close()
@@ -0,0 +1,81 @@
+import math
+
+MASK64 = (1 << 64) - 1
+
+
+def _mix64(x):
+    # splitmix64 finalizer, spreads the bits of structured keys (e.g. small szudzik pairs) over the word
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class BloomFilter:
+    """
+    Approximate set of keys: a key that was added is always reported as present, a key that was not
+    is reported as present with probability about falsePositiveRate while at most expectedItems keys were added.
+
+    Counters (queries, negatives, falsePositives) let the owner measure the real false positive rate:
+    call recordFalsePositive() whenever the filter said "maybe" and the backing store said no.
+    """
+
+    def __init__(self, expectedItems, falsePositiveRate=0.01):
+        if expectedItems <= 0 or not 0 < falsePositiveRate < 1:
+            raise ValueError("expectedItems must be positive and falsePositiveRate in (0, 1)")
+        self.expectedItems = expectedItems
+        self.falsePositiveRate = falsePositiveRate
+        self.bitCount = max(8, math.ceil(-expectedItems * math.log(falsePositiveRate) / math.log(2) ** 2))
+        self.hashCount = max(1, round(self.bitCount / expectedItems * math.log(2)))
+        self.bits = bytearray((self.bitCount + 7) // 8)
+        self.items = 0
+
+        self.queries = 0
+        self.negatives = 0
+        self.falsePositives = 0
+
+    # double hashing: bit i of a key is h1 + i * h2
+    def _hashes(self, key):
+        mixed = _mix64(hash(key) & MASK64)
+        return mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+
+    def add(self, key):
+        h1, h2 = self._hashes(key)
+        bits = self.bits
+        bitCount = self.bitCount
+        for i in range(self.hashCount):
+            index = (h1 + i * h2) % bitCount
+            bits[index >> 3] |= 1 << (index & 7)
+        self.items += 1
+
+    def __contains__(self, key):
+        self.queries += 1
+        h1, h2 = self._hashes(key)
+        bits = self.bits
+        bitCount = self.bitCount
+        for i in range(self.hashCount):
+            index = (h1 + i * h2) % bitCount
+            if not bits[index >> 3] & (1 << (index & 7)):
+                self.negatives += 1
+                return False
+        return True
+
+    def recordFalsePositive(self):
+        self.falsePositives += 1
+
+    def measuredFalsePositiveRate(self):
+        # among queried keys that were not in the set, how many got through
+        absent = self.negatives + self.falsePositives
+        return self.falsePositives / absent if absent else None
+
+    def stats(self):
+        return {
+            'bitCount': self.bitCount,
+            'hashCount': self.hashCount,
+            'items': self.items,
+            'queries': self.queries,
+            'negatives': self.negatives,
+            'falsePositives': self.falsePositives,
+            'targetFalsePositiveRate': self.falsePositiveRate,
+            'measuredFalsePositiveRate': self.measuredFalsePositiveRate(),
+        }
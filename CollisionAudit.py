@@ -0,0 +1,103 @@
+"""
+Measure how often distinct positions share a transposition table key once the key is cut to a given width.
+
+A CompactTable keeps only a keyBits wide fragment of the key, so two positions with the same fragment silently
+share an entry. CollisionAudit is fed (key, packed position) pairs, e.g. by auditSolve, and for a sample of
+fragments keeps the full positions seen under them. A fragment holding more than one position is a collision.
+Sampling is by fragment, so every position of a sampled fragment is seen and the rate stays unbiased.
+"""
+from BloomFilter import _mix64, MASK64
+
+KEY_WIDTHS = (32, 64, 128)
+
+
+class CollisionAudit:
+    def __init__(self, keyWidths=KEY_WIDTHS, sampleRate=1.0):
+        """
+        :param keyWidths: Key widths in bits to audit
+        :param sampleRate: Fraction of the fragments whose positions are recorded
+        """
+        self.keyWidths = tuple(keyWidths)
+        self.sampleRate = sampleRate
+        self.threshold = int(sampleRate * (MASK64 + 1))
+        # width -> fragment -> set of packed positions
+        self.samples = {width: {} for width in self.keyWidths}
+        self.observed = 0
+
+    def _isSampled(self, fragment):
+        return self.sampleRate >= 1 or _mix64((fragment ^ (fragment >> 64)) & MASK64) < self.threshold
+
+    def observe(self, key, position):
+        """
+        :param key: Full key of the position, e.g. State.hash()
+        :param position: Anything identifying the position exactly, e.g. its packed bitboards
+        """
+        self.observed += 1
+        for width in self.keyWidths:
+            fragment = key & ((1 << width) - 1)
+            if self._isSampled(fragment):
+                self.samples[width].setdefault(fragment, set()).add(position)
+
+    def report(self):
+        """
+        :return: {width: {'positions', 'collidingPositions', 'collisionRate'}} over the sampled fragments,
+         collidingPositions counts the positions that share their fragment with another position
+        """
+        report = {}
+        for width in self.keyWidths:
+            positions = sum(len(group) for group in self.samples[width].values())
+            colliding = sum(len(group) for group in self.samples[width].values() if len(group) > 1)
+            report[width] = {
+                'positions': positions,
+                'collidingPositions': colliding,
+                'collisionRate': colliding / positions if positions else 0.0,
+            }
+        return report
+
+    # Narrowest audited width without any collision, None if every width collided
+    def smallestSafeWidth(self):
+        report = self.report()
+        for width in sorted(self.keyWidths):
+            if report[width]['collidingPositions'] == 0:
+                return width
+        return None
+
+
+def auditSolve(root, positionOf, keyWidths=KEY_WIDTHS, sampleRate=1.0):
+    """
+    Breadth first walk of every state reachable from root, deduplicated on the exact position rather than on the key
+    :param root: State
+    :param positionOf: state -> exact packed position (hashable), the side to move included
+    :return: CollisionAudit of all reached states
+    """
+    audit = CollisionAudit(keyWidths, sampleRate)
+    seen = {positionOf(root)}
+    queue = [root]
+    while queue:
+        state = queue.pop()
+        audit.observe(state.hash(), positionOf(state))
+        if state.isEnd():
+            continue
+        for child in state.getAllPossibleNextStates():
+            position = positionOf(child)
+            if position not in seen:
+                seen.add(position)
+                queue.append(child)
+    return audit
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    from example.Hexapawn import HexapawnState
+
+    parser = argparse.ArgumentParser(description="Key collision audit of Hexapawn zobrist keys")
+    parser.add_argument("sizeI", type=int)
+    parser.add_argument("sizeJ", type=int)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    parser.add_argument("--widths", type=int, nargs='+', default=[16, 24, *KEY_WIDTHS])
+    arguments = parser.parse_args()
+    audit = auditSolve(HexapawnState(arguments.sizeI, arguments.sizeJ),
+                       lambda state: (state.position, state.currentPlayer), arguments.widths, arguments.sample_rate)
+    print(json.dumps({'states': audit.observed, 'report': audit.report(), 'smallestSafeWidth': audit.smallestSafeWidth()}))
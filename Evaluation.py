@@ -0,0 +1,118 @@
+"""
+Static evaluation of BitboardManager positions for depth-limited search.
+
+Every evaluator here is linear in the pieces: the score is a sum of one weight per (bitboardId, square) holding a
+piece. Positive scores favour the first player, like State.value. Being linear, a score can be kept up to date by
+BitboardManager.attachEvaluator while pieces are set, deleted and moved, instead of being recomputed per node.
+
+Evaluators add up: MaterialEvaluator(...) + AdvancementEvaluator(...) is an evaluator.
+Batch evaluation goes through bitboardBatch and requires numpy.
+"""
+from abc import ABC, abstractmethod
+
+
+class Evaluator(ABC):
+    @abstractmethod
+    def weights(self, bitboardId, sizeI, sizeJ):
+        """
+        :return: List of sizeI * sizeJ weights, the score of a piece of bitboardId on each square
+        """
+        pass
+
+    # {bitboardId: weights} for every bitboard of bm
+    def squareTable(self, bm):
+        return {bitboardId: self.weights(bitboardId, bitboard.sizeI, bitboard.sizeJ)
+                for bitboardId, bitboard in bm.bitboardManager.items()}
+
+    def evaluate(self, bm):
+        score = 0
+        for bitboardId, weights in self.squareTable(bm).items():
+            for square in bm.getIndexOfSetBits(bm[bitboardId].data):
+                score += weights[square]
+        return score
+
+    def evaluateBatch(self, bm, positions):
+        """
+        :param bm: Manager the positions belong to (bitboard order and board size)
+        :param positions: Iterable of positions, see BitboardManager.getPosition
+        :return: numpy array of scores
+        """
+        import numpy as np
+        table = self.squareTable(bm)
+        weights = np.array([table[bitboardId] for bitboardId in bm.bitboardManager], dtype=np.float64)
+        planes = bm.translateBatchToPlanes(positions)
+        return np.einsum('nps,ps->n', planes.reshape(planes.shape[0], planes.shape[1], -1), weights)
+
+    def __add__(self, other):
+        return CombinedEvaluator([self, other])
+
+
+class MaterialEvaluator(Evaluator):
+    def __init__(self, pieceValues):
+        """
+        :param pieceValues: {bitboardId: value of one piece}, negative for the second player's pieces
+        """
+        self.pieceValues = pieceValues
+
+    def weights(self, bitboardId, sizeI, sizeJ):
+        return [self.pieceValues.get(bitboardId, 0)] * (sizeI * sizeJ)
+
+    # material only needs the popcount of each bitboard
+    def evaluate(self, bm):
+        return sum(value * bin(bm[bitboardId].data).count('1') for bitboardId, value in self.pieceValues.items()
+                   if bitboardId in bm.bitboardManager)
+
+    def evaluateBatch(self, bm, positions):
+        import numpy as np
+        from bitboardBatch import positionsToWords, popcount
+        counts = popcount(positionsToWords(positions, bm.sizeI, bm.sizeJ))
+        values = np.array([self.pieceValues.get(bitboardId, 0) for bitboardId in bm.bitboardManager], dtype=np.float64)
+        return counts @ values
+
+
+class PieceSquareEvaluator(Evaluator):
+    def __init__(self, tables):
+        """
+        :param tables: {bitboardId: sizeI rows of sizeJ weights}, negative for the second player's pieces
+        """
+        self.tables = tables
+
+    def weights(self, bitboardId, sizeI, sizeJ):
+        if bitboardId not in self.tables:
+            return [0] * (sizeI * sizeJ)
+        return [weight for row in self.tables[bitboardId] for weight in row]
+
+
+class AdvancementEvaluator(Evaluator):
+    def __init__(self, pieceDirections, pieceValues):
+        """
+        :param pieceDirections: {bitboardId: -1 if the piece moves towards row 0, 1 if towards the last row}
+        :param pieceValues: {bitboardId: value of one row of progress}, negative for the second player's pieces
+        """
+        self.pieceDirections = pieceDirections
+        self.pieceValues = pieceValues
+
+    def weights(self, bitboardId, sizeI, sizeJ):
+        if bitboardId not in self.pieceDirections:
+            return [0] * (sizeI * sizeJ)
+        value = self.pieceValues[bitboardId]
+        rows = range(sizeI - 1, -1, -1) if self.pieceDirections[bitboardId] < 0 else range(sizeI)
+        return [value * advancement for advancement in rows for _ in range(sizeJ)]
+
+
+class CombinedEvaluator(Evaluator):
+    def __init__(self, evaluators):
+        self.evaluators = list(evaluators)
+
+    def weights(self, bitboardId, sizeI, sizeJ):
+        tables = [evaluator.weights(bitboardId, sizeI, sizeJ) for evaluator in self.evaluators]
+        return [sum(weights) for weights in zip(*tables)]
+
+    def __add__(self, other):
+        return CombinedEvaluator(self.evaluators + [other])
+
+
+# Pawn games ('1' moves towards row 0, '2' towards the last row), e.g. PawnRevolt and Hexapawn
+def pawnGameEvaluator(materialWeight=1.0, advancementWeight=0.1):
+    return MaterialEvaluator({'1': materialWeight, '2': -materialWeight}) \
+        + AdvancementEvaluator({'1': -1, '2': 1}, {'1': advancementWeight, '2': -advancementWeight})
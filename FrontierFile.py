@@ -0,0 +1,244 @@
+"""
+Compressed file of a sorted set of packed keys, for frontiers too large for memory (see Solver.solveIntegers and
+PawnRevolt.Game.solve).
+
+Layout:
+    header : magic b'BBFF', version, count (uint64), index offset (uint64), block count, block size (uint32 each)
+    blocks : each a varint of its first key then varints of the deltas to the previous key
+    index  : per block, varints of its length in bytes, its number of keys and its first key
+
+Varints are LEB128: 7 bits per byte, least significant first, high bit set on all bytes but the last. Keys of any
+size are supported, so 71-bit PawnRevolt keys need no special casing. Each block decodes on its own, the index
+locates the block of a key with one bisect, see FrontierFile.block and FrontierFile.findBlock.
+"""
+import heapq
+import os
+import struct
+import tempfile
+from bisect import bisect_right
+from itertools import accumulate
+
+MAGIC = b'BBFF'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQII')
+DEFAULT_BLOCK_SIZE = 4096
+
+
+def encodeVarint(value, out: bytearray):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decodeVarints(data):
+    """
+    :return: List of the values of consecutive varints
+    """
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        else:
+            values.append(value | byte << shift)
+            value = 0
+            shift = 0
+    return values
+
+
+class FrontierWriter:
+    """
+    Streaming writer, keys must be added in increasing order, repeated keys are written once
+    """
+
+    def __init__(self, path, blockSize=DEFAULT_BLOCK_SIZE):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, blockSize))
+        self.blockSize = blockSize
+        self.count = 0
+        self.index = bytearray()
+        self.blockCount = 0
+        self.block = bytearray()
+        self.blockKeys = 0
+        self.firstKey = None
+        self.previous = None
+
+    def add(self, key):
+        if self.previous is not None and key <= self.previous:
+            if key == self.previous:
+                return
+            raise ValueError(f"Keys must be sorted: {key} after {self.previous}")
+        if self.blockKeys == 0:
+            self.firstKey = key
+            encodeVarint(key, self.block)
+        else:
+            encodeVarint(key - self.previous, self.block)
+        self.previous = key
+        self.blockKeys += 1
+        self.count += 1
+        if self.blockKeys == self.blockSize:
+            self._flushBlock()
+
+    def addAll(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def _flushBlock(self):
+        if not self.blockKeys:
+            return
+        self.file.write(self.block)
+        encodeVarint(len(self.block), self.index)
+        encodeVarint(self.blockKeys, self.index)
+        encodeVarint(self.firstKey, self.index)
+        self.blockCount += 1
+        self.block = bytearray()
+        self.blockKeys = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self._flushBlock()
+        indexOffset = self.file.tell()
+        self.file.write(self.index)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.count, indexOffset, self.blockCount, self.blockSize))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def writeFrontier(path, keys, blockSize=DEFAULT_BLOCK_SIZE):
+    """
+    Write keys in any order, sorted and without repeats
+    :return: Number of keys written
+    """
+    with FrontierWriter(path, blockSize) as writer:
+        writer.addAll(sorted(keys))
+    return writer.count
+
+
+class FrontierFile:
+    """
+    Reader: iterating streams the keys in order one block at a time, block(n) decodes a single block
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        magic, version, self.count, indexOffset, self.blockCount, self.blockSize \
+            = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            self.file.close()
+            raise ValueError(f"{path} is not a frontier file")
+
+        self.file.seek(indexOffset)
+        index = decodeVarints(self.file.read())
+        self.blockLengths = index[0::3]
+        self.blockCounts = index[1::3]
+        self.firstKeys = index[2::3]
+        self.blockOffsets = [HEADER.size + offset for offset in accumulate([0] + self.blockLengths[:-1])]
+
+    def __len__(self):
+        return self.count
+
+    def block(self, blockIndex):
+        """
+        :return: Sorted list of the keys of block blockIndex
+        """
+        self.file.seek(self.blockOffsets[blockIndex])
+        return list(accumulate(decodeVarints(self.file.read(self.blockLengths[blockIndex]))))
+
+    def blocks(self):
+        for blockIndex in range(self.blockCount):
+            yield self.block(blockIndex)
+
+    def __iter__(self):
+        for keys in self.blocks():
+            yield from keys
+
+    def findBlock(self, key):
+        """
+        :return: Index of the only block that may hold key, None if key is below the first key
+        """
+        blockIndex = bisect_right(self.firstKeys, key) - 1
+        return blockIndex if blockIndex >= 0 else None
+
+    def __contains__(self, key):
+        blockIndex = self.findBlock(key)
+        if blockIndex is None:
+            return False
+        keys = self.block(blockIndex)
+        position = bisect_right(keys, key) - 1
+        return keys[position] == key
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrontierSpill:
+    """
+    Frontier kept in memory until threshold keys, then spilled to sorted frontier files (runs) in directory.
+    Iterating merges the runs with the keys in memory: every key once, in increasing order.
+    Call close to delete the runs.
+    """
+
+    def __init__(self, threshold, directory=None, blockSize=DEFAULT_BLOCK_SIZE):
+        self.threshold = threshold
+        self.directory = directory
+        self.blockSize = blockSize
+        self.pending = []
+        self.runs = []
+        self.spilledCount = 0
+
+    def append(self, key):
+        self.pending.append(key)
+        if len(self.pending) >= self.threshold:
+            self.spill()
+
+    def extend(self, keys):
+        for key in keys:
+            self.append(key)
+
+    def spill(self):
+        if not self.pending:
+            return
+        descriptor, path = tempfile.mkstemp(suffix='.frontier', dir=self.directory)
+        os.close(descriptor)
+        self.runs.append(path)
+        self.spilledCount += writeFrontier(path, self.pending, self.blockSize)
+        self.pending = []
+
+    # keys added, counted before merging repeats across runs
+    def __len__(self):
+        return self.spilledCount + len(self.pending)
+
+    def __iter__(self):
+        readers = [FrontierFile(path) for path in self.runs]
+        try:
+            previous = None
+            for key in heapq.merge(*readers, sorted(self.pending)):
+                if key != previous:
+                    yield key
+                    previous = key
+        finally:
+            for reader in readers:
+                reader.close()
+
+    def close(self):
+        for path in self.runs:
+            os.remove(path)
+        self.runs = []
+        self.pending = []
+        self.spilledCount = 0
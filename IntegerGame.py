@@ -0,0 +1,95 @@
+"""
+Game protocol on packed integer states, an alternative to State for solvers that should not allocate an object per node.
+
+A game is a set of pure functions of a key (the whole position in one int):
+
+    children(key)   -> list of child keys
+    terminal(key)   -> True if the game is over (including: side to move has no move)
+    value(key)      -> inf if the first player won, -inf if the second player won, 0 for a draw, None if not over
+    sideToMove(key) -> True if the first player is to move
+
+Keys are their own hash, frontiers and transposition tables hold plain ints. See Solver.solveIntegers and
+ParallelSolver.solveIntegerAlphaBeta.
+"""
+from abc import ABC, abstractmethod
+
+from PawnRules import PawnRules
+from PerfectIndex import WIN
+
+
+class IntegerGame(ABC):
+    @abstractmethod
+    def initialKey(self):
+        pass
+
+    @abstractmethod
+    def children(self, key):
+        pass
+
+    @abstractmethod
+    def terminal(self, key):
+        pass
+
+    @abstractmethod
+    def value(self, key):
+        pass
+
+    @abstractmethod
+    def sideToMove(self, key):
+        pass
+
+
+class PawnGame(IntegerGame):
+    """
+    Pawn game of PawnRules. Key layout: first player pawns in bits [0, N), second player pawns in [N, 2N) and
+    bit 2N set when the second player is to move, N being the number of squares.
+    """
+
+    def __init__(self, rules: PawnRules, initialRows=1):
+        self.rules = rules
+        self.initialRows = initialRows
+        self.squareCount = rules.squareCount
+        self.boardMask = (1 << self.squareCount) - 1
+        self.secondPlayerToMove = 1 << (2 * self.squareCount)
+
+    def pack(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        key = firstPlayerBoard | secondPlayerBoard << self.squareCount
+        return key if isFirstPlayerTurn else key | self.secondPlayerToMove
+
+    def unpack(self, key):
+        """
+        :return: (firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)
+        """
+        return key & self.boardMask, (key >> self.squareCount) & self.boardMask, not key & self.secondPlayerToMove
+
+    def initialKey(self):
+        return self.pack(*self.rules.initialPosition(self.initialRows), True)
+
+    def children(self, key):
+        first, second, isFirstPlayerTurn = self.unpack(key)
+        squareCount = self.squareCount
+        side = self.secondPlayerToMove if isFirstPlayerTurn else 0
+        return [childFirst | childSecond << squareCount | side
+                for childFirst, childSecond in self.rules.children(first, second, isFirstPlayerTurn)]
+
+    def terminal(self, key):
+        return self.rules.result(*self.unpack(key)) is not None
+
+    def value(self, key):
+        first, second, isFirstPlayerTurn = self.unpack(key)
+        result = self.rules.result(first, second, isFirstPlayerTurn)
+        if result is None:
+            return None
+        firstPlayerWins = (result == WIN) == isFirstPlayerTurn
+        return float('inf') if firstPlayerWins else float('-inf')
+
+    def sideToMove(self, key):
+        return not key & self.secondPlayerToMove
+
+
+def hexapawnGame(sizeI=3, sizeJ=3):
+    return PawnGame(PawnRules.hexapawn(sizeI, sizeJ), initialRows=1)
+
+
+def pawnRevoltGame(sizeI=7, sizeJ=5):
+    return PawnGame(PawnRules.pawnRevolt(sizeI, sizeJ), initialRows=2)
@@ -0,0 +1,103 @@
+"""
+k in a row detection on bitboards (square index i * sizeJ + j), for TicTacToe and other m,n,k games.
+
+For each of the four directions (row, column, diagonal, anti-diagonal) a square is one step away from the next one by
+a fixed shift: 1, sizeJ, sizeJ + 1 and sizeJ - 1. A shift-AND cascade builds, for every square, whether the run of
+length k starting there is full, with runs doubling in length (about log2(k) operations per direction). The result
+is then kept only on the squares a whole run fits from, so runs wrapping around the board edge never count.
+"""
+from functools import lru_cache
+
+# (offsetI, offsetJ) of the next square of a run
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class LineDetector:
+    """
+    Use LineDetector.get(sizeI, sizeJ, k) to reuse the instance of a board size and run length.
+    """
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get(cls, sizeI, sizeJ, k):
+        return cls(sizeI, sizeJ, k)
+
+    def __init__(self, sizeI, sizeJ, k):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.sizeI = sizeI
+        self.sizeJ = sizeJ
+        self.k = k
+        # per direction: (shift to the next square, squares a whole run starts from)
+        self.directions = []
+        for offsetI, offsetJ in DIRECTIONS:
+            startMask = 0
+            for i in range(sizeI):
+                for j in range(sizeJ):
+                    endI, endJ = i + offsetI * (k - 1), j + offsetJ * (k - 1)
+                    if 0 <= endI < sizeI and 0 <= endJ < sizeJ:
+                        startMask |= 1 << (i * sizeJ + j)
+            if startMask:
+                self.directions.append((offsetI * sizeJ + offsetJ, startMask))
+        # run lengths of the cascade, doubling up to the largest power of two not above k
+        self.cascade = []
+        length = 1
+        while length * 2 <= k:
+            self.cascade.append(length)
+            length *= 2
+        self.overlap = k - length
+
+    @property
+    def lineMasks(self):
+        """
+        :return: Mask of every run of k squares on the board, for callers that want the lines themselves
+        """
+        masks = []
+        for shift, startMask in self.directions:
+            while startMask:
+                start = startMask & -startMask
+                startMask ^= start
+                masks.append(sum(start << (t * shift) for t in range(self.k)))
+        # with k = 1 every direction gives the same single squares
+        return list(dict.fromkeys(masks))
+
+    def runStarts(self, bits):
+        """
+        :return: Squares holding the first square of a full run of k, in any direction
+        """
+        starts = 0
+        for shift, startMask in self.directions:
+            runs = bits
+            for length in self.cascade:
+                runs &= runs >> (length * shift)
+            if self.overlap:
+                runs &= runs >> (self.overlap * shift)
+            starts |= runs & startMask
+        return starts
+
+    def hasLine(self, bits):
+        """
+        :param bits: Bitboard data of one player
+        :return: True if bits holds k squares in a row, column or diagonal
+        """
+        return self.runStarts(bits) != 0
+
+    def hasLineBatch(self, boards):
+        """
+        hasLine over many bitboards at once, requires numpy
+        :param boards: Iterable of bitboard data (ints), or a (N, limbs) uint64 array from bitboardBatch.boardsToWords
+        :return: Bool array of shape (N,)
+        """
+        import numpy as np
+        from bitboardBatch import boardsToWords, shiftWords, isEmpty, _intToWords, limbCount
+        words = boards if isinstance(boards, np.ndarray) else boardsToWords(boards, self.sizeI, self.sizeJ)
+        limbs = limbCount(self.sizeI, self.sizeJ)
+        found = np.zeros(words.shape[0], dtype=bool)
+        for shift, startMask in self.directions:
+            runs = words
+            for length in self.cascade:
+                runs = runs & shiftWords(runs, -length * shift)
+            if self.overlap:
+                runs = runs & shiftWords(runs, -self.overlap * shift)
+            found |= ~isEmpty(runs & _intToWords(startMask, limbs))
+        return found
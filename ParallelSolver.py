@@ -0,0 +1,339 @@
+"""
+Depth-first alpha-beta solve of a State, serial or split at the root over a process pool.
+
+Scores are from the side to move: 1 win, 0 draw, -1 loss. Transposition table entries store the value from the
+first player's side (inf, -inf, 0 as State.value) plus a bound flag, so a table may be reused across searches.
+
+Parallel search is Young Brothers Wait at the root: the eldest child is searched serially to get a bound, then
+the younger brothers are searched in parallel with that bound. Workers keep a private table and share the
+entries of the shallow plies (up to sharePly) through a TranspositionTable("shared"), so bounds found by one
+worker cut the searches of the others. As soon as a child proves a win for the root, the other workers abort.
+"""
+import multiprocessing
+import time
+
+from State import State
+from TranspositionTable import TranspositionTable
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+WIN_SCORE = 1
+# how many nodes a worker searches between two checks of the abort flag
+ABORT_CHECK_INTERVAL = 1024
+
+
+class SearchAborted(Exception):
+    pass
+
+
+class SearchStats:
+    def __init__(self, rootAlpha=None):
+        self.nodes = 0
+        self.ttHits = 0
+        self.cutoffs = 0
+        # shared best root score of a parallel search, the search aborts once the root is a proven win
+        self.rootAlpha = rootAlpha
+
+    def visit(self):
+        self.nodes += 1
+        if self.rootAlpha is not None and self.nodes % ABORT_CHECK_INTERVAL == 0 and self.rootAlpha.value >= WIN_SCORE:
+            raise SearchAborted()
+
+    def merge(self, other):
+        self.nodes += other['nodes']
+        self.ttHits += other['ttHits']
+        self.cutoffs += other['cutoffs']
+
+    def asDict(self):
+        return {'nodes': self.nodes, 'ttHits': self.ttHits, 'cutoffs': self.cutoffs}
+
+
+def _toScore(value, isFirstPlayerTurn):
+    if value is None or value == 0:
+        return 0
+    firstPlayerWins = value == float('inf')
+    return WIN_SCORE if firstPlayerWins == isFirstPlayerTurn else -WIN_SCORE
+
+
+def _toValue(score, isFirstPlayerTurn):
+    if score == 0:
+        return 0
+    firstPlayerWins = (score > 0) == isFirstPlayerTurn
+    return float('inf') if firstPlayerWins else float('-inf')
+
+
+def _probe(state_hash, isFirstPlayerTurn, tables):
+    for table in tables:
+        entry = table.retrieve(state_hash)
+        # entries without a bound flag come from a breadth first solve and only hold the static value
+        if entry is not None and len(entry) > 6:
+            return _toScore(entry[0], isFirstPlayerTurn), entry[6]
+    return None
+
+
+def alphaBeta(state: State, alpha=-WIN_SCORE, beta=WIN_SCORE, transpositionTable=None, stats=None,
+              sharedTable=None, sharePly=0, ply=0):
+    """
+    :param state: Position to solve
+    :param alpha: Lower bound of the window, from the side to move
+    :param beta: Upper bound of the window, from the side to move
+    :param transpositionTable: Table for every ply, a memory table if None
+    :param stats: SearchStats to count nodes in
+    :param sharedTable: Table shared with other processes, only probed and written up to sharePly
+    :param sharePly: Deepest ply (from where the search started) that uses the shared table
+    :param ply: Distance from where the search started
+    :return: Score for the side to move, exact inside (alpha, beta), a bound otherwise
+    """
+    if transpositionTable is None:
+        transpositionTable = TranspositionTable("memory")
+    if stats is None:
+        stats = SearchStats()
+    stats.visit()
+
+    isFirstPlayerTurn = state.isFirstPlayerTurn()
+    if state.isEnd():
+        return _toScore(state.value(), isFirstPlayerTurn)
+    children = state.getAllPossibleNextStates()
+    if not children:
+        return _toScore(state.value(), isFirstPlayerTurn)
+
+    state_hash = state.hash()
+    tables = (transpositionTable, sharedTable) if sharedTable is not None and ply <= sharePly else (transpositionTable,)
+    probed = _probe(state_hash, isFirstPlayerTurn, tables)
+    if probed is not None:
+        score, bound = probed
+        if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+            stats.ttHits += 1
+            return score
+        if bound == LOWER:
+            alpha = max(alpha, score)
+        elif bound == UPPER:
+            beta = min(beta, score)
+
+    originalAlpha = alpha
+    best = -WIN_SCORE
+    for child in children:
+        child.parent_hash = state_hash
+        child.depth = state.depth + 1
+        score = -alphaBeta(child, -beta, -alpha, transpositionTable, stats, sharedTable, sharePly, ply + 1)
+        best = max(best, score)
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            stats.cutoffs += 1
+            break
+
+    # scores outside [-WIN_SCORE, WIN_SCORE] do not exist, so failing at a full window edge is still exact
+    if best <= originalAlpha and originalAlpha > -WIN_SCORE:
+        bound = UPPER
+    elif best >= beta and beta < WIN_SCORE:
+        bound = LOWER
+    else:
+        bound = EXACT
+    for table in tables:
+        table.store(state_hash, _toValue(best, isFirstPlayerTurn), state.depth, False, state.parent_hash,
+                    isFirstPlayerTurn, None, bound)
+    return best
+
+
+def solveAlphaBeta(root: State, transpositionTable=None):
+    """
+    :return: (value as State.value, SearchStats)
+    """
+    stats = SearchStats()
+    score = alphaBeta(root, transpositionTable=transpositionTable, stats=stats)
+    return _toValue(score, root.isFirstPlayerTurn()), stats
+
+
+def integerAlphaBeta(game, key, alpha=-WIN_SCORE, beta=WIN_SCORE, transpositionTable=None, stats=None, depth=0):
+    """
+    alphaBeta over an IntegerGame (see IntegerGame), keys are the table keys and no State is allocated
+    :return: Score for the side to move
+    """
+    if transpositionTable is None:
+        transpositionTable = TranspositionTable("memory")
+    if stats is None:
+        stats = SearchStats()
+    stats.visit()
+
+    isFirstPlayerTurn = game.sideToMove(key)
+    if game.terminal(key):
+        return _toScore(game.value(key), isFirstPlayerTurn)
+
+    probed = _probe(key, isFirstPlayerTurn, (transpositionTable,))
+    if probed is not None:
+        score, bound = probed
+        if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+            stats.ttHits += 1
+            return score
+        if bound == LOWER:
+            alpha = max(alpha, score)
+        elif bound == UPPER:
+            beta = min(beta, score)
+
+    originalAlpha = alpha
+    best = -WIN_SCORE
+    for child in game.children(key):
+        score = -integerAlphaBeta(game, child, -beta, -alpha, transpositionTable, stats, depth + 1)
+        best = max(best, score)
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            stats.cutoffs += 1
+            break
+
+    if best <= originalAlpha and originalAlpha > -WIN_SCORE:
+        bound = UPPER
+    elif best >= beta and beta < WIN_SCORE:
+        bound = LOWER
+    else:
+        bound = EXACT
+    transpositionTable.store(key, _toValue(best, isFirstPlayerTurn), depth, False, None, isFirstPlayerTurn, None, bound)
+    return best
+
+
+def solveIntegerAlphaBeta(game, key=None, transpositionTable=None):
+    """
+    :return: (value as State.value, SearchStats)
+    """
+    if key is None:
+        key = game.initialKey()
+    stats = SearchStats()
+    score = integerAlphaBeta(game, key, transpositionTable=transpositionTable, stats=stats)
+    return _toValue(score, game.sideToMove(key)), stats
+
+
+def depthLimitedAlphaBeta(state: State, depth, evaluate, alpha=float('-inf'), beta=float('inf')):
+    """
+    Alpha-beta that stops after depth plies, for boards too large to solve
+    :param evaluate: state -> static score from the first player's side, e.g. lambda s: evaluator.evaluate(s.bm)
+    :return: Score for the side to move, +-inf for proven results
+    """
+    sign = 1 if state.isFirstPlayerTurn() else -1
+    if state.isEnd():
+        value = state.value()
+        return 0 if value is None else sign * value
+    if depth == 0:
+        return sign * evaluate(state)
+    children = state.getAllPossibleNextStates()
+    if not children:
+        # scored by the state, e.g. a blocked player loses
+        value = state.value()
+        return 0 if value is None else sign * value
+
+    best = float('-inf')
+    for child in children:
+        score = -depthLimitedAlphaBeta(child, depth - 1, evaluate, -beta, -alpha)
+        best = max(best, score)
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+    return best
+
+
+_workerSharedTable = None
+_workerRootAlpha = None
+
+
+def _initWorker(sharedTable, rootAlpha):
+    global _workerSharedTable, _workerRootAlpha
+    _workerSharedTable = sharedTable
+    _workerRootAlpha = rootAlpha
+
+
+def _searchChild(arguments):
+    child, sharePly = arguments
+    stats = SearchStats(_workerRootAlpha)
+    # the window of a younger brother is narrowed by every brother finished before it started
+    rootAlpha = _workerRootAlpha.value
+    if rootAlpha >= WIN_SCORE:
+        return None, stats.asDict()
+    try:
+        score = alphaBeta(child, -WIN_SCORE, -rootAlpha, TranspositionTable("memory"), stats, _workerSharedTable,
+                          sharePly)
+    except SearchAborted:
+        score = None
+    return score, stats.asDict()
+
+
+def solveParallel(root: State, processes=None, sharePly=2, sharedTable=None):
+    """
+    :param root: Position to solve
+    :param processes: Size of the pool, os.cpu_count() by default
+    :param sharePly: Plies below the root children that exchange entries through the shared table
+    :param sharedTable: TranspositionTable("shared") to use, a new one if None
+    :return: (value as State.value, SearchStats summed over every process)
+    """
+    if sharedTable is None:
+        sharedTable = TranspositionTable("shared")
+    stats = SearchStats()
+    stats.visit()
+    isFirstPlayerTurn = root.isFirstPlayerTurn()
+    children = [] if root.isEnd() else root.getAllPossibleNextStates()
+    if not children:
+        return root.value(), stats
+
+    rootHash = root.hash()
+    for child in children:
+        child.parent_hash = rootHash
+        child.depth = root.depth + 1
+
+    # eldest brother first, serially, its result bounds the younger brothers
+    eldestScore = -alphaBeta(children[0], -WIN_SCORE, WIN_SCORE, TranspositionTable("memory"), stats, sharedTable,
+                             sharePly)
+    alpha = eldestScore
+    if alpha < WIN_SCORE and len(children) > 1:
+        context = multiprocessing.get_context('spawn')
+        rootAlpha = context.Value('b', alpha, lock=False)
+        tasks = [(child, sharePly) for child in children[1:]]
+        with context.Pool(processes, _initWorker, (sharedTable, rootAlpha)) as pool:
+            for score, childStats in pool.imap_unordered(_searchChild, tasks):
+                stats.merge(childStats)
+                if score is not None and -score > alpha:
+                    alpha = -score
+                    # a win for the root makes the workers still searching abort
+                    rootAlpha.value = alpha
+
+    sharedTable.store(rootHash, _toValue(alpha, isFirstPlayerTurn), root.depth, False, root.parent_hash,
+                      isFirstPlayerTurn, None, EXACT)
+    return _toValue(alpha, isFirstPlayerTurn), stats
+
+
+def compareWithSerial(root: State, processes=None, sharePly=2):
+    """
+    Solve root serially then in parallel, both from empty tables
+    :return: dict with both values, times, node counts, speedup and search overhead (extra nodes of the parallel run)
+    """
+    start = time.perf_counter()
+    serialValue, serialStats = solveAlphaBeta(root.copy())
+    serialTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallelValue, parallelStats = solveParallel(root.copy(), processes, sharePly)
+    parallelTime = time.perf_counter() - start
+
+    return {
+        'value': serialValue,
+        'parallelValue': parallelValue,
+        'processes': processes or multiprocessing.cpu_count(),
+        'serialTime': serialTime,
+        'parallelTime': parallelTime,
+        'speedup': serialTime / parallelTime,
+        'serialNodes': serialStats.nodes,
+        'parallelNodes': parallelStats.nodes,
+        'searchOverhead': parallelStats.nodes / serialStats.nodes - 1,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from example.Hexapawn import HexapawnState
+
+    parser = argparse.ArgumentParser(description="Compare serial and root split alpha-beta on Hexapawn")
+    parser.add_argument("sizeI", type=int)
+    parser.add_argument("sizeJ", type=int)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--share-ply", type=int, default=2)
+    arguments = parser.parse_args()
+    print(compareWithSerial(HexapawnState(arguments.sizeI, arguments.sizeJ), arguments.processes, arguments.share_ply))
@@ -1,5 +1,10 @@
+import asyncio
+import os
+import tempfile
 from typing import List
 
+from AsyncPipeline import runPipeline
+from TranspositionTable import TranspositionTable
 from bitboard import BitboardManager
 from pairing_functions import szudzik
 
@@ -17,11 +22,15 @@ class Game:
         self.parentPlayer1Board = None
         self.parentPlayer2Board = None
 
+    # move is (bitboardId, fromI, fromJ, toI, toJ) or an encoded move (see getAllEncodedMoves)
     def make_move(self, move):
         # move = tuple(map(lambda s: ("ABCDEFGHIJ".index(s[0]), int(s[1:])), move.split(" ")))
-        bitboardId, fromI, fromJ, toI, toJ = move
         opponent = '1' if self.current_player == '2' else '2'
-        self.bm.moveWithCapture(bitboardId, fromI, fromJ, toI, toJ, [opponent])
+        if isinstance(move, int):
+            self.bm.moveWithCaptureEncoded(move, [opponent])
+        else:
+            bitboardId, fromI, fromJ, toI, toJ = move
+            self.bm.moveWithCapture(bitboardId, fromI, fromJ, toI, toJ, [opponent])
         self.current_player = '1' if self.current_player == '2' else '2'
 
     def show(self):
@@ -69,11 +78,24 @@ class Game:
 
     def getAllPossibleMovesFor1(self):
         bluePawnMovements = {'1': [(-1, 0), (-1, 1), (-1, -1)]}
-        return self.bm.generateAllPossibleMoves('1', bluePawnMovements, self.pieceCoord)
+        return self._legalMoves('1', bluePawnMovements)
 
     def getAllPossibleMovesFor2(self):
         redPawnMovements = {'2': [(1, 0), (1, 1), (1, -1)]}
-        return self.bm.generateAllPossibleMoves('2', redPawnMovements, self.pieceCoord)
+        return self._legalMoves('2', redPawnMovements)
+
+    # returns key value: bitboardId:[moves], each move is (bitboardId, fromI, fromJ, toI, toJ) as make_move expects
+    def _legalMoves(self, bitboardId, pawnMovements):
+        self.pieceCoord[bitboardId] = self.bm.getCoordinatesOfPieces(bitboardId)
+        candidateMoves = self.bm.generateAllPossibleMoves(bitboardId, pawnMovements, self.pieceCoord)[bitboardId]
+        return {bitboardId: [(bitboardId, fromI, fromJ, toI, toJ) for (fromI, fromJ), (toI, toJ) in candidateMoves
+                             if self.bm.isLegalMove(fromI, fromJ, toI, toJ, bitboardId)]}
+
+    # Same moves as getAllPossibleMoves, as an array('H') of 16-bit codes (see BitboardManager.encodeMove)
+    def getAllEncodedMoves(self, isFirstPlayerTurn):
+        if isFirstPlayerTurn:
+            return self.bm.generateEncodedMoves('1', [(-1, 0), (-1, 1), (-1, -1)])
+        return self.bm.generateEncodedMoves('2', [(1, 0), (1, 1), (1, -1)])
 
     def getAllPossibleMoves(self, isFirstPlayerTurn):
         possibleMoves = self.getAllPossibleMovesFor1() if isFirstPlayerTurn else self.getAllPossibleMovesFor2()
@@ -84,7 +106,7 @@ class Game:
         return possibleMoves[0]
 
     def getAllNextStates(self, isFirstPlayerTurn):
-        possibleMoves = self.getAllPossibleMoves(isFirstPlayerTurn)
+        possibleMoves = self.getAllEncodedMoves(isFirstPlayerTurn)
         nextStates = []
         currentState = self.saveGameState()
         for move in possibleMoves:
@@ -113,28 +135,123 @@ class Game:
 
     def loadState(self, state):
         firstPlayerBitboard, secondPlayerBitboard, currentPlayer, isEnd, winner, parentPlayer1Board, parentPlayer2Board = state
-        self.bm.bitboardManager['1'].data = firstPlayerBitboard
-        self.bm.bitboardManager['2'].data = secondPlayerBitboard
+        # bitboards were built '1' then '2'
+        self.bm.setPosition((firstPlayerBitboard, secondPlayerBitboard))
         self.current_player = currentPlayer
         self.isEnd = isEnd
         self.winner = winner
         self.parentPlayer1Board = parentPlayer1Board
         self.parentPlayer2Board = parentPlayer2Board
 
-    def solveQueue(self, queue: List, buffer: List, transpositionTable: set):
+    # hash of the loaded game, or of a state tuple from saveGameState
+    def stateHash(self, state=None):
+        if state is None:
+            state = self.saveGameState()
+        return szudzik.pair(szudzik.pair(state[0], state[1]), int(state[2]))
+
+    def solveQueue(self, queue: List, buffer: List, transpositionTable: TranspositionTable):
         for state in queue:
-            game.loadState(state)
-            stateHash = szudzik.pair(self.bm.bitboardManager['1'].data, self.bm.bitboardManager['2'])
+            self.loadState(state)
+            stateHash = self.stateHash()
             # if hash is in table then we checked it
             # if hash is not in table, then we expand the children of the states and put into buffer
             # table will be persisted in db
 
-            if stateHash not in transpositionTable:
-                children = self.getAllNextStates(self.current_player == '1')
-                buffer.append(children)
-                transpositionTable.add(stateHash)
+            if not transpositionTable.contains(stateHash):
+                isFirstPlayerTurn = self.current_player == '1'
+                isEnd = self.is_over()
+                value = (float('inf') if self.winner == '1' else float('-inf')) if isEnd else None
+                transpositionTable.store(stateHash, value, None, isEnd, None, isFirstPlayerTurn, None)
+                if not isEnd:
+                    buffer.append(self.getAllNextStates(isFirstPlayerTurn))
         return buffer
 
+    # Row in the format of Util.saveState: (state_id, player1_board, player2_board, current_player, isEnd, winner, parent_id)
+    def stateRow(self, state):
+        firstPlayerBitboard, secondPlayerBitboard, currentPlayer, isEnd, winner, parentPlayer1Board, parentPlayer2Board = state
+        parentHash = None
+        if parentPlayer1Board is not None:
+            parentPlayer = '1' if currentPlayer == '2' else '2'
+            parentHash = self.stateHash((parentPlayer1Board, parentPlayer2Board, parentPlayer))
+        return self.stateHash(state), firstPlayerBitboard, secondPlayerBitboard, currentPlayer, isEnd, winner, parentHash
+
+    # Asyncio version of solve: expansion, dedupe and persistence run as pipeline stages (see AsyncPipeline)
+    # so expansion does not wait for the store. persist receives batches of stateRow tuples and runs in a
+    # worker thread, e.g. persist=lambda rows: [Util.saveState(row) for row in rows] for Postgres.
+    # By default rows are stored in transpositionTable.
+    def solveAsync(self, transpositionTable=None, persist=None, **pipelineOptions):
+        if persist is None:
+            if transpositionTable is None:
+                transpositionTable = TranspositionTable()
+
+            def persist(rows):
+                for stateHash, _, _, currentPlayer, isEnd, winner, parentHash in rows:
+                    value = (float('inf') if winner == '1' else float('-inf')) if isEnd else None
+                    transpositionTable.store(stateHash, value, None, isEnd, parentHash, currentPlayer == '1', None)
+
+        def expand(state):
+            self.loadState(state)
+            if self.is_over():
+                return []
+            return self.getAllNextStates(self.current_player == '1')
+
+        return asyncio.run(runPipeline([self.saveGameState()], expand, self.stateHash, self.stateRow, persist,
+                                       **pipelineOptions))
+
+    # Depth-limited alpha-beta over make/unmake on self.bm, score for the side to move. Leaves are scored by
+    # self.bm.evaluation, kept up to date incrementally by the evaluator attached to self.bm (see bestMove)
+    def negamax(self, depth, alpha=float('-inf'), beta=float('inf')):
+        player = self.current_player
+        if self.is_over():
+            return float('inf') if self.winner == player else float('-inf')
+        if depth <= 0:
+            return self.bm.evaluation if player == '1' else -self.bm.evaluation
+        moves = self.getAllEncodedMoves(player == '1')
+        if not moves:
+            return float('-inf')
+
+        opponent = '1' if player == '2' else '2'
+        best = float('-inf')
+        for move in moves:
+            captured = self.bm.makeMoveEncoded(move, [opponent])
+            self.current_player = opponent
+            score = -self.negamax(depth - 1, -beta, -alpha)
+            self.bm.unmakeMoveEncoded(move, captured)
+            self.current_player = player
+            best = max(best, score)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best
+
+    def bestMove(self, depth, evaluator=None):
+        """
+        :param depth: Number of plies to search
+        :param evaluator: Evaluation.Evaluator for the leaves, Evaluation.pawnGameEvaluator() by default
+        :return: (encoded move, score for the side to move)
+        """
+        if depth < 1:
+            raise ValueError(f"Depth must be at least 1, got {depth}")
+        from Evaluation import pawnGameEvaluator
+        self.bm.attachEvaluator(pawnGameEvaluator() if evaluator is None else evaluator)
+        winner = self.winner
+        player = self.current_player
+        opponent = '1' if player == '2' else '2'
+        bestMove, bestScore = None, float('-inf')
+        try:
+            for move in self.getAllEncodedMoves(player == '1'):
+                captured = self.bm.makeMoveEncoded(move, [opponent])
+                self.current_player = opponent
+                score = -self.negamax(depth - 1, float('-inf'), -bestScore)
+                self.bm.unmakeMoveEncoded(move, captured)
+                self.current_player = player
+                if bestMove is None or score > bestScore:
+                    bestMove, bestScore = move, score
+        finally:
+            self.winner = winner
+            self.bm.attachEvaluator(None)
+        return bestMove, bestScore
+
     # There are queue and buffer, the problem is due to bfs, the number of children processed is less than the number of children generated.
     # therefore we will run out of RAM. The each "round" some children in buffer will be transfered to queue. Then queue will be processed.
     # Children generated from solveQueue is added to buffer (the processed children is saved in table/DB).
@@ -142,14 +259,60 @@ class Game:
     # When buffer ran out, children from buffer table in DB is loaded out.
     # Repeat until buffer in RAM and in DB is empty which should indicate that the entire tree is searched.
     # Afterwards, we need to backpropagate the result (as well as the next best move) according to minmax algo to the root.
-    def solve(self):
-        isFirstPlayerTurn = True
-        children = self.getAllNextStates(isFirstPlayerTurn)
-
-        queue = []
-        for child in children:
-            self.loadState(child)
-            queue.append(self.getAllNextStates(not isFirstPlayerTurn))
+    # With spillThreshold, a queue growing past it is written to a compressed frontier file in spillDirectory (see
+    # FrontierFile), files are read back one block at a time once the queue in RAM is empty.
+    def solve(self, transpositionTable=None, processBatchSize=3000, spillThreshold=None, spillDirectory=None):
+        if transpositionTable is None:
+            transpositionTable = TranspositionTable()
+
+        queue = [self.saveGameState()]
+        # stack of [frontier file, next block to load]
+        spilled = []
+        try:
+            while len(queue) > 0 or spilled:
+                if len(queue) == 0:
+                    queue = self._loadSpilledBlock(spilled)
+                batch = self.loadFromQueue(queue, processBatchSize)
+                for children in self.solveQueue(batch, [], transpositionTable):
+                    queue.extend(children)
+                if spillThreshold is not None and len(queue) > spillThreshold:
+                    spilled.append([self._spill(queue, spillDirectory), 0])
+                    queue = []
+        finally:
+            for frontierFile, _ in spilled:
+                frontierFile.close()
+                os.remove(frontierFile.file.name)
+        return transpositionTable
+
+    # Packed key of a state: player '1' pawns in bits [0, N), player '2' pawns in [N, 2N), bit 2N set when '2' is to
+    # move, as IntegerGame.PawnGame. solveQueue only needs the boards and the side to move
+    def packState(self, state):
+        squareCount = self.sizeI * self.sizeJ
+        return state[0] | state[1] << squareCount | (1 << 2 * squareCount if state[2] == '2' else 0)
+
+    def unpackState(self, key):
+        squareCount = self.sizeI * self.sizeJ
+        boardMask = (1 << squareCount) - 1
+        currentPlayer = '2' if key >> 2 * squareCount else '1'
+        return key & boardMask, (key >> squareCount) & boardMask, currentPlayer, None, '', None, None
+
+    def _spill(self, queue, directory):
+        from FrontierFile import FrontierFile, writeFrontier
+        descriptor, path = tempfile.mkstemp(suffix='.frontier', dir=directory)
+        os.close(descriptor)
+        writeFrontier(path, map(self.packState, queue))
+        return FrontierFile(path)
+
+    def _loadSpilledBlock(self, spilled):
+        frontierFile, blockIndex = spilled[-1]
+        queue = [self.unpackState(key) for key in frontierFile.block(blockIndex)]
+        if blockIndex + 1 < frontierFile.blockCount:
+            spilled[-1][1] = blockIndex + 1
+        else:
+            spilled.pop()
+            frontierFile.close()
+            os.remove(frontierFile.file.name)
+        return queue
 
 
 # def solve(self):
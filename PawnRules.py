@@ -0,0 +1,161 @@
+"""
+Bitwise rules of pawn-only games (PawnRevolt, Hexapawn) on packed bitboards.
+
+The first player moves towards row 0 and wins by reaching it, the second player moves towards row sizeI - 1.
+Offsets are given for the first player and flipped for the second. A move offset goes to an empty square,
+a capture offset goes to a square holding an opponent pawn and removes it. An offset may be both
+(PawnRevolt) or only one of them (Hexapawn pawns move straight and capture diagonally).
+
+A side with no pawns loses, and so does a side to move without any legal move.
+"""
+from PerfectIndex import WIN, LOSS
+
+FIRST_PLAYER = 0
+SECOND_PLAYER = 1
+
+
+class PawnRules:
+    def __init__(self, sizeI, sizeJ, moveOffsets, captureOffsets):
+        self.sizeI = sizeI
+        self.sizeJ = sizeJ
+        self.squareCount = sizeI * sizeJ
+        self.moveOffsets = list(moveOffsets)
+        self.captureOffsets = list(captureOffsets)
+
+        rowMask = (1 << sizeJ) - 1
+        self.goalRowMask = (rowMask, rowMask << ((sizeI - 1) * sizeJ))
+
+        # per player, per square: destination squares, and the reverse tables used to un-move
+        self.moveTargets = (self._targets(self.moveOffsets), self._targets(self._flip(self.moveOffsets)))
+        self.captureTargets = (self._targets(self.captureOffsets), self._targets(self._flip(self.captureOffsets)))
+        self.moveSources = (self._sources(self.moveTargets[0]), self._sources(self.moveTargets[1]))
+        self.captureSources = (self._sources(self.captureTargets[0]), self._sources(self.captureTargets[1]))
+
+    @classmethod
+    def hexapawn(cls, sizeI=3, sizeJ=3):
+        return cls(sizeI, sizeJ, [(-1, 0)], [(-1, 1), (-1, -1)])
+
+    @classmethod
+    def pawnRevolt(cls, sizeI=7, sizeJ=5):
+        forward = [(-1, 0), (-1, 1), (-1, -1)]
+        return cls(sizeI, sizeJ, forward, forward)
+
+    @staticmethod
+    def _flip(offsets):
+        return [(-i, -j) for i, j in offsets]
+
+    def _targets(self, offsets):
+        targets = []
+        for square in range(self.squareCount):
+            i, j = divmod(square, self.sizeJ)
+            targets.append([(i + offsetI) * self.sizeJ + j + offsetJ for offsetI, offsetJ in offsets
+                            if 0 <= i + offsetI < self.sizeI and 0 <= j + offsetJ < self.sizeJ])
+        return targets
+
+    def _sources(self, targets):
+        sources = [[] for _ in range(self.squareCount)]
+        for square, squareTargets in enumerate(targets):
+            for target in squareTargets:
+                sources[target].append(square)
+        return sources
+
+    @staticmethod
+    def squares(bits):
+        while bits:
+            lowestBit = bits & -bits
+            yield lowestBit.bit_length() - 1
+            bits ^= lowestBit
+
+    # Initial position with the two back rows of each side filled, as in PawnRevolt, or one row for Hexapawn
+    def initialPosition(self, rows=1):
+        rowsMask = (1 << (self.sizeJ * rows)) - 1
+        return rowsMask << ((self.sizeI - rows) * self.sizeJ), rowsMask
+
+    def children(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        """
+        :return: List of (firstPlayerBoard, secondPlayerBoard) after each legal move of the side to move
+        """
+        player = FIRST_PLAYER if isFirstPlayerTurn else SECOND_PLAYER
+        own, other = (firstPlayerBoard, secondPlayerBoard) if isFirstPlayerTurn else (secondPlayerBoard, firstPlayerBoard)
+        occupied = own | other
+        moveTargets = self.moveTargets[player]
+        captureTargets = self.captureTargets[player]
+
+        children = []
+        for square in self.squares(own):
+            fromBit = 1 << square
+            for target in moveTargets[square]:
+                if not (occupied >> target) & 1:
+                    children.append((own ^ fromBit | (1 << target), other))
+            for target in captureTargets[square]:
+                if (other >> target) & 1:
+                    children.append((own ^ fromBit | (1 << target), other ^ (1 << target)))
+        if isFirstPlayerTurn:
+            return children
+        return [(first, second) for second, first in children]
+
+    def moveCount(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        player = FIRST_PLAYER if isFirstPlayerTurn else SECOND_PLAYER
+        own, other = (firstPlayerBoard, secondPlayerBoard) if isFirstPlayerTurn else (secondPlayerBoard, firstPlayerBoard)
+        occupied = own | other
+        moveTargets = self.moveTargets[player]
+        captureTargets = self.captureTargets[player]
+        count = 0
+        for square in self.squares(own):
+            for target in moveTargets[square]:
+                if not (occupied >> target) & 1:
+                    count += 1
+            for target in captureTargets[square]:
+                if (other >> target) & 1:
+                    count += 1
+        return count
+
+    def terminalResult(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        """
+        Result for the side to move if the game is over, None otherwise. Does not check for "no legal move".
+        """
+        own, other = (firstPlayerBoard, secondPlayerBoard) if isFirstPlayerTurn else (secondPlayerBoard, firstPlayerBoard)
+        ownGoal, otherGoal = self.goalRowMask if isFirstPlayerTurn else self.goalRowMask[::-1]
+        if other & otherGoal or own == 0:
+            return LOSS
+        if own & ownGoal or other == 0:
+            return WIN
+        return None
+
+    def result(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        """
+        Like terminalResult, but a side to move without legal moves loses
+        """
+        result = self.terminalResult(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)
+        if result is None and self.moveCount(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn) == 0:
+            return LOSS
+        return result
+
+    def predecessors(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        """
+        Un-move the player who just moved, including un-captures that put a pawn of the side to move back.
+        Predecessors that are already over are skipped, they have no moves.
+        :return: List of (firstPlayerBoard, secondPlayerBoard), the side to move being the other player
+        """
+        mover = SECOND_PLAYER if isFirstPlayerTurn else FIRST_PLAYER
+        moverBoard, victimBoard = (secondPlayerBoard, firstPlayerBoard) if isFirstPlayerTurn else (firstPlayerBoard, secondPlayerBoard)
+        occupied = moverBoard | victimBoard
+        moveSources = self.moveSources[mover]
+        captureSources = self.captureSources[mover]
+
+        predecessors = []
+        for target in self.squares(moverBoard):
+            targetBit = 1 << target
+            for source in moveSources[target]:
+                if not (occupied >> source) & 1:
+                    predecessors.append((moverBoard ^ targetBit | (1 << source), victimBoard))
+            for source in captureSources[target]:
+                if not (occupied >> source) & 1:
+                    predecessors.append((moverBoard ^ targetBit | (1 << source), victimBoard | targetBit))
+
+        result = []
+        for moverBefore, victimBefore in predecessors:
+            first, second = (victimBefore, moverBefore) if isFirstPlayerTurn else (moverBefore, victimBefore)
+            if self.terminalResult(first, second, not isFirstPlayerTurn) is None:
+                result.append((first, second))
+        return result
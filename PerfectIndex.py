@@ -0,0 +1,219 @@
+"""
+Perfect indexing of pawn-only positions and a 2-bit-per-position result database.
+
+A position of a pawn game (PawnRevolt, Hexapawn) is two disjoint sets of squares on an I x J board, one per
+player, plus the side to move. PawnPositionIndex maps every such position with at most maxFirstPlayerPieces
+and maxSecondPlayerPieces pawns to a dense integer in [0, size) and back, using combinatorial (colex) ranking:
+
+    index = offset(n1, n2) + (rank(first) * C(N - n1, n2) + rank(second)) * 2 + side
+
+where N = I * J, n1 / n2 are the pawn counts, rank(first) ranks the first player squares among the C(N, n1)
+subsets of the board and rank(second) ranks the second player squares among the squares left free.
+The index is the position, so a ResultDatabase only has to store 2 bits per index and no keys.
+"""
+import mmap
+import os
+import struct
+
+UNKNOWN = 0
+WIN = 1
+LOSS = 2
+DRAW = 3
+
+
+def _binomials(n):
+    table = [[0] * (n + 2) for _ in range(n + 1)]
+    for top in range(n + 1):
+        table[top][0] = 1
+        for bottom in range(1, top + 1):
+            table[top][bottom] = table[top - 1][bottom - 1] + table[top - 1][bottom]
+    return table
+
+
+class PawnPositionIndex:
+    def __init__(self, sizeI, sizeJ, maxFirstPlayerPieces=None, maxSecondPlayerPieces=None):
+        self.sizeI = sizeI
+        self.sizeJ = sizeJ
+        self.squareCount = sizeI * sizeJ
+        self.maxFirstPlayerPieces = sizeJ * 2 if maxFirstPlayerPieces is None else maxFirstPlayerPieces
+        self.maxSecondPlayerPieces = sizeJ * 2 if maxSecondPlayerPieces is None else maxSecondPlayerPieces
+        self.binomial = _binomials(self.squareCount)
+
+        # offsets[(n1, n2)] is the first index of the positions with n1 and n2 pawns
+        self.offsets = {}
+        self.blocks = []
+        size = 0
+        for n1 in range(min(self.maxFirstPlayerPieces, self.squareCount) + 1):
+            for n2 in range(min(self.maxSecondPlayerPieces, self.squareCount - n1) + 1):
+                self.offsets[(n1, n2)] = size
+                self.blocks.append((size, n1, n2))
+                size += self.binomial[self.squareCount][n1] * self.binomial[self.squareCount - n1][n2] * 2
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def _rankSquares(self, squares):
+        # colex rank of an increasing list of squares
+        binomial = self.binomial
+        return sum(binomial[square][k + 1] for k, square in enumerate(squares))
+
+    def _unrankSquares(self, rank, count, universe):
+        binomial = self.binomial
+        squares = []
+        candidate = universe - 1
+        for k in range(count, 0, -1):
+            while binomial[candidate][k] > rank:
+                candidate -= 1
+            squares.append(candidate)
+            rank -= binomial[candidate][k]
+            candidate -= 1
+        squares.reverse()
+        return squares
+
+    @staticmethod
+    def _squares(bits):
+        squares = []
+        while bits:
+            lowestBit = bits & -bits
+            squares.append(lowestBit.bit_length() - 1)
+            bits ^= lowestBit
+        return squares
+
+    def rank(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        """
+        :param firstPlayerBoard: Bitboard data of the first player pawns
+        :param secondPlayerBoard: Bitboard data of the second player pawns, disjoint from the first
+        :return: Index in [0, size)
+        """
+        if firstPlayerBoard & secondPlayerBoard:
+            raise ValueError("Pawn sets overlap")
+        first = self._squares(firstPlayerBoard)
+        second = self._squares(secondPlayerBoard)
+        if (len(first), len(second)) not in self.offsets or (first and first[-1] >= self.squareCount) \
+                or (second and second[-1] >= self.squareCount):
+            raise ValueError("Position is outside of this index")
+
+        # squares of the second player, numbered among the squares the first player leaves free
+        compressed = []
+        firstPosition = 0
+        for square in second:
+            while firstPosition < len(first) and first[firstPosition] < square:
+                firstPosition += 1
+            compressed.append(square - firstPosition)
+
+        n1, n2 = len(first), len(second)
+        combined = self._rankSquares(first) * self.binomial[self.squareCount - n1][n2] + self._rankSquares(compressed)
+        return self.offsets[(n1, n2)] + combined * 2 + (0 if isFirstPlayerTurn else 1)
+
+    def unrank(self, index):
+        """
+        :return: (firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)
+        """
+        if not 0 <= index < self.size:
+            raise ValueError("Index is outside of this index")
+        low, high = 0, len(self.blocks) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.blocks[middle][0] <= index:
+                low = middle
+            else:
+                high = middle - 1
+        offset, n1, n2 = self.blocks[low]
+
+        combined, side = divmod(index - offset, 2)
+        secondCombinations = self.binomial[self.squareCount - n1][n2]
+        firstRank, secondRank = divmod(combined, secondCombinations)
+        first = self._unrankSquares(firstRank, n1, self.squareCount)
+        compressed = self._unrankSquares(secondRank, n2, self.squareCount - n1)
+
+        firstPlayerBoard = 0
+        for square in first:
+            firstPlayerBoard |= 1 << square
+        secondPlayerBoard = 0
+        firstPosition = 0
+        for freeSquare in compressed:
+            # the freeSquare-th square not taken by the first player
+            while firstPosition < len(first) and first[firstPosition] <= freeSquare + firstPosition:
+                firstPosition += 1
+            secondPlayerBoard |= 1 << (freeSquare + firstPosition)
+        return firstPlayerBoard, secondPlayerBoard, side == 0
+
+    def rankManager(self, bm, isFirstPlayerTurn, firstPlayerId='1', secondPlayerId='2'):
+        return self.rank(bm[firstPlayerId].data, bm[secondPlayerId].data, isFirstPlayerTurn)
+
+    # Loads the position of index into bm, returns isFirstPlayerTurn
+    def unrankToManager(self, index, bm, firstPlayerId='1', secondPlayerId='2'):
+        firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn = self.unrank(index)
+        bm[firstPlayerId].data = firstPlayerBoard
+        bm[secondPlayerId].data = secondPlayerBoard
+        return isFirstPlayerTurn
+
+
+class ResultDatabase:
+    """
+    Memory-mapped array of 2-bit results (UNKNOWN, WIN, LOSS, DRAW for the side to move), one per index of a
+    PawnPositionIndex. New files are all UNKNOWN.
+    """
+    MAGIC = b'BBRD'
+    HEADER = struct.Struct('<4sIQ')
+    VERSION = 1
+
+    def __init__(self, path, size=None):
+        """
+        :param path: Database file, created if it does not exist
+        :param size: Number of positions, required when creating the file
+        """
+        if not os.path.exists(path):
+            if size is None:
+                raise ValueError("size is required to create a result database")
+            with open(path, 'wb') as file:
+                file.write(self.HEADER.pack(self.MAGIC, self.VERSION, size))
+                file.truncate(self.HEADER.size + (size + 3) // 4)
+
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, version, self.size = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"{path} is not a result database")
+        if size is not None and size != self.size:
+            raise ValueError(f"{path} holds {self.size} positions, expected {size}")
+
+    def __len__(self):
+        return self.size
+
+    def _check(self, index):
+        # negative indices would land in the header, indices past size in the padding of the last byte
+        if not 0 <= index < self.size:
+            raise IndexError(f"Index {index} is outside of a database of {self.size} positions")
+
+    def get(self, index):
+        self._check(index)
+        byte = self.map[self.HEADER.size + (index >> 2)]
+        return (byte >> ((index & 3) * 2)) & 3
+
+    def set(self, index, result):
+        self._check(index)
+        offset = self.HEADER.size + (index >> 2)
+        shift = (index & 3) * 2
+        self.map[offset] = (self.map[offset] & ~(3 << shift)) | (result << shift)
+
+    def __getitem__(self, index):
+        return self.get(index)
+
+    def __setitem__(self, index, result):
+        self.set(index, result)
+
+    def counts(self):
+        counts = [0, 0, 0, 0]
+        for index in range(self.size):
+            counts[self.get(index)] += 1
+        return {'unknown': counts[UNKNOWN], 'win': counts[WIN], 'loss': counts[LOSS], 'draw': counts[DRAW]}
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
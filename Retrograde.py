@@ -0,0 +1,177 @@
+"""
+Retrograde analysis of pawn games over a PawnPositionIndex.
+
+Instead of searching forward from the start position, every indexed position is classified at once:
+
+1. Sweep: positions that are over (see PawnRules.terminalResult), or where the side to move has no move, are
+   resolved at depth 0. Every other position gets a counter of its unresolved moves.
+2. Propagate: resolved positions are taken in order of depth. Each predecessor, found by un-moving the player
+   who just moved (un-captures put a pawn of the side to move back), is a WIN if the position is a LOSS for the
+   side to move there. Otherwise its counter is decremented and it becomes a LOSS once no move is left.
+3. Positions still unresolved at the fixed point are DRAWs.
+
+Depths are distance to the end of the game with best play: shortest win, longest loss.
+The sweep only unranks and counts moves, it can be split over index ranges and run in a process pool.
+"""
+from array import array
+from multiprocessing import Pool
+
+from PerfectIndex import PawnPositionIndex, ResultDatabase, UNKNOWN, WIN, LOSS, DRAW
+
+NO_DEPTH = 0xFFFF
+
+
+def _sweep(arguments):
+    rules, index, start, stop = arguments
+    results = bytearray(stop - start)
+    moveCounts = array('H', bytes(2 * (stop - start)))
+    for position in range(start, stop):
+        first, second, isFirstPlayerTurn = index.unrank(position)
+        result = rules.terminalResult(first, second, isFirstPlayerTurn)
+        if result is None:
+            moveCount = rules.moveCount(first, second, isFirstPlayerTurn)
+            if moveCount == 0:
+                result = LOSS
+            moveCounts[position - start] = moveCount
+        if result is not None:
+            results[position - start] = result
+    return results, moveCounts
+
+
+class Tablebase:
+    def __init__(self, rules, index, results, depths):
+        self.rules = rules
+        self.index = index
+        self.results = results
+        self.depths = depths
+
+    def result(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        """
+        :return: WIN, LOSS or DRAW for the side to move
+        """
+        return self.results[self.index.rank(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)]
+
+    def depth(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        """
+        :return: Number of moves to the end of the game with best play, None for draws
+        """
+        depth = self.depths[self.index.rank(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)]
+        return None if depth == NO_DEPTH else depth
+
+    # Moves of the side to move that keep the best result, as (firstPlayerBoard, secondPlayerBoard) children
+    def bestChildren(self, firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn):
+        if self.rules.terminalResult(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn) is not None:
+            return []
+        result = self.result(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)
+        depth = self.depth(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)
+        # the result of a child is from the opponent's side
+        expected = {WIN: LOSS, LOSS: WIN, DRAW: DRAW}[result]
+        return [child for child in self.rules.children(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn)
+                if self.result(*child, not isFirstPlayerTurn) == expected
+                and (depth is None or self.depth(*child, not isFirstPlayerTurn) == depth - 1)]
+
+    def counts(self):
+        counts = [0, 0, 0, 0]
+        for result in self.results:
+            counts[result] += 1
+        return {'unknown': counts[UNKNOWN], 'win': counts[WIN], 'loss': counts[LOSS], 'draw': counts[DRAW]}
+
+    # Writes the 2-bit results to a ResultDatabase at path
+    def save(self, path):
+        database = ResultDatabase(path, len(self.index))
+        for position, result in enumerate(self.results):
+            if result != UNKNOWN:
+                database.set(position, result)
+        database.close()
+
+
+def solveRetrograde(rules, maxFirstPlayerPieces=None, maxSecondPlayerPieces=None, processes=1, chunkSize=1 << 16):
+    """
+    :param rules: PawnRules of the game
+    :param maxFirstPlayerPieces: Largest number of first player pawns to index, 2 rows by default
+    :param maxSecondPlayerPieces: Largest number of second player pawns to index, 2 rows by default
+    :param processes: Number of processes for the initial sweep
+    :param chunkSize: Number of positions per sweep task
+    :return: Tablebase of every indexed position
+    """
+    index = PawnPositionIndex(rules.sizeI, rules.sizeJ, maxFirstPlayerPieces, maxSecondPlayerPieces)
+    ranges = [(rules, index, start, min(start + chunkSize, index.size)) for start in range(0, index.size, chunkSize)]
+    if processes > 1:
+        with Pool(processes) as pool:
+            chunks = pool.map(_sweep, ranges)
+    else:
+        chunks = [_sweep(arguments) for arguments in ranges]
+
+    results = bytearray()
+    moveCounts = array('H')
+    for chunkResults, chunkMoveCounts in chunks:
+        results += chunkResults
+        moveCounts += chunkMoveCounts
+    depths = array('H', [NO_DEPTH]) * index.size
+
+    frontier = []
+    for position, result in enumerate(results):
+        if result != UNKNOWN:
+            depths[position] = 0
+            frontier.append(position)
+
+    # one frontier per depth, so depths come out in increasing order
+    depth = 0
+    while frontier:
+        depth += 1
+        nextFrontier = []
+        for position in frontier:
+            first, second, isFirstPlayerTurn = index.unrank(position)
+            isLoss = results[position] == LOSS
+            for predecessor in rules.predecessors(first, second, isFirstPlayerTurn):
+                try:
+                    predecessorPosition = index.rank(*predecessor, not isFirstPlayerTurn)
+                except ValueError:
+                    # un-capture above the piece limit
+                    continue
+                if results[predecessorPosition] != UNKNOWN:
+                    continue
+                if isLoss:
+                    results[predecessorPosition] = WIN
+                else:
+                    moveCounts[predecessorPosition] -= 1
+                    if moveCounts[predecessorPosition]:
+                        continue
+                    results[predecessorPosition] = LOSS
+                depths[predecessorPosition] = depth
+                nextFrontier.append(predecessorPosition)
+        frontier = nextFrontier
+
+    for position, result in enumerate(results):
+        if result == UNKNOWN:
+            results[position] = DRAW
+    return Tablebase(rules, index, results, depths)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from PawnRules import PawnRules
+
+    parser = argparse.ArgumentParser(description="Build a retrograde tablebase of a pawn game")
+    parser.add_argument("game", choices=["hexapawn", "pawnrevolt"])
+    parser.add_argument("sizeI", type=int)
+    parser.add_argument("sizeJ", type=int)
+    parser.add_argument("--max-pieces", type=int, default=None, help="Largest pawn count per side")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--output", default=None, help="ResultDatabase file to write")
+    arguments = parser.parse_args()
+
+    rules = PawnRules.hexapawn(arguments.sizeI, arguments.sizeJ) if arguments.game == "hexapawn" \
+        else PawnRules.pawnRevolt(arguments.sizeI, arguments.sizeJ)
+    start = time.perf_counter()
+    tablebase = solveRetrograde(rules, arguments.max_pieces, arguments.max_pieces, arguments.processes)
+    print(f"{len(tablebase.index)} positions in {time.perf_counter() - start:.2f}s: {tablebase.counts()}")
+    rows = 1 if arguments.game == "hexapawn" else 2
+    first, second = rules.initialPosition(rows)
+    if bin(first).count('1') <= tablebase.index.maxFirstPlayerPieces:
+        print("Initial position:", {WIN: "first player wins", LOSS: "second player wins", DRAW: "draw"}[
+            tablebase.result(first, second, True)], "depth", tablebase.depth(first, second, True))
+    if arguments.output:
+        tablebase.save(arguments.output)
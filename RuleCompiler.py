@@ -0,0 +1,256 @@
+"""
+Declarative rules of leaper games (pawns, kings, knights... any piece jumping by fixed offsets) compiled to Python.
+
+A RuleSpec lists the pieces: their side, their offsets (to empty squares, capture only, or both) and an optional
+promotion, plus the goal row of each side. compileRules turns it into Python source for the given board size, with
+every shift amount and edge mask written as a constant, and execs it once. The generated functions work on a key
+packing the whole position in one int, as IntegerGame does: piece k in bits [k * N, (k + 1) * N), N being the number
+of squares, and bit pieces * N set when the second player is to move.
+
+For each piece and offset the generated code moves all pieces at once with one shift, masks the destinations, then
+builds each child key with a few XORs, e.g. for a first player pawn moving up a 3x3 board:
+
+    targets = ((p0 & 0x1f8) >> 3 & empty)
+    while targets:
+        to = targets & -targets
+        targets ^= to
+        children.append(key ^ (to << 3 | to) ^ 0x40000)
+"""
+from IntegerGame import IntegerGame
+from PerfectIndex import WIN, LOSS
+
+FIRST_PLAYER = 0
+SECOND_PLAYER = 1
+
+
+class PieceRule:
+    def __init__(self, name, side, moveOffsets=(), captureOffsets=(), offsets=(), promotion=None):
+        """
+        :param name: Name of the piece, e.g. the bitboard id
+        :param side: FIRST_PLAYER or SECOND_PLAYER
+        :param moveOffsets: (offsetI, offsetJ) going to empty squares only
+        :param captureOffsets: Offsets going to squares holding an opponent piece only, that piece is captured
+        :param offsets: Offsets going to empty squares or capturing
+        :param promotion: (row, pieceName), the piece becomes pieceName when it lands on row
+        """
+        self.name = name
+        self.side = side
+        self.moveOffsets = list(moveOffsets)
+        self.captureOffsets = list(captureOffsets)
+        self.offsets = list(offsets)
+        self.promotion = promotion
+
+
+class RuleSpec:
+    def __init__(self, sizeI, sizeJ, pieces, goalRows=(None, None), initialPosition=None):
+        """
+        :param pieces: List of PieceRule, their order is the order of the bitboards in a key
+        :param goalRows: Row that wins for each side when any of its pieces lands on it, None for no goal row
+        :param initialPosition: Bitboard of each piece at the start, all empty if None
+
+        A side without pieces loses, and so does a side to move without any legal move.
+        """
+        self.sizeI = sizeI
+        self.sizeJ = sizeJ
+        self.pieces = list(pieces)
+        self.goalRows = tuple(goalRows)
+        self.initialPosition = tuple(initialPosition) if initialPosition is not None else (0,) * len(self.pieces)
+
+    @classmethod
+    def pawnGame(cls, sizeI, sizeJ, moveOffsets, captureOffsets, offsets, rows):
+        """
+        Pawns of PawnRules: offsets are given for the first player (moving towards row 0) and flipped for the second
+        """
+        flip = lambda offsets: [(-i, -j) for i, j in offsets]
+        rowsMask = (1 << (sizeJ * rows)) - 1
+        return cls(sizeI, sizeJ, [
+            PieceRule('1', FIRST_PLAYER, moveOffsets, captureOffsets, offsets),
+            PieceRule('2', SECOND_PLAYER, flip(moveOffsets), flip(captureOffsets), flip(offsets)),
+        ], goalRows=(0, sizeI - 1), initialPosition=(rowsMask << ((sizeI - rows) * sizeJ), rowsMask))
+
+    @classmethod
+    def hexapawn(cls, sizeI=3, sizeJ=3):
+        return cls.pawnGame(sizeI, sizeJ, [(-1, 0)], [(-1, 1), (-1, -1)], [], rows=1)
+
+    @classmethod
+    def pawnRevolt(cls, sizeI=7, sizeJ=5):
+        return cls.pawnGame(sizeI, sizeJ, [], [], [(-1, 0), (-1, 1), (-1, -1)], rows=2)
+
+
+def _sourceMask(spec, offsetI, offsetJ):
+    # squares whose destination stays on the board
+    mask = 0
+    for i in range(spec.sizeI):
+        for j in range(spec.sizeJ):
+            if 0 <= i + offsetI < spec.sizeI and 0 <= j + offsetJ < spec.sizeJ:
+                mask |= 1 << (i * spec.sizeJ + j)
+    return mask
+
+
+def _shift(expression, shift):
+    if shift == 0:
+        return expression
+    return f"{expression} << {shift}" if shift > 0 else f"{expression} >> {-shift}"
+
+
+def _generateSide(spec, side):
+    """
+    :return: Source of children<side>(key), moveCount<side>(key) and terminal<side>(key)
+    """
+    squareCount = spec.sizeI * spec.sizeJ
+    board = (1 << squareCount) - 1
+    sideBit = 1 << (len(spec.pieces) * squareCount)
+    names = {piece.name: k for k, piece in enumerate(spec.pieces)}
+    own = [k for k, piece in enumerate(spec.pieces) if piece.side == side]
+    opponent = [k for k, piece in enumerate(spec.pieces) if piece.side != side]
+    # to * opponentSpread has the destination bit in every opponent bitboard
+    opponentSpread = sum(1 << (k * squareCount) for k in opponent)
+
+    header = [f"    p{k} = (key >> {k * squareCount}) & {board:#x}" if k else f"    p0 = key & {board:#x}"
+              for k in range(len(spec.pieces))]
+    header.append(f"    own = {' | '.join(f'p{k}' for k in own) or '0'}")
+    header.append(f"    opp = {' | '.join(f'p{k}' for k in opponent) or '0'}")
+    empty = f"    empty = {board:#x} & ~(own | opp)"
+
+    children = [f"def children{side}(key):", *header, empty, "    children = []"]
+    count = [f"def moveCount{side}(key):", *header, empty, "    count = 0"]
+    for k in own:
+        piece = spec.pieces[k]
+        offset = k * squareCount
+        promotionRow, promotionPiece = piece.promotion if piece.promotion is not None else (None, None)
+        promotionMask = ((1 << spec.sizeJ) - 1) << (promotionRow * spec.sizeJ) if promotionRow is not None else 0
+        # offsets with the squares they may land on
+        kinds = [(piece.moveOffsets, 'empty'), (piece.captureOffsets, 'opp'), (piece.offsets, f'({board:#x} & ~own)')]
+        for offsets, allowed in kinds:
+            for offsetI, offsetJ in offsets:
+                shift = offsetI * spec.sizeJ + offsetJ
+                targets = f"({_shift(f'(p{k} & {_sourceMask(spec, offsetI, offsetJ):#x})', shift)} & {allowed})"
+                fromBit = _shift("to", -shift)
+                clear = f" & ~(to * {opponentSpread:#x})" if allowed != 'empty' and opponentSpread else ""
+                count.append(f"    count += bin({targets}).count('1')")
+                groups = [(targets, _shift(f"({fromBit} | to)", offset))]
+                if promotionMask:
+                    promoted = names[promotionPiece] * squareCount
+                    groups = [(f"{targets} & {~promotionMask & board:#x}", groups[0][1]),
+                              (f"{targets} & {promotionMask:#x}", f"{_shift(f'({fromBit})', offset)} ^ {_shift('to', promoted)}")]
+                for targetsExpression, moveExpression in groups:
+                    children += [
+                        f"    targets = {targetsExpression}",
+                        "    while targets:",
+                        "        to = targets & -targets",
+                        "        targets ^= to",
+                        f"        children.append((key ^ {moveExpression} ^ {sideBit:#x}){clear})",
+                    ]
+    children.append("    return children")
+    count.append("    return count")
+
+    # terminal: goal rows and sides without pieces, not the side to move without moves
+    terminal = [f"def terminal{side}(key):", *header]
+    ownGoal, otherGoal = spec.goalRows[side], spec.goalRows[1 - side]
+    rowMask = (1 << spec.sizeJ) - 1
+    if otherGoal is not None:
+        terminal.append(f"    if opp & {rowMask << (otherGoal * spec.sizeJ):#x}: return {LOSS}")
+    terminal.append(f"    if not own: return {LOSS}")
+    if ownGoal is not None:
+        terminal.append(f"    if own & {rowMask << (ownGoal * spec.sizeJ):#x}: return {WIN}")
+    terminal.append(f"    if not opp: return {WIN}")
+    terminal.append("    return None")
+    return "\n".join(children + [""] + count + [""] + terminal) + "\n"
+
+
+def generateSource(spec: RuleSpec):
+    """
+    :return: Python source of the compiled rules, see compileRules
+    """
+    return "\n\n".join(_generateSide(spec, side) for side in (FIRST_PLAYER, SECOND_PLAYER))
+
+
+class CompiledRules(IntegerGame):
+    """
+    IntegerGame over the keys of a RuleSpec, see the module docstring for the key layout.
+    self.source holds the generated code.
+    """
+
+    def __init__(self, spec: RuleSpec):
+        self.spec = spec
+        self.squareCount = spec.sizeI * spec.sizeJ
+        self.boardMask = (1 << self.squareCount) - 1
+        self.secondPlayerToMove = 1 << (len(spec.pieces) * self.squareCount)
+        self.source = generateSource(spec)
+        namespace = {}
+        exec(compile(self.source, f"<rules {spec.sizeI}x{spec.sizeJ}>", "exec"), namespace)
+        self._children = (namespace['children0'], namespace['children1'])
+        self._moveCount = (namespace['moveCount0'], namespace['moveCount1'])
+        self._terminal = (namespace['terminal0'], namespace['terminal1'])
+
+    def pack(self, position, isFirstPlayerTurn):
+        key = 0 if isFirstPlayerTurn else self.secondPlayerToMove
+        for k, board in enumerate(position):
+            key |= board << (k * self.squareCount)
+        return key
+
+    def unpack(self, key):
+        """
+        :return: (position, isFirstPlayerTurn), position being the bitboard of each piece
+        """
+        position = tuple((key >> (k * self.squareCount)) & self.boardMask for k in range(len(self.spec.pieces)))
+        return position, not key & self.secondPlayerToMove
+
+    def initialKey(self):
+        return self.pack(self.spec.initialPosition, True)
+
+    def children(self, key):
+        return self._children[1 if key & self.secondPlayerToMove else 0](key)
+
+    def moveCount(self, key):
+        return self._moveCount[1 if key & self.secondPlayerToMove else 0](key)
+
+    def result(self, key):
+        """
+        :return: WIN or LOSS for the side to move, None if the game is not over
+        """
+        side = 1 if key & self.secondPlayerToMove else 0
+        result = self._terminal[side](key)
+        if result is None and self._moveCount[side](key) == 0:
+            return LOSS
+        return result
+
+    def terminal(self, key):
+        return self.result(key) is not None
+
+    def value(self, key):
+        result = self.result(key)
+        if result is None:
+            return None
+        firstPlayerWins = (result == WIN) == self.sideToMove(key)
+        return float('inf') if firstPlayerWins else float('-inf')
+
+    def sideToMove(self, key):
+        return not key & self.secondPlayerToMove
+
+
+def compileRules(spec: RuleSpec):
+    return CompiledRules(spec)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    import Solver
+    from IntegerGame import pawnRevoltGame
+    from TranspositionTable import TranspositionTable
+
+    parser = argparse.ArgumentParser(description="Compile PawnRevolt rules and compare with PawnRules")
+    parser.add_argument("sizeI", type=int)
+    parser.add_argument("sizeJ", type=int)
+    parser.add_argument("--show-source", action="store_true")
+    arguments = parser.parse_args()
+
+    compiled = compileRules(RuleSpec.pawnRevolt(arguments.sizeI, arguments.sizeJ))
+    if arguments.show_source:
+        print(compiled.source)
+    for name, game in (("PawnRules", pawnRevoltGame(arguments.sizeI, arguments.sizeJ)), ("compiled", compiled)):
+        start = time.time()
+        states = Solver.solveIntegers(game, TranspositionTable("memory"))
+        print(f"{name}: {states} states in {time.time() - start:.2f}s")
@@ -0,0 +1,138 @@
+"""
+Binary trace of what a search did, for post mortems of bad solves (frontier explosion, table thrash...).
+
+Solver.solve, resolveTT and passInfoToChildren take an optional TraceRecorder. Each event is a fixed-size record:
+
+    key (uint64), parent key (uint64), depth (uint32), event (uint8), 3 pad bytes, timestamp in ns (uint64)
+
+Records are gathered in memory and written in blocks. Sampling is by key, so a sampled state has all of its events
+in the trace and ratios (duplicates, branching) stay unbiased. Expansion events are sampled by the parent key,
+which is known before the children are hashed. summarizeTrace reads a trace back and reports branching factor,
+duplicate rate and depth profile.
+"""
+import struct
+import time
+from collections import Counter
+
+from BloomFilter import _mix64, MASK64
+
+EXPAND = 0
+CHILD = 1
+TT_STORE = 2
+TT_HIT = 3
+TERMINAL = 4
+EVENT_NAMES = {EXPAND: 'expand', CHILD: 'child', TT_STORE: 'ttStore', TT_HIT: 'ttHit', TERMINAL: 'terminal'}
+
+HEADER = struct.Struct('<4sIId')
+RECORD = struct.Struct('<QQIB3xQ')
+MAGIC = b'BBTR'
+VERSION = 1
+
+
+class TraceRecorder:
+    def __init__(self, path, sampleRate=1.0, flushBytes=1 << 20):
+        """
+        :param path: Trace file, overwritten
+        :param sampleRate: Fraction of the keys whose events are recorded
+        :param flushBytes: Size of the in-memory block written at once
+        """
+        if not 0 < sampleRate <= 1:
+            raise ValueError("sampleRate must be in (0, 1]")
+        self.sampleRate = sampleRate
+        self.threshold = int(sampleRate * (MASK64 + 1))
+        self.flushBytes = flushBytes
+        self.buffer = bytearray()
+        self.records = 0
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, sampleRate))
+
+    def isSampled(self, key):
+        return self.sampleRate >= 1 or _mix64((key or 0) & MASK64) < self.threshold
+
+    # Append a record without the sampling check, for callers that already sampled
+    def write(self, event, key, parentKey, depth):
+        self.buffer += RECORD.pack((key or 0) & MASK64, (parentKey or 0) & MASK64, depth or 0, event,
+                                   time.perf_counter_ns())
+        self.records += 1
+        if len(self.buffer) >= self.flushBytes:
+            self.flush()
+
+    def record(self, event, key, parentKey, depth):
+        if self.isSampled(key):
+            self.write(event, key, parentKey, depth)
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def readTrace(path):
+    """
+    :return: (sampleRate, iterator of (event, key, parentKey, depth, timestamp))
+    """
+    file = open(path, 'rb')
+    magic, version, recordSize, sampleRate = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or recordSize != RECORD.size:
+        file.close()
+        raise ValueError(f"{path} is not a search trace")
+
+    def records():
+        with file:
+            while True:
+                block = file.read(RECORD.size * 4096)
+                if not block:
+                    return
+                for key, parentKey, depth, event, timestamp in RECORD.iter_unpack(block):
+                    yield event, key, parentKey, depth, timestamp
+
+    return sampleRate, records()
+
+
+def summarizeTrace(path):
+    """
+    :return: dict with event counts, branching factor (children per expanded state), duplicate rate (table hits
+     among table lookups), per depth counts of stored and duplicate states, and the traced duration in seconds.
+     Counts are of sampled events, divide by sampleRate to estimate totals
+    """
+    sampleRate, records = readTrace(path)
+    events = Counter()
+    storesPerDepth = Counter()
+    hitsPerDepth = Counter()
+    first = last = None
+    for event, key, parentKey, depth, timestamp in records:
+        events[event] += 1
+        if event == TT_STORE:
+            storesPerDepth[depth] += 1
+        elif event == TT_HIT:
+            hitsPerDepth[depth] += 1
+        first = timestamp if first is None else first
+        last = timestamp
+
+    lookups = events[TT_STORE] + events[TT_HIT]
+    return {
+        'sampleRate': sampleRate,
+        'events': {name: events[event] for event, name in EVENT_NAMES.items()},
+        'branchingFactor': events[CHILD] / events[EXPAND] if events[EXPAND] else None,
+        'duplicateRate': events[TT_HIT] / lookups if lookups else None,
+        'storesPerDepth': dict(sorted(storesPerDepth.items())),
+        'hitsPerDepth': dict(sorted(hitsPerDepth.items())),
+        'seconds': (last - first) / 1e9 if first is not None else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    print(json.dumps(summarizeTrace(sys.argv[1]), indent=2))
@@ -0,0 +1,232 @@
+"""
+Read-only index of a solved game, built from a TranspositionTable.
+
+File layout:
+    header  : magic b'BBSI', version (uint32), count (uint64), keyBytes (uint32), 4 pad bytes, little-endian
+    keys    : count * keyBytes, each key as keyBytes / 8 little-endian uint64 limbs, most significant limb first,
+              sorted ascending
+    moves   : count * little-endian uint16, best move code of each key, NO_MOVE if unknown
+    values  : count * int8, see VALUE_* below
+
+keyBytes is a multiple of 8 wide enough for the largest key, so keys wider than 64 bits (e.g. the nested szudzik
+pairs of PawnRevolt.Game.stateHash) are exported as is. A lookup bisects the column of the most significant limbs,
+then the next limb within the matching run, and so on, over uint64 views of the map, without building an object per
+probe. Big-endian machines search a byteswapped copy of the keys.
+
+The file is memory-mapped, so opening an index costs nothing and a lookup is O(log n) without unpickling anything.
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+MAGIC = b'BBSI'
+VERSION = 3
+HEADER = struct.Struct('<4sIQI4x')
+MOVE = struct.Struct('<H')
+
+VALUE_SECOND_PLAYER_WIN = -1
+VALUE_DRAW = 0
+VALUE_FIRST_PLAYER_WIN = 1
+VALUE_UNKNOWN = 2
+
+NO_MOVE = 0xFFFF
+
+LIMB_MASK = (1 << 64) - 1
+
+
+def encodeValue(value):
+    if value is None:
+        return VALUE_UNKNOWN
+    if value == float('inf'):
+        return VALUE_FIRST_PLAYER_WIN
+    if value == float('-inf'):
+        return VALUE_SECOND_PLAYER_WIN
+    if value == 0:
+        return VALUE_DRAW
+    raise ValueError(f"Cannot encode value {value}")
+
+
+_DECODED_VALUES = {
+    VALUE_UNKNOWN: None,
+    VALUE_FIRST_PLAYER_WIN: float('inf'),
+    VALUE_SECOND_PLAYER_WIN: float('-inf'),
+    VALUE_DRAW: 0,
+}
+
+
+def decodeValue(code):
+    return _DECODED_VALUES[code]
+
+
+def encodeBestMove(move):
+    if move is None:
+        return NO_MOVE
+    if not isinstance(move, int) or not 0 <= move < NO_MOVE:
+        raise ValueError(f"Best move must be an integer move code below {NO_MOVE}, got {move!r}")
+    return move
+
+
+def exportSolvedIndex(transpositionTable, path):
+    """
+    Write every entry of a solved transposition table to a sorted index file.
+    :param transpositionTable: TranspositionTable, entries are (value, depth, isEnd, parent_hash, isFirstPlayerTurn, nextBestMove, ...)
+    :param path: Output file
+    :return: Number of exported positions
+    """
+    entries = []
+    for key, entry in transpositionTable.items():
+        if key < 0:
+            raise ValueError(f"Key {key} is negative")
+        entries.append((key, encodeValue(entry[0]), encodeBestMove(entry[5])))
+    entries.sort()
+
+    limbs = max(1, -(-max((key.bit_length() for key, _, _ in entries), default=0) // 64))
+    keys = array('Q', ((key >> (64 * limb)) & LIMB_MASK for key, _, _ in entries for limb in reversed(range(limbs))))
+    moves = array('H', (move for _, _, move in entries))
+    values = array('b', (value for _, value, _ in entries))
+    if sys.byteorder != 'little':
+        keys.byteswap()
+        moves.byteswap()
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(entries), 8 * limbs))
+        keys.tofile(file)
+        moves.tofile(file)
+        values.tofile(file)
+    return len(entries)
+
+
+class SolvedIndex:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, self.keyBytes = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a solved index")
+
+        self.count = count
+        self.limbs = self.keyBytes // 8
+        self.keyLimit = 1 << (8 * self.keyBytes)
+        self.view = memoryview(self.map)
+        keysEnd = HEADER.size + self.keyBytes * count
+        self.movesStart = keysEnd
+        movesEnd = keysEnd + MOVE.size * count
+        if sys.byteorder == 'little':
+            self.keyWords = self.view[HEADER.size:keysEnd].cast('Q')
+        else:
+            self.keyWords = array('Q', self.view[HEADER.size:keysEnd].tobytes())
+            self.keyWords.byteswap()
+        # one column per limb, most significant first
+        self.keyColumns = [self.keyWords[limb::self.limbs] for limb in range(self.limbs)]
+        self.values = self.view[movesEnd:movesEnd + count].cast('b')
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, state_hash):
+        if not 0 <= state_hash < self.keyLimit:
+            return -1
+        low, high = 0, self.count
+        shift = 64 * self.limbs
+        for column in self.keyColumns:
+            shift -= 64
+            limb = (state_hash >> shift) & LIMB_MASK
+            low = bisect_left(column, limb, low, high)
+            high = bisect_right(column, limb, low, high)
+            if low == high:
+                return -1
+        return low
+
+    def __contains__(self, state_hash):
+        return self._find(state_hash) >= 0
+
+    def lookup(self, state_hash):
+        """
+        :return: (value, bestMove) where value is inf / -inf / 0 / None as in State.value() and bestMove is
+         the move code or None, or None if the position is not in the index
+        """
+        position = self._find(state_hash)
+        if position < 0:
+            return None
+        move, = MOVE.unpack_from(self.view, self.movesStart + MOVE.size * position)
+        return decodeValue(self.values[position]), None if move == NO_MOVE else move
+
+    def lookupMany(self, state_hashes):
+        return [self.lookup(state_hash) for state_hash in state_hashes]
+
+    def close(self):
+        for words in (*self.keyColumns, self.keyWords):
+            if isinstance(words, memoryview):
+                words.release()
+        self.values.release()
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+
+def _queryResult(index, key):
+    result = index.lookup(key)
+    if result is None:
+        return {'key': key, 'found': False}
+    value, bestMove = result
+    return {'key': key, 'found': True, 'value': encodeValue(value), 'bestMove': bestMove}
+
+
+def makeServer(index, host='127.0.0.1', port=8765):
+    """
+    HTTP front end for a SolvedIndex.
+        GET  /lookup?key=<hash>             -> {"key", "found", "value", "bestMove"}
+        POST /lookup with a JSON list of keys -> list of the above, in order
+    value is one of the VALUE_* codes.
+    :return: ThreadingHTTPServer, call serve_forever() to run it
+    """
+
+    class SolvedIndexHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/lookup':
+                return self._reply(404, {'error': 'not found'})
+            try:
+                key = int(parse_qs(url.query)['key'][0])
+            except (KeyError, ValueError):
+                return self._reply(400, {'error': 'expected ?key=<integer>'})
+            self._reply(200, _queryResult(index, key))
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/lookup':
+                return self._reply(404, {'error': 'not found'})
+            try:
+                keys = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                keys = [int(key) for key in keys]
+            except (ValueError, TypeError):
+                return self._reply(400, {'error': 'expected a JSON list of integer keys'})
+            self._reply(200, [_queryResult(index, key) for key in keys])
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), SolvedIndexHandler)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve a solved index over HTTP')
+    parser.add_argument('path')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    arguments = parser.parse_args()
+    makeServer(SolvedIndex(arguments.path), arguments.host, arguments.port).serve_forever()
@@ -1,10 +1,16 @@
+import asyncio
 from typing import List
 
 from State import State
 from TranspositionTable import TranspositionTable
+from FrontierFile import FrontierSpill
+from AsyncPipeline import runPipeline
+from IntegerGame import IntegerGame
+from SearchTrace import TraceRecorder, EXPAND, CHILD, TT_STORE, TT_HIT, TERMINAL
 
 
-def solve(root: State, queue=None, transpositionTable=None):
+# trace: optional SearchTrace.TraceRecorder, see SearchTrace.summarizeTrace to read it back
+def solve(root: State, queue=None, transpositionTable=None, trace: TraceRecorder = None):
     if queue is None:
         queue = []
 
@@ -16,25 +22,96 @@ def solve(root: State, queue=None, transpositionTable=None):
     while len(queue) > 0:
         root = queue.pop(0)
         if root.isEnd():
+            if trace is not None:
+                trace.record(TERMINAL, root.hash(), root.parent_hash, root.depth)
             continue
-        isStateInTT = resolveTT(root, transpositionTable)
+        isStateInTT = resolveTT(root, transpositionTable, trace)
         if not isStateInTT:
-            children = passInfoToChildren(root, root.getAllPossibleNextStates())
+            children = passInfoToChildren(root, root.getAllPossibleNextStates(), trace)
             queue.extend(children)
     return None
 
+"""
+Breadth first solve of an IntegerGame: the frontier holds plain int keys, one list per depth, and a state is stored
+when first reached, with its parent, so no object is allocated per node. Terminal states are stored too.
+spillThreshold: keep at most that many keys of the next frontier in memory, the rest goes to compressed frontier
+files in spillDirectory (see FrontierFile.FrontierSpill), None keeps the whole frontier in memory.
+:return: Number of unique states
+"""
+def solveIntegers(game: IntegerGame, transpositionTable=None, root=None, spillThreshold=None, spillDirectory=None):
+    if transpositionTable is None:
+        transpositionTable = TranspositionTable()
+    if root is None:
+        root = game.initialKey()
+
+    terminal = game.terminal
+    transpositionTable.store(root, game.value(root), 0, terminal(root), None, game.sideToMove(root), None)
+    frontier = nextFrontier = [root]
+    stored = 1
+    depth = 0
+    try:
+        while frontier:
+            depth += 1
+            nextFrontier = [] if spillThreshold is None else FrontierSpill(spillThreshold, spillDirectory)
+            for key in frontier:
+                if terminal(key):
+                    continue
+                for child in game.children(key):
+                    if not transpositionTable.contains(child):
+                        isEnd = terminal(child)
+                        transpositionTable.store(child, game.value(child) if isEnd else None, depth, isEnd, key,
+                                                 game.sideToMove(child), None)
+                        stored += 1
+                        nextFrontier.append(child)
+            if isinstance(frontier, FrontierSpill):
+                frontier.close()
+            frontier = nextFrontier
+    finally:
+        # the spill runs are deleted on errors too
+        for spill in (frontier, nextFrontier):
+            if isinstance(spill, FrontierSpill):
+                spill.close()
+    return stored
+
+"""
+Same search as solve, but through AsyncPipeline so expansion overlaps with the transposition table writes.
+Terminal states are stored too, only their children are skipped.
+:return: Number of unique states
+"""
+def solveAsync(root: State, transpositionTable=None, **pipelineOptions):
+    if transpositionTable is None:
+        transpositionTable = TranspositionTable()
+
+    def expand(state):
+        if state.isEnd():
+            return []
+        return passInfoToChildren(state, state.getAllPossibleNextStates())
+
+    def record(state):
+        return state.hash(), state.value(), state.depth, state.isEnd(), state.parent_hash, state.isFirstPlayerTurn(), None
+
+    def persist(records):
+        for entry in records:
+            transpositionTable.store(*entry)
+
+    return asyncio.run(runPipeline([root], expand, lambda state: state.hash(), record, persist, **pipelineOptions))
+
 """
 Check if the state is in the transposition table, if so, then store it and return False.
 Otherwise, return True, boolean is returned for the purpose of extending the queue or not
 """
-def resolveTT(state: State, transpositionTable: TranspositionTable) -> bool:
+def resolveTT(state: State, transpositionTable: TranspositionTable, trace: TraceRecorder = None) -> bool:
     if not transpositionTable.contains(state.hash()):
         transpositionTable.store(state.hash(), state.value(), state.depth, state.isEnd(), state.parent_hash, state.isFirstPlayerTurn(), None)
+        if trace is not None:
+            trace.record(TT_STORE, state.hash(), state.parent_hash, state.depth)
         return False
     else:
+        if trace is not None:
+            trace.record(TT_HIT, state.hash(), state.parent_hash, state.depth)
         return True
 
-def passInfoToChildren(parentState: State, children: List[State]) -> List[State]:
+def passInfoToChildren(parentState: State, children: List[State], trace: TraceRecorder = None) -> List[State]:
     parent_hash = parentState.hash()  # Avoid computing hash multiple times
     parent_depth = parentState.depth  # Avoid accessing depth multiple times
 
@@ -42,4 +119,10 @@ def passInfoToChildren(parentState: State, children: List[State]) -> List[State]
         child.parent_hash = parent_hash
         child.depth = parent_depth + 1
 
+    # sampled by the parent, so unsampled expansions never hash their children
+    if trace is not None and trace.isSampled(parent_hash):
+        trace.write(EXPAND, parent_hash, parentState.parent_hash, parent_depth)
+        for child in children:
+            trace.write(CHILD, child.hash(), parent_hash, parent_depth + 1)
+
     return children  # Return the modified list if needed
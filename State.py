@@ -1,9 +1,86 @@
 from abc import ABC, abstractmethod
+from functools import wraps
+import gc
+import sys
+import types
 
 import copy
+
+_MISSING = object()
+
+
+def memoized(method=None, *, shared=False):
+    """
+    Cache the result of an argument-less State method on the state until invalidate() is called.
+    The result is kept in the attribute '_<method name>Memo', so states declaring __slots__ list one such slot per
+    memoized method instead of holding a dict of results, a class missing one raises TypeError when defined.
+    :param shared: Also cache it in type(state).sharedCache under (state.hash(), method name), only for results that
+     depend on the position alone (value, isEnd), see State.useSharedCache
+    """
+    if method is None:
+        return lambda method: memoized(method, shared=shared)
+    name = method.__name__
+    slot = f'_{name}Memo'
+
+    @wraps(method)
+    def wrapper(self):
+        result = getattr(self, slot, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        sharedCache = type(self).sharedCache if shared else None
+        if sharedCache is not None:
+            key = (self.hash(), name)
+            # results are wrapped, None is a valid value
+            cached = sharedCache.get(key)
+            if cached is not None:
+                setattr(self, slot, cached[0])
+                return cached[0]
+        result = method(self)
+        setattr(self, slot, result)
+        if sharedCache is not None:
+            sharedCache[key] = (result,)
+        return result
+    wrapper.memoSlot = slot
+    return wrapper
+
+
 class State(ABC):
+    # subclasses may declare __slots__ to drop the per node __dict__
+    __slots__ = ()
     parent_hash = None
     depth = 0
+    # attributes holding the results of the memoized methods of the class, filled in by __init_subclass__
+    _memoSlots = ()
+    # optional cache keyed by position hash shared by every state of a class, see useSharedCache
+    sharedCache = None
+
+    @classmethod
+    def useSharedCache(cls, maxEntries=2 ** 20):
+        """
+        Share the memoized(shared=True) results between states of this class with the same hash, least recently used
+        entries are evicted past maxEntries. maxEntries=None removes the cache
+        """
+        from TranspositionTable import LRUTable
+        cls.sharedCache = None if maxEntries is None else LRUTable(maxBytes=None, maxEntries=maxEntries)
+        return cls.sharedCache
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._memoSlots = tuple(sorted({attribute.memoSlot for klass in cls.__mro__ for attribute in vars(klass).values()
+                                       if hasattr(attribute, 'memoSlot')}))
+        # without a __dict__, every memoized result needs its slot
+        if not any('__dict__' in vars(klass) for klass in cls.__mro__):
+            missing = [slot for slot in cls._memoSlots if not any(slot in vars(klass) for klass in cls.__mro__)]
+            if missing:
+                raise TypeError(f"{cls.__name__}.__slots__ lacks {', '.join(missing)}, needed by its memoized methods")
+
+    # Forget the memoized results, to be called whenever the position of the state changes
+    def invalidate(self):
+        for slot in self._memoSlots:
+            if hasattr(self, slot):
+                delattr(self, slot)
+
     @abstractmethod
     def isEnd(self):
         pass
@@ -32,3 +109,33 @@ class State(ABC):
         return copy.deepcopy(self)
 
 
+class GameRules:
+    """
+    Immutable rule data of a game (board size, movement tables, zobrist keys...), one instance is shared by
+    every state of that game instead of each state holding its own copy.
+    """
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def bytesPerNode(state):
+    """
+    Approximate memory held by a single state: the object plus everything it references,
+    except GameRules and other objects shared by all states (classes, modules, functions)
+    """
+    shared = (GameRules, type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+    seen = set()
+    total = 0
+    pending = [state]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, shared):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return total
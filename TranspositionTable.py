@@ -1,19 +1,342 @@
+import sys
+from array import array
+from collections import OrderedDict
+from functools import partial
+
+from BloomFilter import BloomFilter, _mix64, MASK64
+
+
+class LRUTable:
+    """
+    Bounded in-memory hot tier in front of an optional backing table (any dict like store, e.g. a shelve).
+    Least recently used entries are evicted once maxBytes or maxEntries is exceeded. Stores only go to the hot
+    tier and dirty entries are written back to the backing table when evicted or on flush(), so the backing
+    table only sees cold traffic. Without a backing table evicted entries are dropped.
+    """
+    # rough size of an OrderedDict slot and its linked list node
+    ENTRY_OVERHEAD = 100
+
+    def __init__(self, backingTable=None, maxBytes=64 * 2 ** 20, maxEntries=None):
+        self.backingTable = backingTable
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        # key -> (entry, isDirty)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writeBacks = 0
+
+    def _entryBytes(self, key, entry):
+        size = sys.getsizeof(key) + self.ENTRY_OVERHEAD + sys.getsizeof(entry)
+        if isinstance(entry, tuple):
+            size += sum(sys.getsizeof(field) for field in entry)
+        return size
+
+    def _insert(self, key, entry, isDirty):
+        if key in self.entries:
+            self.bytes -= self._entryBytes(key, self.entries[key][0])
+        self.entries[key] = (entry, isDirty)
+        self.entries.move_to_end(key)
+        self.bytes += self._entryBytes(key, entry)
+        self._evict()
+
+    def _evict(self):
+        while self.entries and (
+                (self.maxBytes is not None and self.bytes > self.maxBytes)
+                or (self.maxEntries is not None and len(self.entries) > self.maxEntries)
+        ):
+            key, (entry, isDirty) = self.entries.popitem(last=False)
+            self.bytes -= self._entryBytes(key, entry)
+            self.evictions += 1
+            if isDirty and self.backingTable is not None:
+                self.backingTable[key] = entry
+                self.writeBacks += 1
+
+    # Returns the entry and promotes it to the hot tier, None if it is in neither tier
+    def _lookup(self, key):
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return cached[0]
+        self.misses += 1
+        if self.backingTable is not None and key in self.backingTable:
+            entry = self.backingTable[key]
+            self._insert(key, entry, isDirty=False)
+            return entry
+        return None
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __getitem__(self, key):
+        entry = self._lookup(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def get(self, key, default=None):
+        entry = self._lookup(key)
+        return default if entry is None else entry
+
+    def __setitem__(self, key, entry):
+        self._insert(key, entry, isDirty=True)
+
+    def flush(self):
+        if self.backingTable is None:
+            return
+        for key, (entry, isDirty) in self.entries.items():
+            if isDirty:
+                self.backingTable[key] = entry
+                self.writeBacks += 1
+                self.entries[key] = (entry, False)
+
+    def items(self):
+        if self.backingTable is None:
+            return [(key, entry) for key, (entry, _) in self.entries.items()]
+        self.flush()
+        return self.backingTable.items()
+
+    def __len__(self):
+        if self.backingTable is None:
+            return len(self.entries)
+        self.flush()
+        return len(self.backingTable)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'writeBacks': self.writeBacks,
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+        }
+
+    def close(self):
+        self.flush()
+        if hasattr(self.backingTable, 'close'):
+            self.backingTable.close()
+
+
+class CompactTable:
+    """
+    Open addressing table of bit-packed entries, about keyBits / 8 + 8 bytes per slot instead of a tuple per state.
+    Only a keyBits wide fragment of the key is kept, two keys with the same fragment are the same entry
+    (see CollisionAudit to pick a width). parent_hash is not kept and reads back as None.
+
+    Entry word: present (1 bit), value (2 bits: None, inf, -inf, 0), isEnd, isFirstPlayerTurn, one optional 2-bit
+    flag (e.g. an alpha-beta bound, given as the only extra argument of store), depth and nextBestMove (16 bits each,
+    0xFFFF for None, nextBestMove being a 16-bit move code).
+    """
+    MAX_LOAD = 0.7
+    NONE_16 = 0xFFFF
+    VALUES = (None, float('inf'), float('-inf'), 0)
+
+    def __init__(self, keyBits=64, capacity=1024):
+        if keyBits % 8:
+            raise ValueError("keyBits must be a multiple of 8")
+        self.keyBits = keyBits
+        self.keyBytes = keyBits // 8
+        self.keyMask = (1 << keyBits) - 1
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.keys = bytearray(capacity * self.keyBytes)
+        self.entries = array('Q', bytes(8 * capacity))
+
+    def _fragment(self, key):
+        return key & self.keyMask
+
+    # Slot of the fragment, or of the empty slot where it would go
+    def _slot(self, fragment):
+        keyBytes = self.keyBytes
+        fragmentBytes = fragment.to_bytes(keyBytes, 'little')
+        mask = self.capacity - 1
+        slot = _mix64((fragment ^ (fragment >> 64)) & MASK64) & mask
+        while self.entries[slot] and self.keys[slot * keyBytes:(slot + 1) * keyBytes] != fragmentBytes:
+            slot = (slot + 1) & mask
+        return slot
+
+    @classmethod
+    def pack(cls, entry):
+        value, depth, isEnd, parent_hash, isFirstPlayerTurn, nextBestMove, *args = entry
+        if value not in cls.VALUES:
+            raise ValueError(f"Compact entries only hold game results, got {value}")
+        if len(args) > 1 or (args and args[0] not in (0, 1, 2, 3)):
+            raise ValueError("Compact entries hold at most one extra flag in [0, 3]")
+        depth = cls.NONE_16 if depth is None else depth
+        nextBestMove = cls.NONE_16 if nextBestMove is None else nextBestMove
+        if not 0 <= depth <= cls.NONE_16 or not 0 <= nextBestMove <= cls.NONE_16:
+            raise ValueError("depth and nextBestMove must fit in 16 bits")
+        word = 1 | cls.VALUES.index(value) << 1 | bool(isEnd) << 3 | bool(isFirstPlayerTurn) << 4
+        if args:
+            word |= 1 << 5 | args[0] << 6
+        return word | depth << 8 | nextBestMove << 24
+
+    @classmethod
+    def unpack(cls, word):
+        depth = (word >> 8) & 0xFFFF
+        nextBestMove = (word >> 24) & 0xFFFF
+        entry = (cls.VALUES[(word >> 1) & 3], None if depth == cls.NONE_16 else depth, bool(word >> 3 & 1), None,
+                 bool(word >> 4 & 1), None if nextBestMove == cls.NONE_16 else nextBestMove)
+        if word >> 5 & 1:
+            entry += ((word >> 6) & 3,)
+        return entry
+
+    def __setitem__(self, key, entry):
+        fragment = self._fragment(key)
+        slot = self._slot(fragment)
+        if not self.entries[slot]:
+            if (self.count + 1) > self.capacity * self.MAX_LOAD:
+                self._grow()
+                slot = self._slot(fragment)
+            self.count += 1
+            self.keys[slot * self.keyBytes:(slot + 1) * self.keyBytes] = fragment.to_bytes(self.keyBytes, 'little')
+        self.entries[slot] = self.pack(entry)
+
+    def _grow(self):
+        old = list(self._slots())
+        self._allocate(self.capacity * 2)
+        for fragment, word in old:
+            slot = self._slot(fragment)
+            self.keys[slot * self.keyBytes:(slot + 1) * self.keyBytes] = fragment.to_bytes(self.keyBytes, 'little')
+            self.entries[slot] = word
+            self.count += 1
+
+    def _slots(self):
+        keyBytes = self.keyBytes
+        for slot, word in enumerate(self.entries):
+            if word:
+                yield int.from_bytes(self.keys[slot * keyBytes:(slot + 1) * keyBytes], 'little'), word
+
+    def get(self, key, default=None):
+        word = self.entries[self._slot(self._fragment(key))]
+        return self.unpack(word) if word else default
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key):
+        return self.entries[self._slot(self._fragment(key))] != 0
+
+    def items(self):
+        return [(fragment, self.unpack(word)) for fragment, word in self._slots()]
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return len(self.keys) + self.entries.itemsize * len(self.entries)
+
+
+def _shelveBackend(name):
+    import shelve
+    # shelve only accepts str keys
+    return shelve.open(name), str
+
+
+def _memoryBackend(name):
+    return {}, int
+
+
+def _shelveLRUBackend(name):
+    table, toKey = _shelveBackend(name)
+    return LRUTable(table), toKey
+
+
+def _sharedBackend(name):
+    from multiprocessing import Manager
+    # dict living in a manager process, the proxy pickles so worker processes see the same table.
+    # The proxy keeps the manager alive as long as the table is open in this process
+    return Manager().dict(), int
+
+
+def _compactBackend(name, keyBits):
+    return CompactTable(keyBits), int
+
+
 class TranspositionTable:
-    def __init__(self, persitanceOption="shelve", name="table.db"):
-        if persitanceOption == "shelve":
-            import shelve
-            self.table = shelve.open(name)
-        elif persitanceOption == "memory":
-            self.table = {}
+    # persitanceOption -> factory(name) returning (table, key conversion), register new backends here
+    backends = {
+        "shelve": _shelveBackend,
+        "memory": _memoryBackend,
+        "shelve-lru": _shelveLRUBackend,
+        "shared": _sharedBackend,
+        "compact": partial(_compactBackend, keyBits=64),
+        "compact-32": partial(_compactBackend, keyBits=32),
+        "compact-128": partial(_compactBackend, keyBits=128),
+    }
+
+    def __init__(self, persitanceOption="shelve", name="table.db", cacheBytes=None, expectedStates=None,
+                 falsePositiveRate=0.01):
+        """
+        :param persitanceOption: One of TranspositionTable.backends
+        :param name: File name for persistent backends
+        :param cacheBytes: If set, put a LRUTable of that many bytes in front of the backend
+        :param expectedStates: If set, keep a BloomFilter sized for that many states in front of the table,
+         so that most lookups of unknown states never reach the backend
+        :param falsePositiveRate: Target false positive rate of the BloomFilter
+        """
+        if persitanceOption not in self.backends:
+            raise ValueError(f"Unknown persistence option {persitanceOption}, expected one of {list(self.backends)}")
+        self.persitanceOption = persitanceOption
+        self.name = name
+        self.table, self._toKey = self.backends[persitanceOption](name)
+        if cacheBytes is not None:
+            self.table = LRUTable(self.table, maxBytes=cacheBytes)
+
+        self.prefilter = None
+        if expectedStates is not None:
+            self.prefilter = BloomFilter(expectedStates, falsePositiveRate)
+            # a persistent table may already hold states from an earlier run
+            for state_hash, _ in self.items():
+                self.prefilter.add(state_hash)
 
     def store(self, state_hash, value, depth, isEnd, parent_hash, isFirstPlayerTurn, nextBestMove, *args):
-        self.table[state_hash] = (value, depth, isEnd, parent_hash, isFirstPlayerTurn, nextBestMove, *args)
+        if self.prefilter is not None:
+            self.prefilter.add(state_hash)
+        self.table[self._toKey(state_hash)] = (value, depth, isEnd, parent_hash, isFirstPlayerTurn, nextBestMove, *args)
 
     def retrieve(self, state_hash):
-        if state_hash in self.table:
-            return self.table[state_hash]
-        else:
+        if self.prefilter is not None and state_hash not in self.prefilter:
             return None
+        entry = self.table.get(self._toKey(state_hash))
+        if entry is None and self.prefilter is not None:
+            self.prefilter.recordFalsePositive()
+        return entry
 
     def contains(self, state_hash):
-        return state_hash in self.table
+        if self.prefilter is not None and state_hash not in self.prefilter:
+            return False
+        found = self._toKey(state_hash) in self.table
+        if not found and self.prefilter is not None:
+            self.prefilter.recordFalsePositive()
+        return found
+
+    # yields (state_hash, entry) for every stored state
+    def items(self):
+        for key, entry in self.table.items():
+            yield int(key), entry
+
+    def __len__(self):
+        return len(self.table)
+
+    # hit / miss / eviction counters of the in-memory tier, None without one
+    def cacheStats(self):
+        return self.table.stats() if isinstance(self.table, LRUTable) else None
+
+    # query counters and measured false positive rate of the prefilter, None without one
+    def prefilterStats(self):
+        return self.prefilter.stats() if self.prefilter is not None else None
+
+    def close(self):
+        if hasattr(self.table, 'close'):
+            self.table.close()
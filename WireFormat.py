@@ -0,0 +1,196 @@
+"""
+Binary batch of positions of one BitboardManager, to send many states between processes without pickling managers.
+
+Layout (little-endian, every section starts on an 8-byte boundary):
+    header  : magic b'BBWF', version (uint16), sizeI, sizeJ, pieces, limbs, extraWords (uint16 each),
+              count (uint64), zobrist (uint8, 1 if the zobrist table follows), 7 pad bytes
+    ids     : per piece its id then its side as text (see BitboardManager.buildBitboard), each a uint16 length
+              then utf-8 bytes, padded to 8 bytes
+    zobrist : pieces * sizeI * sizeJ uint64 keys in piece then square order, only if zobrist is 1
+    records : count records of (pieces * limbs + extraWords) uint64
+
+A bitboard takes limbs = ceil(sizeI * sizeJ / 64) words, least significant first, as in bitboardBatch, so the
+records viewed with WireBatch.words() are a (count, pieces, limbs) uint64 array without any copy. Big-endian machines
+read the records and the zobrist table through a byteswapped copy, words() still shares the buffer. Extra words hold
+whatever the caller needs per record (side to move, depth, parent hash...). The zobrist table is part of the batch
+header, sent once for all the records instead of once per state as with BitboardManager.dumpInfo.
+
+The buffer goes as is through Connection.send_bytes / recv_bytes, or into shared memory with toSharedMemory.
+"""
+import struct
+import sys
+from array import array
+
+from bitboard import BitboardManager
+
+MAGIC = b'BBWF'
+VERSION = 2
+HEADER = struct.Struct('<4sHHHHHHQB7x')
+WORD_BYTES = 8
+
+
+def _pad(size):
+    return -size % WORD_BYTES
+
+
+def _limbs(sizeI, sizeJ):
+    return max(1, -(-(sizeI * sizeJ) // 64))
+
+
+def _encodeText(text):
+    encoded = str(text).encode('utf-8')
+    return struct.pack('<H', len(encoded)) + encoded
+
+
+def _words(view):
+    # the little-endian uint64 words of view, cast in place on little-endian machines
+    if sys.byteorder == 'little':
+        return view.cast('Q')
+    words = array('Q', view.tobytes())
+    words.byteswap()
+    return words
+
+
+def encodeHeader(bm: BitboardManager, count, extraWords=0, includeZobrist=True):
+    """
+    :param count: Number of records that follow
+    :param includeZobrist: Send the zobrist table of bm (generated if needed), requires useZobrist
+    """
+    pieceIds = list(bm.bitboardManager)
+    limbs = _limbs(bm.sizeI, bm.sizeJ)
+    header = bytearray(HEADER.pack(MAGIC, VERSION, bm.sizeI, bm.sizeJ, len(pieceIds), limbs, extraWords, count,
+                                   1 if includeZobrist else 0))
+    for pieceId in pieceIds:
+        header += _encodeText(pieceId) + _encodeText(bm.sides[pieceId])
+    header += bytes(_pad(len(header)))
+    if includeZobrist:
+        bm._zobristGuard()
+        keys = [bm.zobristTable[(pieceId, *bm._index1dTo2d(square))]
+                for pieceId in pieceIds for square in range(bm.sizeI * bm.sizeJ)]
+        header += struct.pack(f'<{len(keys)}Q', *keys)
+    return header
+
+
+def encodePositions(bm: BitboardManager, positions, extras=None, includeZobrist=True):
+    """
+    :param positions: List of positions of bm (see BitboardManager.getPosition)
+    :param extras: Optional list with a tuple of extraWords unsigned 64-bit ints per position
+    :return: bytearray holding the whole batch
+    """
+    positions = list(positions)
+    extraWords = len(extras[0]) if extras else 0
+    buffer = encodeHeader(bm, len(positions), extraWords, includeZobrist)
+    limbBytes = _limbs(bm.sizeI, bm.sizeJ) * WORD_BYTES
+    extraFormat = struct.Struct(f'<{extraWords}Q')
+    for index, position in enumerate(positions):
+        for data in position:
+            buffer += data.to_bytes(limbBytes, 'little')
+        if extraWords:
+            buffer += extraFormat.pack(*extras[index])
+    return buffer
+
+
+class WireBatch:
+    """
+    Read side of a batch, over any buffer (bytes, bytearray, mmap, shared memory) without copying the records
+    """
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast('B')
+        magic, version, self.sizeI, self.sizeJ, pieces, self.limbs, self.extraWords, self.count, hasZobrist \
+            = HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a wire batch")
+
+        offset = HEADER.size
+        texts = []
+        for _ in range(2 * pieces):
+            length, = struct.unpack_from('<H', self.view, offset)
+            texts.append(bytes(self.view[offset + 2:offset + 2 + length]).decode('utf-8'))
+            offset += 2 + length
+        offset += _pad(offset)
+        self.pieceIds = texts[0::2]
+        self.sides = texts[1::2]
+
+        squareCount = self.sizeI * self.sizeJ
+        self.zobristKeys = None
+        if hasZobrist:
+            zobristEnd = offset + pieces * squareCount * WORD_BYTES
+            self.zobristKeys = _words(self.view[offset:zobristEnd])
+            offset = zobristEnd
+
+        self.recordWords = pieces * self.limbs + self.extraWords
+        self.recordBytes = self.view[offset:offset + self.count * self.recordWords * WORD_BYTES]
+        self.records = _words(self.recordBytes)
+
+    def __len__(self):
+        return self.count
+
+    def position(self, index):
+        """
+        :return: Tuple of bitboard data of record index
+        """
+        start = index * self.recordWords
+        if self.limbs == 1:
+            return tuple(self.records[start:start + len(self.pieceIds)])
+        raw = self.recordBytes[start * WORD_BYTES:(start + len(self.pieceIds) * self.limbs) * WORD_BYTES].tobytes()
+        limbBytes = self.limbs * WORD_BYTES
+        return tuple(int.from_bytes(raw[k:k + limbBytes], 'little') for k in range(0, len(raw), limbBytes))
+
+    def extra(self, index):
+        start = index * self.recordWords + len(self.pieceIds) * self.limbs
+        return tuple(self.records[start:start + self.extraWords])
+
+    def positions(self):
+        for index in range(self.count):
+            yield self.position(index)
+
+    def words(self):
+        """
+        Bitboards of all records as a read-only (count, pieces, limbs) uint64 array sharing the buffer, requires numpy
+        """
+        import numpy as np
+        records = np.frombuffer(self.recordBytes, dtype='<u8').reshape(self.count, self.recordWords)
+        return records[:, :len(self.pieceIds) * self.limbs].reshape(self.count, len(self.pieceIds), self.limbs)
+
+    def zobristTable(self):
+        """
+        :return: The zobrist table in BitboardManager form, None if the batch has none
+        """
+        if self.zobristKeys is None:
+            return None
+        squareCount = self.sizeI * self.sizeJ
+        return {(pieceId, *divmod(square, self.sizeJ)): self.zobristKeys[k * squareCount + square]
+                for k, pieceId in enumerate(self.pieceIds) for square in range(squareCount)}
+
+    def manager(self):
+        """
+        :return: BitboardManager with the geometry, pieces, sides and zobrist table of the batch, at the first position
+        """
+        bm = BitboardManager(self.sizeI, self.sizeJ, useZobrist=self.zobristKeys is not None)
+        for pieceId, side in zip(self.pieceIds, self.sides):
+            bm.buildBitboard(pieceId, side=side)
+        bm.zobristTable = self.zobristTable()
+        if self.count:
+            bm.setPosition(self.position(0))
+        return bm
+
+    def release(self):
+        # drop the views, e.g. before closing the shared memory holding the batch
+        for words in (self.records, self.zobristKeys):
+            if isinstance(words, memoryview):
+                words.release()
+        self.recordBytes.release()
+        self.view.release()
+
+
+def toSharedMemory(buffer):
+    """
+    Copy a batch into a new shared memory block, other processes open it with SharedMemory(name) and
+    read it with WireBatch(sharedMemory.buf). The caller closes and unlinks it.
+    :return: multiprocessing.shared_memory.SharedMemory
+    """
+    from multiprocessing import shared_memory
+    sharedMemory = shared_memory.SharedMemory(create=True, size=max(1, len(buffer)))
+    sharedMemory.buf[:len(buffer)] = buffer
+    return sharedMemory
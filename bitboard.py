@@ -1,15 +1,69 @@
 import time
+from array import array
 from functools import lru_cache, reduce
+from operator import or_
 import random
 from typing import Union, Dict, List
 
+from LineDetector import LineDetector
+
+# Encoded move, a 16-bit int: to square (bits 0-5), from square (bits 6-11), piece index (bits 12-14), capture (bit 15).
+# Squares are i * sizeJ + j, so boards up to 64 squares with up to 8 bitboards.
+MOVE_SQUARE_BITS = 6
+MOVE_SQUARE_MASK = (1 << MOVE_SQUARE_BITS) - 1
+MOVE_PIECE_SHIFT = 2 * MOVE_SQUARE_BITS
+MOVE_PIECE_MASK = 0b111
+MOVE_CAPTURE_FLAG = 1 << 15
+
+# offsets of the neighbors of a square, see BitboardManager.dilate
+NEIGHBORHOOD_4 = ((-1, 0), (1, 0), (0, -1), (0, 1))
+NEIGHBORHOOD_8 = NEIGHBORHOOD_4 + ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+# directions of sliding pieces, see BitboardManager.slidingAttacks
+ROOK_DIRECTIONS = NEIGHBORHOOD_4
+BISHOP_DIRECTIONS = NEIGHBORHOOD_8[4:]
+QUEEN_DIRECTIONS = NEIGHBORHOOD_8
+
+
+@lru_cache(maxsize=None)
+def rayMasks(sizeI, sizeJ, offsetI, offsetJ):
+    """
+    :return: Tuple indexed by square of the squares a slider reaches in direction (offsetI, offsetJ) on an empty board
+    """
+    rays = []
+    for square in range(sizeI * sizeJ):
+        i, j = divmod(square, sizeJ)
+        ray = 0
+        i, j = i + offsetI, j + offsetJ
+        while 0 <= i < sizeI and 0 <= j < sizeJ:
+            ray |= 1 << (i * sizeJ + j)
+            i, j = i + offsetI, j + offsetJ
+        rays.append(ray)
+    return tuple(rays)
+
 
 class Bitboard:
+    # the manager holding this bitboard and its id there, set by BitboardManager._addBitboard
+    manager = None
+    bitboardId = None
+
     def __init__(self, data: int, sizeI, sizeJ):
-        self.data = data
+        self._data = data
         self.sizeI = sizeI
         self.sizeJ = sizeJ
 
+    # writes go through the manager, which updates its occupancy unions with the bits that changed
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        if self.manager is None:
+            self._data = data
+        else:
+            self.manager._writeData(self.bitboardId, data)
+
     def __str__(self):
         return str(self.data)
 
@@ -17,6 +71,22 @@ class Bitboard:
 # start from top left to bottom right, i.e 1 = 1 at (0,0)
 class BitboardManager:
     def __init__(self, sizeI=0, sizeJ=0, useZobrist=False, zobristSeed=None, infoDump=None):
+        # incremental evaluation, see attachEvaluator
+        self.evaluator = None
+        self.evaluationTable = None
+        self.evaluation = 0
+        # occupancy unions, updated by the mutators below and by writes to Bitboard.data with the bits they set and
+        # clear, see buildBitboard
+        self.sides = {}
+        self.sideMembers = {}
+        self.sideOccupancy = {}
+        self.occupancy = 0
+        # squares held by more than one bitboard, the only ones whose occupancy needs a recount when cleared
+        self._overlap = 0
+        # bitboard ids in build order and their index in encoded moves, rebuilt by _addBitboard
+        self._pieceIds = ()
+        self._pieceIndices = {}
+        self._bitboardSides = ()
         if infoDump is not None:
             self.loadInfo(infoDump)
             return
@@ -26,21 +96,125 @@ class BitboardManager:
         self.sizeJ = sizeJ
         self.useZobrist = useZobrist
         if zobristSeed is None:
-            self.zobristSeed = time.time()
+            zobristSeed = time.time()
         self.zobristSeed = zobristSeed
         self.zobristTable = None
 
     def dumpInfo(self):
-        return (self.bitboardManager, self.sizeI, self.sizeJ, self.zobristSeed, self.zobristTable)
+        return (self.bitboardManager, self.sizeI, self.sizeJ, self.zobristSeed, self.zobristTable, self.sides)
 
+    # Bitboards are copied, dumps without sides (5-tuples) group every bitboard on its own
     def loadInfo(self, infoDump):
-        self.bitboardManager, self.sizeI, self.sizeJ, self.zobristSeed, self.zobristTable = infoDump
+        bitboards, self.sizeI, self.sizeJ, self.zobristSeed, self.zobristTable, *sides = infoDump
+        sides = sides[0] if sides else {}
+        self.bitboardManager = {}
+        for bitboardId, bitboard in bitboards.items():
+            self._addBitboard(bitboardId, Bitboard(bitboard.data, bitboard.sizeI, bitboard.sizeJ),
+                              sides.get(bitboardId, bitboardId))
 
     def __getitem__(self, item):
         return self.bitboardManager[item]
 
     def __setitem__(self, key, value):
-        self.bitboardManager[key] = value
+        side = self.sides.get(key, key)
+        self._addBitboard(key, value, side)
+
+    def _addBitboard(self, bitboardId, bitboard, side):
+        previous = self.bitboardManager.get(bitboardId)
+        if previous is not None:
+            previous.manager = None
+            self.sideMembers[self.sides[bitboardId]].remove(previous)
+            if not self.sideMembers[self.sides[bitboardId]]:
+                del self.sideMembers[self.sides[bitboardId]]
+        self.bitboardManager[bitboardId] = bitboard
+        bitboard.manager = self
+        bitboard.bitboardId = bitboardId
+        self._pieceIds = tuple(self.bitboardManager)
+        self._pieceIndices = {pieceId: index for index, pieceId in enumerate(self._pieceIds)}
+        self.sides[bitboardId] = side
+        self.sideMembers.setdefault(side, []).append(bitboard)
+        self._bitboardSides = tuple((self.bitboardManager[pieceId], self.sides[pieceId]) for pieceId in self._pieceIds)
+        self.refreshOccupancy()
+        if self.evaluator is not None:
+            # the new bitboard needs its weights
+            self.evaluationTable = self.evaluator.squareTable(self)
+            self.refreshEvaluation()
+
+    def refreshOccupancy(self):
+        # full recompute, for new bitboards
+        self.sideOccupancy = {side: reduce(or_, [bitboard._data for bitboard in members], 0)
+                              for side, members in self.sideMembers.items()}
+        self.occupancy = reduce(or_, self.sideOccupancy.values(), 0)
+        self._overlap = self._heldTwice(~0)
+
+    def _heldTwice(self, squares):
+        # squares of squares set in at least two bitboards
+        once = twice = 0
+        for bitboard in self.bitboardManager.values():
+            data = bitboard._data & squares
+            twice |= once & data
+            once |= data
+        return twice
+
+    def _occupy(self, side, bits):
+        # bits were just set in a bitboard of side that did not hold them
+        self._overlap |= bits & self.occupancy
+        self.sideOccupancy[side] |= bits
+        self.occupancy |= bits
+
+    def _vacate(self, side, bits):
+        # bits were just cleared in a bitboard of side
+        shared = bits & self._overlap
+        if shared:
+            # recount the squares another bitboard may still hold
+            bits &= ~shared
+            held = reduce(or_, [bitboard._data & shared for bitboard in self.bitboardManager.values()], 0)
+            sideHeld = reduce(or_, [bitboard._data & shared for bitboard in self.sideMembers[side]], 0)
+            self.sideOccupancy[side] &= ~(shared & ~sideHeld)
+            self.occupancy &= ~(shared & ~held)
+            self._overlap = self._overlap & ~shared | self._heldTwice(shared)
+        self.sideOccupancy[side] &= ~bits
+        self.occupancy &= ~bits
+
+    def _writeData(self, bitboardId, data):
+        # replace the data of a bitboard, occupancy follows the bits that changed
+        bitboard = self.bitboardManager[bitboardId]
+        side = self.sides[bitboardId]
+        previous = bitboard._data
+        bitboard._data = data
+        removed = previous & ~data
+        added = data & ~previous
+        if self.evaluator is not None:
+            weights = self.evaluationTable[bitboardId]
+            self.evaluation += sum(weights[square] for square in self.getIndexOfSetBits(added)) \
+                - sum(weights[square] for square in self.getIndexOfSetBits(removed))
+        if removed:
+            if removed & self._overlap:
+                self._vacate(side, removed)
+            else:
+                self.sideOccupancy[side] &= ~removed
+                self.occupancy &= ~removed
+        if added:
+            self._overlap |= added & self.occupancy
+            self.sideOccupancy[side] |= added
+            self.occupancy |= added
+
+    def getOccupancy(self, side=None):
+        """
+        :param side: Side given to buildBitboard, None for every piece
+        :return: Union of the bitboards of side
+        """
+        return self.occupancy if side is None else self.sideOccupancy[side]
+
+    def sideOf(self, bitboardId):
+        return self.sides[bitboardId]
+
+    def legalDestinations(self, bitboardId, destinations):
+        """
+        :param destinations: Bitboard of candidate destination squares
+        :return: destinations without the squares held by the side of bitboardId
+        """
+        return destinations & ~self.sideOccupancy[self.sides[bitboardId]]
 
     def translateMailboxToBitboards(self, board):
         sizeI = len(board)
@@ -66,14 +240,73 @@ class BitboardManager:
                         board[i][j] = bitboardId
         return board
 
-    def buildBitboard(self, bitboardId, sizeI=None, sizeJ=None):
+    # Position is the tuple of bitboard data, in the order the bitboards were built
+    def getPosition(self):
+        return tuple(bitboard._data for bitboard in self.bitboardManager.values())
+
+    def setPosition(self, position):
+        # every bitboard is written, so the unions are rebuilt in the same pass rather than patched bit by bit
+        if len(position) != len(self._bitboardSides):
+            raise ValueError(f"Position has {len(position)} bitboards, expected {len(self._bitboardSides)}")
+        sideOccupancy = dict.fromkeys(self.sideOccupancy, 0)
+        occupancy = overlap = 0
+        for (bitboard, side), data in zip(self._bitboardSides, position):
+            bitboard._data = data
+            overlap |= occupancy & data
+            occupancy |= data
+            sideOccupancy[side] |= data
+        self.sideOccupancy = sideOccupancy
+        self.occupancy = occupancy
+        self._overlap = overlap
+        if self.evaluator is not None:
+            self.refreshEvaluation()
+
+    def attachEvaluator(self, evaluator):
+        """
+        Keep self.evaluation equal to evaluator.evaluate(self). Every mutator and write to Bitboard.data updates it
+        incrementally, with the weights of the squares that changed
+        :param evaluator: Evaluation.Evaluator, None to stop evaluating
+        """
+        self.evaluator = evaluator
+        self.evaluationTable = None if evaluator is None else evaluator.squareTable(self)
+        self.refreshEvaluation()
+
+    def refreshEvaluation(self):
+        self.evaluation = 0 if self.evaluator is None else self.evaluator.evaluate(self)
+        return self.evaluation
+
+    def translateBatchToPlanes(self, positions, dtype=None):
+        """
+        Convert many positions (see getPosition) to a (N, pieces, sizeI, sizeJ) plane tensor, requires numpy
+        :param positions: Iterable of positions of this manager
+        :param dtype: np.uint8 (default) or bool
+        :return: numpy array, plane index follows the order of self.bitboardManager
+        """
+        import numpy as np
+        from bitboardBatch import positionsToWords, wordsToPlanes
+        words = positionsToWords(positions, self.sizeI, self.sizeJ)
+        return wordsToPlanes(words, self.sizeI, self.sizeJ, np.uint8 if dtype is None else dtype)
+
+    def translateBatchFromPlanes(self, planes):
+        """
+        Inverse of translateBatchToPlanes, requires numpy
+        :param planes: Array of shape (N, pieces, sizeI, sizeJ)
+        :return: List of positions
+        """
+        from bitboardBatch import planesToWords, wordsToPositions
+        return wordsToPositions(planesToWords(planes))
+
+    def buildBitboard(self, bitboardId, sizeI=None, sizeJ=None, side=None):
+        """
+        :param side: Pieces of the same side cannot capture each other, defaults to bitboardId (a side of its own)
+        """
         if sizeI is None:
             sizeI = self.sizeI
         if sizeJ is None:
             sizeJ = self.sizeJ
 
         bitboardId = self.enforceStringTypeId(bitboardId)
-        self.bitboardManager[bitboardId] = Bitboard(0, sizeI, sizeJ)
+        self._addBitboard(bitboardId, Bitboard(0, sizeI, sizeJ), bitboardId if side is None else side)
         self.sizeI = sizeI
         self.sizeJ = sizeJ
 
@@ -119,7 +352,17 @@ class BitboardManager:
         if not self.isInBound(i, j):
             return
         piecePosition = (i * bitboard.sizeJ) + j
-        bitboard.data = bitboard.data | (1 << piecePosition)
+        bit = 1 << piecePosition
+        if bitboard._data & bit:
+            return
+        if self.evaluator is not None:
+            self.evaluation += self.evaluationTable[bitboardId][piecePosition]
+        bitboard._data |= bit
+        # _occupy inlined, this is the hottest mutator
+        if self.occupancy & bit:
+            self._overlap |= bit
+        self.sideOccupancy[self.sides[bitboardId]] |= bit
+        self.occupancy |= bit
 
     def deletePiece(self, bitboardId, i, j):
         bitboardId = self.enforceStringTypeId(bitboardId)
@@ -127,31 +370,267 @@ class BitboardManager:
         if not self.isInBound(i, j):
             return
         piecePosition = (i * bitboard.sizeJ) + j
-        bitboard.data = bitboard.data & ~(1 << piecePosition)
+        bit = 1 << piecePosition
+        if not bitboard._data & bit:
+            return
+        if self.evaluator is not None:
+            self.evaluation -= self.evaluationTable[bitboardId][piecePosition]
+        bitboard._data ^= bit
+        if self._overlap & bit:
+            self._vacate(self.sides[bitboardId], bit)
+        else:
+            self.sideOccupancy[self.sides[bitboardId]] &= ~bit
+            self.occupancy &= ~bit
+
+    def pieceIndex(self, bitboardId):
+        return self._pieceIndices[bitboardId]
+
+    def _checkMoveEncoding(self, pieceIndex):
+        # every square of the board and the piece index must fit in the fields of a move code
+        if pieceIndex > MOVE_PIECE_MASK or self.sizeI * self.sizeJ > MOVE_SQUARE_MASK + 1:
+            raise ValueError("Encoded moves hold up to 8 bitboards and 64 squares")
+
+    def encodeMove(self, bitboardId, fromI, fromJ, toI, toJ, isCapture=False):
+        """
+        :return: 16-bit move code, see MOVE_SQUARE_BITS
+        """
+        pieceIndex = self.pieceIndex(bitboardId)
+        fromSquare = fromI * self.sizeJ + fromJ
+        toSquare = toI * self.sizeJ + toJ
+        if pieceIndex > MOVE_PIECE_MASK or max(fromSquare, toSquare) > MOVE_SQUARE_MASK:
+            raise ValueError("Encoded moves hold up to 8 bitboards and 64 squares")
+        return (MOVE_CAPTURE_FLAG if isCapture else 0) | pieceIndex << MOVE_PIECE_SHIFT \
+            | fromSquare << MOVE_SQUARE_BITS | toSquare
+
+    def decodeMove(self, move):
+        """
+        :return: (bitboardId, fromI, fromJ, toI, toJ, isCapture)
+        """
+        bitboardId = self._pieceIds[(move >> MOVE_PIECE_SHIFT) & MOVE_PIECE_MASK]
+        fromI, fromJ = divmod((move >> MOVE_SQUARE_BITS) & MOVE_SQUARE_MASK, self.sizeJ)
+        toI, toJ = divmod(move & MOVE_SQUARE_MASK, self.sizeJ)
+        return bitboardId, fromI, fromJ, toI, toJ, bool(move & MOVE_CAPTURE_FLAG)
+
+    def generateEncodedMoves(self, bitboardId, movements):
+        """
+        Moves of every piece of bitboardId to in bound squares not holding a piece of the same side,
+        flagged as captures when another bitboard has a piece on the destination
+        :param movements: List of (offsetI, offsetJ)
+        :return: array('H') of encoded moves, numpy.frombuffer(moves, numpy.uint16) views it without a copy
+        """
+        bitboard = self.bitboardManager[bitboardId]
+        side = self.sides[bitboardId]
+        others = self.occupancy & ~self.sideOccupancy[side]
+        sizeJ = self.sizeJ
+        pieceIndex = self._pieceIndices[bitboardId]
+        self._checkMoveEncoding(pieceIndex)
+        pieceBits = pieceIndex << MOVE_PIECE_SHIFT
+
+        moves = array('H')
+        for offsetI, offsetJ in movements:
+            shift = offsetI * sizeJ + offsetJ
+            # every destination of the offset at once, then filtered with one AND-NOT
+            destinations = self.legalDestinations(bitboardId, self.shiftBitboard(bitboard.data, offsetI, offsetJ))
+            for toSquare in self.getIndexOfSetBits(destinations):
+                moves.append(pieceBits | (toSquare - shift) << MOVE_SQUARE_BITS | toSquare
+                             | (MOVE_CAPTURE_FLAG if (others >> toSquare) & 1 else 0))
+        return moves
+
+    def shiftBitboard(self, bits, offsetI, offsetJ):
+        """
+        Move every set bit by (offsetI, offsetJ), bits leaving the board are dropped
+        """
+        sizeJ = self.sizeJ
+        if offsetJ:
+            # columns that stay on their row after the shift
+            rowMask = ((1 << (sizeJ - abs(offsetJ))) - 1) << max(0, -offsetJ) if abs(offsetJ) < sizeJ else 0
+            # rowMask repeated on every row
+            bits &= rowMask * (((1 << (self.sizeI * sizeJ)) - 1) // ((1 << sizeJ) - 1))
+        shift = offsetI * sizeJ + offsetJ
+        bits = bits << shift if shift >= 0 else bits >> -shift
+        return bits & ((1 << (self.sizeI * sizeJ)) - 1)
+
+    def attacks(self, bits, offsets):
+        """
+        Squares reached from any set square by any of the offsets, one shift per offset whatever the number of pieces
+        :param offsets: List of (offsetI, offsetJ), e.g. the movements of a leaper
+        """
+        attacked = 0
+        for offsetI, offsetJ in offsets:
+            attacked |= self.shiftBitboard(bits, offsetI, offsetJ)
+        return attacked
+
+    def dilate(self, bits, neighborhood=None):
+        """
+        :param neighborhood: NEIGHBORHOOD_4, NEIGHBORHOOD_8 (default) or any offset list
+        :return: bits grown by one step of the neighborhood
+        """
+        return bits | self.attacks(bits, NEIGHBORHOOD_8 if neighborhood is None else neighborhood)
+
+    def erode(self, bits, neighborhood=None):
+        """
+        :return: Squares of bits whose whole neighborhood is in bits, squares off the board count as empty
+        """
+        eroded = bits
+        for offsetI, offsetJ in NEIGHBORHOOD_8 if neighborhood is None else neighborhood:
+            # a square stays if its neighbor at the offset is set, i.e. bits moved back by the offset
+            eroded &= self.shiftBitboard(bits, -offsetI, -offsetJ)
+        return eroded
+
+    def slidingAttacks(self, square, occupancy=None, directions=QUEEN_DIRECTIONS):
+        """
+        Squares a slider on square attacks, each ray stops at its first blocker, which is included (the caller drops
+        own pieces, e.g. with legalDestinations)
+        :param square: i * sizeJ + j
+        :param occupancy: Blocking squares, defaults to every piece of the manager
+        :param directions: ROOK_DIRECTIONS, BISHOP_DIRECTIONS, QUEEN_DIRECTIONS or any (offsetI, offsetJ) list
+        """
+        if occupancy is None:
+            occupancy = self.occupancy
+        attacked = 0
+        for offsetI, offsetJ in directions:
+            rays = rayMasks(self.sizeI, self.sizeJ, offsetI, offsetJ)
+            ray = rays[square]
+            blockers = ray & occupancy
+            if blockers:
+                # nearest blocker: lowest square on rays going up the board, highest on rays going down
+                if offsetI * self.sizeJ + offsetJ > 0:
+                    blocker = (blockers & -blockers).bit_length() - 1
+                else:
+                    blocker = blockers.bit_length() - 1
+                ray &= ~rays[blocker]
+            attacked |= ray
+        return attacked
+
+    def slidingAttacksFromAll(self, bits, occupancy=None, directions=QUEEN_DIRECTIONS):
+        """
+        Union of slidingAttacks of every square of bits, computed set-wise with an occluded fill per direction
+        (O(log board size) shifts per direction whatever the number of sliders)
+        """
+        if occupancy is None:
+            occupancy = self.occupancy
+        empty = ~occupancy & ((1 << (self.sizeI * self.sizeJ)) - 1)
+        attacked = 0
+        for offsetI, offsetJ in directions:
+            # Kogge-Stone: generator squares spread over empty squares, steps doubling each round
+            generator, propagator = bits, empty
+            step = 1
+            while step < max(self.sizeI, self.sizeJ):
+                generator |= propagator & self.shiftBitboard(generator, offsetI * step, offsetJ * step)
+                propagator &= self.shiftBitboard(propagator, offsetI * step, offsetJ * step)
+                step *= 2
+            # one more step reaches the blocker
+            attacked |= self.shiftBitboard(generator, offsetI, offsetJ)
+        return attacked
+
+    def generateSlidingMoves(self, bitboardId, directions):
+        """
+        generateEncodedMoves for sliders of bitboardId, rays stop at the first piece of any side
+        :return: array('H') of encoded moves
+        """
+        side = self.sides[bitboardId]
+        others = self.occupancy & ~self.sideOccupancy[side]
+        pieceIndex = self.pieceIndex(bitboardId)
+        self._checkMoveEncoding(pieceIndex)
+        pieceBits = pieceIndex << MOVE_PIECE_SHIFT
+
+        moves = array('H')
+        for fromSquare in self.getIndexOfSetBits(self.bitboardManager[bitboardId].data):
+            fromBits = pieceBits | fromSquare << MOVE_SQUARE_BITS
+            destinations = self.legalDestinations(bitboardId, self.slidingAttacks(fromSquare, directions=directions))
+            for toSquare in self.getIndexOfSetBits(destinations):
+                moves.append(fromBits | toSquare | (MOVE_CAPTURE_FLAG if (others >> toSquare) & 1 else 0))
+        return moves
+
+    def floodFill(self, seed, mask, neighborhood=None):
+        """
+        :param seed: Squares to start from, squares of seed outside mask are ignored
+        :param mask: Squares the fill may spread over
+        :return: Squares of mask connected to seed
+        """
+        filled = seed & mask
+        previous = 0
+        while filled != previous:
+            previous = filled
+            filled = self.dilate(filled, neighborhood) & mask
+        return filled
 
     def move(self, move):
         bitboardId, fromI, fromJ, toI, toJ = move
         self.movePieceOptimized(bitboardId, fromI, fromJ, toI, toJ)
 
+    def moveEncoded(self, move):
+        self.move(self.decodeMove(move)[:5])
+
     def movePieceOptimized(self, bitboardId, fromI, fromJ, toI, toJ):
         # bitboardId = self.enforceStringTypeId(bitboardId)
         if not self.isInBound(fromI, fromJ) or not self.isInBound(toI, toJ):
             return
         bitboard = self.bitboardManager[bitboardId]
-        if self.isPieceSet(bitboardId, fromI, fromJ):
-            fromPosition = (fromI * bitboard.sizeJ) + fromJ
+        fromPosition = (fromI * bitboard.sizeJ) + fromJ
+        if (bitboard._data >> fromPosition) & 1:
             toPosition = (toI * bitboard.sizeJ) + toJ
-            bitboard.data ^= ((1 << fromPosition) | (1 << toPosition))
+            if self.evaluator is not None:
+                weights = self.evaluationTable[bitboardId]
+                self.evaluation += weights[toPosition] - weights[fromPosition]
+            fromBit = 1 << fromPosition
+            toBit = 1 << toPosition
+            previous = bitboard._data
+            bitboard._data = data = previous ^ (fromBit | toBit)
+            side = self.sides[bitboardId]
+            if not self.occupancy & toBit and not self._overlap & fromBit:
+                # plain move to an empty square
+                self.sideOccupancy[side] ^= fromBit | toBit
+                self.occupancy ^= fromBit | toBit
+            else:
+                # the destination held a piece, of this bitboard (the move then clears it, same as the data) or not
+                if data & ~previous:
+                    self._occupy(side, data & ~previous)
+                if previous & ~data:
+                    self._vacate(side, previous & ~data)
 
     def moveWithCapture(self, bitboardId, fromI, fromJ, toI, toJ, opponentBitboardIdList):
-        for opponentBitboardId, data in self.bitboardManager.items():
-            if (
-                    bitboardId != opponentBitboardId
-                    and opponentBitboardId in opponentBitboardIdList
-            ):
-                self.movePieceOptimized(bitboardId, fromI, fromJ, toI, toJ)
+        bitboardId = self.enforceStringTypeId(bitboardId)
+        opponents = [opponentBitboardId for opponentBitboardId in map(self.enforceStringTypeId, opponentBitboardIdList)
+                     if opponentBitboardId != bitboardId and opponentBitboardId in self.bitboardManager]
+        if not opponents:
+            return
+        # an empty destination has nothing to capture, captures go first so the destination is empty for the move
+        if self.isInBound(toI, toJ) and (self.occupancy >> (toI * self.sizeJ + toJ)) & 1:
+            for opponentBitboardId in opponents:
                 if self.isPieceSet(opponentBitboardId, toI, toJ):
                     self.deletePiece(opponentBitboardId, toI, toJ)
+        self.movePieceOptimized(bitboardId, fromI, fromJ, toI, toJ)
+
+    def moveWithCaptureEncoded(self, move, opponentBitboardIdList):
+        self.moveWithCapture(*self.decodeMove(move)[:5], opponentBitboardIdList)
+
+    def makeMove(self, move, opponentBitboardIdList):
+        """
+        Same as moveWithCapture, but returns what unmakeMove needs to take the move back
+        :param move: (bitboardId, fromI, fromJ, toI, toJ)
+        :return: List of the bitboardIds captured at the destination
+        """
+        bitboardId, fromI, fromJ, toI, toJ = move
+        captured = [opponentBitboardId for opponentBitboardId in opponentBitboardIdList
+                    if opponentBitboardId != bitboardId and self.isPieceSet(opponentBitboardId, toI, toJ)]
+        for opponentBitboardId in captured:
+            self.deletePiece(opponentBitboardId, toI, toJ)
+        self.movePieceOptimized(bitboardId, fromI, fromJ, toI, toJ)
+        return captured
+
+    def unmakeMove(self, move, captured):
+        bitboardId, fromI, fromJ, toI, toJ = move
+        self.movePieceOptimized(bitboardId, toI, toJ, fromI, fromJ)
+        for opponentBitboardId in captured:
+            self.setPiece(opponentBitboardId, toI, toJ)
+
+    # makeMove and unmakeMove of an encoded move
+    def makeMoveEncoded(self, move, opponentBitboardIdList):
+        return self.makeMove(self.decodeMove(move)[:5], opponentBitboardIdList)
+
+    def unmakeMoveEncoded(self, move, captured):
+        self.unmakeMove(self.decodeMove(move)[:5], captured)
 
     # capture a piece, only if destination to have enemy piece
     def moveAndCaptureOnlyIfPossible(self, bitboardId, fromI, fromJ, toI, toJ, opponentBitboardIdList):
@@ -190,21 +669,12 @@ class BitboardManager:
             if not self.isPieceSet(targetBitboardId, toI, toJ):
                 return False
 
-        for bitboardId, bitboard in self.bitboardManager.items():
-
-            # basically self.isPieceSet but without checks
-            originPiecePosition = (fromI * bitboard.sizeJ) + fromJ
-            destinationPiecePosition = (toI * bitboard.sizeJ) + toJ \
-                # if origin is not set then false
-            if ((bitboard.data >> originPiecePosition) & 1) == 0 and bitboardId == originBitboardId:
-                return False
-
-            # if origin and destination is same then move is not legal
-            if ((bitboard.data >> originPiecePosition) & 1) == 1 and (
-                    (bitboard.data >> destinationPiecePosition) & 1) == 1:
-                return False
-
-        return True
+        # origin must hold the piece, destination must not hold a piece of the same side
+        originPiecePosition = fromI * self.sizeJ + fromJ
+        if not (self.bitboardManager[originBitboardId].data >> originPiecePosition) & 1:
+            return False
+        destinationPiecePosition = toI * self.sizeJ + toJ
+        return not (self.sideOccupancy[self.sides[originBitboardId]] >> destinationPiecePosition) & 1
 
     # can be optimized by using mask and or operation
     def setAllBits(self, bitboardId):
@@ -221,7 +691,7 @@ class BitboardManager:
         for _ in range(self.sizeJ - 1):
             mask = (mask * 2) + 1
         mask <<= i * self.sizeJ
-        self[bitboardId].data = self[bitboardId].data | mask
+        self._writeData(bitboardId, self[bitboardId].data | mask)
 
     def unsetAllBitsAtRow(self, bitboardId, i):
         bitboardId = self.enforceStringTypeId(bitboardId)
@@ -237,7 +707,7 @@ class BitboardManager:
         mask = ~mask
 
         # Perform bitwise AND operation to unset the bits
-        self[bitboardId].data = self[bitboardId].data & mask
+        self._writeData(bitboardId, self[bitboardId].data & mask)
 
     def setAllBitsAtColumn(self, bitboardId, j):
         bitboardId = self.enforceStringTypeId(bitboardId)
@@ -250,7 +720,7 @@ class BitboardManager:
         mask <<= j
 
         # Perform bitwise OR operation to set the bits
-        self[bitboardId].data = self[bitboardId].data | mask
+        self._writeData(bitboardId, self[bitboardId].data | mask)
 
     def unsetAllBitsAtColumn(self, bitboardId, j):
         bitboardId = self.enforceStringTypeId(bitboardId)
@@ -266,32 +736,31 @@ class BitboardManager:
         mask <<= j
 
         # Perform bitwise AND operation to unset the bits
-        self[bitboardId].data = self[bitboardId].data & mask
+        self._writeData(bitboardId, self[bitboardId].data & mask)
+
+    # Squares of the board around (i, j) in the 8-neighborhood, (i, j) itself may be off the board
+    def _neighbors(self, i, j):
+        if self.isInBound(i, j):
+            return self.attacks(1 << (i * self.sizeJ + j), NEIGHBORHOOD_8)
+        return sum(1 << ((i + offsetI) * self.sizeJ + j + offsetJ) for offsetI, offsetJ in NEIGHBORHOOD_8
+                   if self.isInBound(i + offsetI, j + offsetJ))
 
     def deleteNeighbors(self, bitboardId, i, j):
-        self.deletePiece(bitboardId, i + 1, j)
-        self.deletePiece(bitboardId, i - 1, j)
-        self.deletePiece(bitboardId, i, j + 1)
-        self.deletePiece(bitboardId, i, j - 1)
-        self.deletePiece(bitboardId, i + 1, j + 1)
-        self.deletePiece(bitboardId, i + 1, j - 1)
-        self.deletePiece(bitboardId, i - 1, j + 1)
-        self.deletePiece(bitboardId, i - 1, j - 1)
+        self._writeData(bitboardId, self.bitboardManager[bitboardId].data & ~self._neighbors(i, j))
 
     def setNeighbors(self, bitboardId, i, j):
-        self.setPiece(bitboardId, i + 1, j)
-        self.setPiece(bitboardId, i - 1, j)
-        self.setPiece(bitboardId, i, j + 1)
-        self.setPiece(bitboardId, i, j - 1)
-        self.setPiece(bitboardId, i + 1, j + 1)
-        self.setPiece(bitboardId, i + 1, j - 1)
-        self.setPiece(bitboardId, i - 1, j + 1)
-        self.setPiece(bitboardId, i - 1, j - 1)
+        self._writeData(bitboardId, self.bitboardManager[bitboardId].data | self._neighbors(i, j))
+
+    def hasKInARow(self, bitboardId, k):
+        """
+        :return: True if bitboardId has k pieces in a row, column or diagonal, see LineDetector
+        """
+        return LineDetector.get(self.sizeI, self.sizeJ, k).hasLine(self.bitboardManager[bitboardId].data)
 
     def combineBitboard(self, idList):
         result = 0
         for bitboardId in idList:
-            result |= self.bitboardManager[bitboardId]
+            result |= self.bitboardManager[bitboardId].data
         return result
 
     def enforceStringTypeId(self, bitboardId):
@@ -421,8 +890,7 @@ class BitboardManager:
         for i in range(self.sizeI):
             for j in range(self.sizeJ):
                 zobristTableForAPiece[(bitboardId, i, j)] = random.Random(currentSeed).getrandbits(bitsize)
-                random.seed(currentSeed)
-                currentSeed = int(random.random() * (2 ** 32 - 1))
+                currentSeed = int(random.Random(currentSeed).random() * (2 ** 32 - 1))
 
         return zobristTableForAPiece
         # return {
@@ -434,7 +902,8 @@ class BitboardManager:
     def _generateZobristTable(self):
         table = {}
         for bitboardId in self.bitboardManager.keys():
-            table.update(self._generateZobristTableForAPiece(bitboardId, self.zobristSeed))
+            # each piece needs its own keys, otherwise swapping two pieces keeps the hash
+            table.update(self._generateZobristTableForAPiece(bitboardId, f"{self.zobristSeed}:{bitboardId}"))
         return table
 
     # Guard function for zobrist_hash()
@@ -0,0 +1,228 @@
+"""
+Batch conversion between bitboard positions and NumPy piece planes.
+
+A position is the tuple of bitboard data of a BitboardManager, in the order the bitboards were built
+(see BitboardManager.getPosition). N positions are packed into a little-endian uint64 array of shape
+(N, pieces, limbs) with limbs = ceil(sizeI * sizeJ / 64), so bit (i * sizeJ + j) of a bitboard lives in
+limb (i * sizeJ + j) // 64. Planes are (N, pieces, sizeI, sizeJ) uint8 or bool tensors.
+
+Going from words to planes and back only uses np.unpackbits / np.packbits on a uint8 view of the words,
+so no per-square Python work is done.
+
+The kernels below (shift, masks, popcount, set-bit extraction, flips) work on arrays of shape (..., limbs)
+for any fixed number of limbs, so boards larger than 8x8 keep the same row-stride layout as BitboardManager.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+WORD_BITS = 64
+WORD_DTYPE = np.dtype('<u8')
+
+
+def limbCount(sizeI, sizeJ):
+    return max(1, -(-(sizeI * sizeJ) // WORD_BITS))
+
+
+def boardsToWords(boards, sizeI, sizeJ):
+    """
+    Pack single bitboards (ints) into a (N, limbs) uint64 array.
+    """
+    return positionsToWords(((data,) for data in boards), sizeI, sizeJ)[:, 0, :]
+
+
+def wordsToBoards(words):
+    """
+    Inverse of boardsToWords.
+    """
+    words = np.asarray(words, dtype=WORD_DTYPE)
+    return [position[0] for position in wordsToPositions(words[:, np.newaxis, :])]
+
+
+def positionsToWords(positions, sizeI, sizeJ):
+    """
+    Pack positions into a (N, pieces, limbs) uint64 array.
+
+    :param positions: Iterable of positions, each a tuple of bitboard data (one int per piece)
+    :param sizeI: Number of rows of the board
+    :param sizeJ: Number of columns of the board
+    :return: Read-only uint64 array of shape (N, pieces, limbs)
+    """
+    limbs = limbCount(sizeI, sizeJ)
+    byteWidth = limbs * (WORD_BITS // 8)
+    rows = [tuple(position) for position in positions]
+    pieces = len(rows[0]) if rows else 0
+    buffer = b''.join(data.to_bytes(byteWidth, 'little') for row in rows for data in row)
+    return np.frombuffer(buffer, dtype=WORD_DTYPE).reshape(len(rows), pieces, limbs)
+
+
+def wordsToPositions(words):
+    """
+    Inverse of positionsToWords.
+
+    :param words: uint64 array of shape (N, pieces, limbs)
+    :return: List of N positions, each a tuple of bitboard data
+    """
+    words = np.ascontiguousarray(words, dtype=WORD_DTYPE)
+    n, pieces, limbs = words.shape
+    byteWidth = limbs * (WORD_BITS // 8)
+    raw = words.tobytes()
+    values = [int.from_bytes(raw[k:k + byteWidth], 'little') for k in range(0, len(raw), byteWidth)]
+    return [tuple(values[k:k + pieces]) for k in range(0, len(values), pieces)]
+
+
+def wordsToPlanes(words, sizeI, sizeJ, dtype=np.uint8):
+    """
+    Unpack words into piece planes, plane[n, p, i, j] is 1 if piece p is set at (i, j) in position n.
+
+    :param words: uint64 array of shape (..., limbs)
+    :param dtype: np.uint8 or bool
+    :return: Array of shape (..., sizeI, sizeJ)
+    """
+    words = np.ascontiguousarray(words, dtype=WORD_DTYPE)
+    bits = np.unpackbits(words.view(np.uint8), axis=-1, count=sizeI * sizeJ, bitorder='little')
+    planes = bits.reshape(words.shape[:-1] + (sizeI, sizeJ))
+    if np.dtype(dtype) == np.bool_:
+        return planes.view(np.bool_)
+    return planes.astype(dtype, copy=False)
+
+
+def planesToWords(planes):
+    """
+    Pack piece planes into words, inverse of wordsToPlanes. Any non zero square counts as set.
+
+    :param planes: Array of shape (..., sizeI, sizeJ)
+    :return: uint64 array of shape (..., limbs)
+    """
+    planes = np.asarray(planes)
+    *leading, sizeI, sizeJ = planes.shape
+    limbs = limbCount(sizeI, sizeJ)
+    packed = np.packbits(planes.reshape(*leading, sizeI * sizeJ), axis=-1, bitorder='little')
+    padded = np.zeros((*leading, limbs * (WORD_BITS // 8)), dtype=np.uint8)
+    padded[..., :packed.shape[-1]] = packed
+    return padded.view(WORD_DTYPE)
+
+
+def _intToWords(data, limbs):
+    words = np.frombuffer(data.to_bytes(limbs * (WORD_BITS // 8), 'little'), dtype=WORD_DTYPE)
+    words.flags.writeable = False
+    return words
+
+
+@lru_cache(maxsize=None)
+def boardMask(sizeI, sizeJ):
+    """
+    :return: Read-only (limbs,) uint64 array with every square of the board set
+    """
+    return _intToWords((1 << (sizeI * sizeJ)) - 1, limbCount(sizeI, sizeJ))
+
+
+@lru_cache(maxsize=None)
+def columnShiftMask(sizeI, sizeJ, offsetJ):
+    """
+    Squares that a piece can land on after moving offsetJ columns without wrapping to another row
+    :return: Read-only (limbs,) uint64 array
+    """
+    mask = 0
+    for i in range(sizeI):
+        for j in range(max(0, offsetJ), min(sizeJ, sizeJ + offsetJ)):
+            mask |= 1 << (i * sizeJ + j)
+    return _intToWords(mask, limbCount(sizeI, sizeJ))
+
+
+def shiftWords(words, n):
+    """
+    Shift multi-limb words by n bits, left (towards higher squares) if n > 0 and right if n < 0.
+    Bits shifted past the last limb are dropped, use shiftBoard to also mask to the board.
+    """
+    words = np.asarray(words, dtype=WORD_DTYPE)
+    limbs = words.shape[-1]
+    result = np.zeros_like(words)
+    if n == 0:
+        result[...] = words
+        return result
+
+    limbShift, bitShift = divmod(abs(n), WORD_BITS)
+    if limbShift >= limbs:
+        return result
+    if n > 0:
+        source = words[..., :limbs - limbShift]
+        result[..., limbShift:] = source << np.uint64(bitShift)
+        if bitShift:
+            result[..., limbShift + 1:] |= source[..., :-1] >> np.uint64(WORD_BITS - bitShift)
+    else:
+        source = words[..., limbShift:]
+        result[..., :limbs - limbShift] = source >> np.uint64(bitShift)
+        if bitShift:
+            result[..., :limbs - limbShift - 1] |= source[..., 1:] << np.uint64(WORD_BITS - bitShift)
+    return result
+
+
+def shiftBoard(words, offsetI, offsetJ, sizeI, sizeJ):
+    """
+    Move every set square by (offsetI, offsetJ), squares that would leave the board are dropped
+    """
+    shifted = shiftWords(words, offsetI * sizeJ + offsetJ)
+    return shifted & columnShiftMask(sizeI, sizeJ, offsetJ)
+
+
+def andNot(words, mask):
+    return words & ~np.asarray(mask, dtype=WORD_DTYPE)
+
+
+def isEmpty(words):
+    """
+    :return: Bool array of shape (...), True where every limb is 0
+    """
+    return ~np.any(words, axis=-1)
+
+
+_BYTE_POPCOUNT = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """
+    :return: Number of set squares of each board, array of shape (...)
+    """
+    words = np.ascontiguousarray(words, dtype=WORD_DTYPE)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return _BYTE_POPCOUNT[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def setBitIndices(words):
+    """
+    Extract the index (i * sizeJ + j) of every set square.
+
+    :param words: uint64 array of shape (N, limbs)
+    :return: (boardIndex, squareIndex) arrays, sorted by board then square
+    """
+    words = np.ascontiguousarray(words, dtype=WORD_DTYPE)
+    bits = np.unpackbits(words.view(np.uint8), axis=-1, bitorder='little')
+    return np.nonzero(bits)
+
+
+def _flipPlanes(words, sizeI, sizeJ, axes):
+    planes = wordsToPlanes(words, sizeI, sizeJ)
+    return planesToWords(np.flip(planes, axis=axes))
+
+
+def flipVertical(words, sizeI, sizeJ):
+    """
+    Mirror boards top to bottom (row i goes to row sizeI - 1 - i)
+    """
+    return _flipPlanes(words, sizeI, sizeJ, -2)
+
+
+def flipHorizontal(words, sizeI, sizeJ):
+    """
+    Mirror boards left to right (column j goes to column sizeJ - 1 - j)
+    """
+    return _flipPlanes(words, sizeI, sizeJ, -1)
+
+
+def rotate180(words, sizeI, sizeJ):
+    """
+    Rotate boards 180 degrees, the board counterpart of BitboardManager.flipMovements
+    """
+    return _flipPlanes(words, sizeI, sizeJ, (-2, -1))
@@ -1,73 +1,150 @@
-from State import State
+from State import State, GameRules, memoized
 from bitboard import BitboardManager
 
+SECOND_PLAYER_TO_MOVE_KEY = 0x9E3779B97F4A7C15
+
+
+class HexapawnRules(GameRules):
+    """
+    Board size, pawn movement tables and zobrist keys of a Hexapawn variant, shared by all its states.
+    Use HexapawnRules.get(sizeI, sizeJ) to reuse the instance of a board size.
+    """
+    _instances = {}
+
+    @classmethod
+    def get(cls, sizeI, sizeJ):
+        if (sizeI, sizeJ) not in cls._instances:
+            cls._instances[(sizeI, sizeJ)] = cls(sizeI, sizeJ)
+        return cls._instances[(sizeI, sizeJ)]
+
+    def __init__(self, sizeI, sizeJ, zobristSeed=0):
+        self.sizeI = sizeI
+        self.sizeJ = sizeJ
+        self.squareCount = sizeI * sizeJ
+        self.boardMask = (1 << self.squareCount) - 1
+
+        self.firstPlayerPawnMovements = [(-1, 0)]
+        self.firstPlayerPawnCaptureMovements = [(-1, 1), (-1, -1)]
+
+        self.secondPlayerPawnMovements = [(1, 0)]
+        self.secondPlayerPawnCaptureMovements = [(1, 1), (1, -1)]
+
+        # scratch manager, HexapawnState.bm loads a position into it
+        self.bm = BitboardManager(sizeI, sizeJ, useZobrist=True, zobristSeed=zobristSeed)
+        self.bm.buildBitboard('1')
+        self.bm.buildBitboard('2')
+        self.bm.zobrist_hash()
+        self.zobristKeys = {player: [self.bm.zobristTable[(player, *self.bm._index1dTo2d(square))]
+                                     for square in range(self.squareCount)] for player in ('1', '2')}
+
+        # destination squares of a pawn for every origin square
+        self.pawnMoves = {'1': self.__destinations(self.firstPlayerPawnMovements),
+                          '2': self.__destinations(self.secondPlayerPawnMovements)}
+        self.pawnCaptures = {'1': self.__destinations(self.firstPlayerPawnCaptureMovements),
+                             '2': self.__destinations(self.secondPlayerPawnCaptureMovements)}
+
+        rowMask = (1 << sizeJ) - 1
+        self.goalRowMask = {'1': rowMask, '2': rowMask << ((sizeI - 1) * sizeJ)}
+        self.initialPosition = self.pack(rowMask << ((sizeI - 1) * sizeJ), rowMask)
+
+    def __destinations(self, movements):
+        destinations = []
+        for square in range(self.squareCount):
+            i, j = divmod(square, self.sizeJ)
+            destinations.append([(i + offsetI) * self.sizeJ + j + offsetJ for offsetI, offsetJ in movements
+                                 if self.bm.isInBound(i + offsetI, j + offsetJ)])
+        return destinations
+
+    # A position is both bitboards in a single int, the second player bitboard above the first
+    def pack(self, firstPlayerBoard, secondPlayerBoard):
+        return firstPlayerBoard | (secondPlayerBoard << self.squareCount)
+
+    def unpack(self, position):
+        return position & self.boardMask, position >> self.squareCount
+
+    def __reduce__(self):
+        # unpickled states share the rules of their board size
+        return HexapawnRules.get, (self.sizeI, self.sizeJ)
+
 
 class HexapawnState(State):
+    # only per position data, everything else lives in the shared HexapawnRules
+    __slots__ = ('rules', 'position', 'currentPlayer', 'depth', 'parent_hash', '_hashMemo', '_isEndMemo', '_valueMemo')
 
-    def __init__(self, sizeI=3, sizeJ=3, isInitialState=True, stateInformation=None):
+    def __init__(self, sizeI=3, sizeJ=3, isInitialState=True, stateInformation=None, rules=None):
+        self.rules = HexapawnRules.get(sizeI, sizeJ) if rules is None else rules
+        self.parent_hash = None
         if isInitialState:
-            self.__initInitialState(sizeI, sizeJ)
+            self.__initInitialState()
         elif stateInformation is not None:
             self.passStateInformation(*stateInformation)
         else:
             raise Exception("Requires either initial state or state information")
 
-    def passStateInformation(self, depth, parent_hash, currentPlayer, bmInfoDump):
+    def passStateInformation(self, depth, parent_hash, currentPlayer, position):
         self.depth = depth
         self.parent_hash = parent_hash
         self.currentPlayer = currentPlayer
-        self.bm = BitboardManager(infoDump=bmInfoDump)
+        self.position = position
+        self.invalidate()
 
-
-    def __initInitialState(self, sizeI, sizeJ):
-        self.sizeI = sizeI
-        self.sizeJ = sizeJ
-        self.__initBoard()
+    def __initInitialState(self):
+        self.position = self.rules.initialPosition
         self.currentPlayer = '1'
         self.depth = 0
 
-        self.firstPlayerPawnMovements = [(-1, 0)]
-        self.firstPlayerPawnCaptureMovements = [(-1, 1), (-1, -1)]
+    @property
+    def sizeI(self):
+        return self.rules.sizeI
 
-        self.secondPlayerPawnMovements = [(1, 0)]
-        self.secondPlayerPawnCaptureMovements = [(1, 1), (1, -1)]
-
-
-    def __initBoard(self):
-        self.bm = BitboardManager(self.sizeI, self.sizeJ, useZobrist=True)
-        self.bm.buildBitboard('1')
-        self.bm.buildBitboard('2')
+    @property
+    def sizeJ(self):
+        return self.rules.sizeJ
 
-        self.bm.setPiece('2', 0, 0)
-        self.bm.setPiece('2', 0, 1)
-        self.bm.setPiece('2', 0, 2)
-
-        self.bm.setPiece('1', 2, 0)
-        self.bm.setPiece('1', 2, 1)
-        self.bm.setPiece('1', 2, 2)
+    # The shared manager of the rules loaded with this position, only valid until the next call on any state
+    @property
+    def bm(self):
+        self.rules.bm.setPosition(self.rules.unpack(self.position))
+        return self.rules.bm
 
     def isFirstPlayerTurn(self):
         return self.currentPlayer == '1'
 
+    @memoized(shared=True)
     def isEnd(self):
-        return self.value() == float('inf') or self.value() == float('-inf')
+        value = self.value()
+        return value == float('inf') or value == float('-inf')
     #Get value of this state. Win for first player is infinity, win for second player is -infinity
+    @memoized(shared=True)
     def value(self):
-        if self.bm.isAnyPieceSetAtRow('1', 0): return float('inf')
+        firstPlayerBoard, secondPlayerBoard = self.rules.unpack(self.position)
+        if firstPlayerBoard & self.rules.goalRowMask['1']: return float('inf')
 
-        if self.bm.isAnyPieceSetAtRow('2', 2): return float('-inf')
+        if secondPlayerBoard & self.rules.goalRowMask['2']: return float('-inf')
 
-        if self.currentPlayer == '1' and len(self.getAllPossibleNextStates()) == 0: return float('-inf')
+        # a blocked player loses, checked without building the children
+        if self.currentPlayer == '1' and not self.__canMove('1', firstPlayerBoard, secondPlayerBoard):
+            return float('-inf')
 
-        if self.currentPlayer == '2' and len(self.getAllPossibleNextStates()) == 0: return float('inf')
+        if self.currentPlayer == '2' and not self.__canMove('2', secondPlayerBoard, firstPlayerBoard):
+            return float('inf')
 
         return None
 
-    def loadInfoDump(self, infoDump):
-        self.bm.loadInfo(infoDump)
-
+    @memoized
     def hash(self):
-        return self.bm.zobrist_hash()
+        zobristHash = SECOND_PLAYER_TO_MOVE_KEY if self.currentPlayer == '2' else 0
+        for player, board in zip(('1', '2'), self.rules.unpack(self.position)):
+            keys = self.rules.zobristKeys[player]
+            while board:
+                lowestBit = board & -board
+                zobristHash ^= keys[lowestBit.bit_length() - 1]
+                board ^= lowestBit
+        return zobristHash
+
+    def copy(self):
+        return HexapawnState(isInitialState=False, rules=self.rules,
+                             stateInformation=(self.depth, self.parent_hash, self.currentPlayer, self.position))
 
     def getAllPossibleNextStates(self):
         if self.currentPlayer == '1':
@@ -76,26 +153,60 @@ class HexapawnState(State):
             return self.getAllPossibleNextStatesFor2()
 
     def getAllPossibleNextStatesFor1(self):
-        firstPlayerPieceCoords = self.bm.getCoordinatesOfPieces('1')
-        nextStates = []
-
-        for coord in firstPlayerPieceCoords:
-            nextStates += self.bm.generateAllPossibleMoves('1', {'1', self.firstPlayerPawnMovements}, coord)
-            nextStates += self.bm.generateAllPossibleMoves('1', {'1', self.firstPlayerPawnCaptureMovements}, coord)
-
-        return nextStates
+        return self.__generateNextStates('1', '2')
 
     def getAllPossibleNextStatesFor2(self):
-        secondPlayerPieceCoords = self.bm.getCoordinatesOfPieces('2')
+        return self.__generateNextStates('2', '1')
+
+    def __canMove(self, player, own, other):
+        occupied = own | other
+        pawnMoves = self.rules.pawnMoves[player]
+        pawnCaptures = self.rules.pawnCaptures[player]
+        pieces = own
+        while pieces:
+            fromBit = pieces & -pieces
+            pieces ^= fromBit
+            fromSquare = fromBit.bit_length() - 1
+            if any(not (occupied >> toSquare) & 1 for toSquare in pawnMoves[fromSquare]) \
+                    or any((other >> toSquare) & 1 for toSquare in pawnCaptures[fromSquare]):
+                return True
+        return False
+
+    # pawns move forward onto an empty square and capture diagonally
+    def __generateNextStates(self, player, opponent):
+        rules = self.rules
+        firstPlayerBoard, secondPlayerBoard = rules.unpack(self.position)
+        own, other = (firstPlayerBoard, secondPlayerBoard) if player == '1' else (secondPlayerBoard, firstPlayerBoard)
+        occupied = own | other
+        pawnMoves = rules.pawnMoves[player]
+        pawnCaptures = rules.pawnCaptures[player]
+
+        parent_hash = self.hash()
         nextStates = []
-
-        for coord in secondPlayerPieceCoords:
-            nextStates += self.bm.generateAllPossibleMoves('2', {'2', self.secondPlayerPawnMovements}, coord)
-            nextStates += self.bm.generateAllPossibleMoves('2', {'2', self.secondPlayerPawnCaptureMovements}, coord)
-
+        pieces = own
+        while pieces:
+            fromBit = pieces & -pieces
+            pieces ^= fromBit
+            fromSquare = fromBit.bit_length() - 1
+            for toSquare in pawnMoves[fromSquare]:
+                if not (occupied >> toSquare) & 1:
+                    nextStates.append(self.__makeChild(parent_hash, player, opponent, own ^ fromBit ^ (1 << toSquare), other))
+            for toSquare in pawnCaptures[fromSquare]:
+                if (other >> toSquare) & 1:
+                    nextStates.append(self.__makeChild(parent_hash, player, opponent, own ^ fromBit ^ (1 << toSquare),
+                                                       other ^ (1 << toSquare)))
         return nextStates
 
+    def __makeChild(self, parent_hash, player, opponent, own, other):
+        position = self.rules.pack(own, other) if player == '1' else self.rules.pack(other, own)
+        return HexapawnState(isInitialState=False, rules=self.rules,
+                             stateInformation=(self.depth + 1, parent_hash, opponent, position))
+
 
 if __name__ == '__main__':
+    from State import bytesPerNode
+
     game = HexapawnState()
-    print(game.getAllPossibleNextStates())
+    for nextState in game.getAllPossibleNextStates():
+        nextState.bm.showAllBitboard()
+    print("bytes per node:", bytesPerNode(game))
@@ -1,7 +1,13 @@
-from State import State
+from functools import lru_cache
+from itertools import combinations
+import random
+
+from State import State, GameRules, memoized
 from bitboard import BitboardManager
 
-import random
+RED_TO_MOVE_KEY = 0xC2B2AE3D27D4EB4F
+
+
 class Card:
     def __init__(self, name, movements, startPlayerIndicator):
         self.name = name
@@ -10,6 +16,7 @@ class Card:
 
 
 class CardList:
+    # movements are seen from the red player, blue plays them rotated 180 degrees
     cardList = [
         Card("Tiger", [(1, 0), (-2, 0)], "B"),
         Card("Dragon", [(1, -1), (1, 1), (-1, -2), (-1, 2)], "R"),
@@ -30,183 +37,280 @@ class CardList:
     ]
 
 
-# Game is played from the perspective of red player
-class OnitamaState(State):
-
-    def __init__(self, isInitialState=True):
+SQUARES = 25
+# bitboards of a position, in packed order: B = Blue master, b = Blue pawns, R = Red master, r = Red pawns
+PIECES = ('B', 'b', 'R', 'r')
+
+# scratch manager, OnitamaState.bm loads a position into it. A player's master and pawns share a side
+_BOARD = BitboardManager(5, 5, useZobrist=True, zobristSeed=0)
+for _piece in PIECES:
+    _BOARD.buildBitboard(_piece, side=_piece.upper())
+
+
+@lru_cache(maxsize=None)
+def cardDestinations(cardIndex, player):
+    """
+    :param cardIndex: Index of the card in CardList.cardList
+    :param player: 'B' or 'R'
+    :return: Tuple indexed by square of the destinations the card gives player from that square
+    """
+    movements = CardList.cardList[cardIndex].movements
+    if player == 'B':
+        movements = _BOARD.flipMovements(movements)
+    return tuple(_BOARD.attacks(1 << square, movements) for square in range(SQUARES))
+
+
+class OnitamaRules(GameRules):
+    """
+    Board size, temples, the five cards of a game and their distribution tables, shared by every state of the game.
+    Use OnitamaRules.get(cardIndices) to reuse the instance of a set of cards.
+
+    A card distribution is an index into self.distributions, whose entries are (blue, blue, red, red, neutral)
+    indices into CardList.cardList with each hand sorted, 30 per set of cards. Using a card is a lookup in
+    self.afterCardUse.
+    """
+    _instances = {}
+
+    @classmethod
+    def get(cls, cardIndices):
+        key = tuple(sorted(cardIndices))
+        if key not in cls._instances:
+            cls._instances[key] = cls(key)
+        return cls._instances[key]
+
+    def __init__(self, cardIndices):
         self.sizeI = 5
         self.sizeJ = 5
         self.blueTempleCoordinate = (0, 2)
         self.redTempleCoordinate = (4, 2)
-
+        self.blueTempleMask = 1 << 2
+        self.redTempleMask = 1 << 22
+        self.cardIndices = tuple(sorted(cardIndices))
+
+        self.distributions = []
+        for blue in combinations(self.cardIndices, 2):
+            rest = [card for card in self.cardIndices if card not in blue]
+            for red in combinations(rest, 2):
+                neutral, = [card for card in rest if card not in red]
+                self.distributions.append((*blue, *red, neutral))
+        self.distributionIndex = {distribution: index for index, distribution in enumerate(self.distributions)}
+        # distribution index -> used card -> distribution index after the card is exchanged with the neutral one
+        self.afterCardUse = [{card: self.__afterCardUse(distribution, card) for card in distribution[:4]}
+                             for distribution in self.distributions]
+
+        self.destinations = {(card, player): cardDestinations(card, player)
+                             for card in self.cardIndices for player in ('B', 'R')}
+
+        _BOARD.zobrist_hash()
+        self.zobristKeys = [[_BOARD.zobristTable[(piece, *_BOARD._index1dTo2d(square))] for square in range(SQUARES)]
+                            for piece in PIECES]
+        generator = random.Random(f"cards:{self.cardIndices}")
+        self.cardKeys = [generator.getrandbits(64) for _ in self.distributions]
+
+    def __afterCardUse(self, distribution, card):
+        blue, red, neutral = list(distribution[:2]), list(distribution[2:4]), distribution[4]
+        hand = blue if card in blue else red
+        hand[hand.index(card)] = neutral
+        return self.distributionIndex[(*sorted(blue), *sorted(red), card)]
+
+    # A position is the four bitboards in a single int, in PIECES order
+    def pack(self, blueMaster, bluePawns, redMaster, redPawns):
+        return blueMaster | bluePawns << SQUARES | redMaster << (2 * SQUARES) | redPawns << (3 * SQUARES)
+
+    def unpack(self, position):
+        mask = (1 << SQUARES) - 1
+        return position & mask, (position >> SQUARES) & mask, (position >> (2 * SQUARES)) & mask, \
+            position >> (3 * SQUARES)
+
+    @property
+    def initialPosition(self):
+        return self.pack(1 << 2, 0b11011, 1 << 22, 0b11011 << 20)
+
+    def __reduce__(self):
+        # unpickled states share the rules of their cards
+        return OnitamaRules.get, (self.cardIndices,)
+
+
+# Blue is the first player of the value convention (a blue win is infinity), whoever the neutral card lets start
+class OnitamaState(State):
+    __slots__ = ('rules', 'position', 'cards', 'currentPlayer', 'depth', 'parent_hash',
+                 '_hashMemo', '_isEndMemo', '_valueMemo')
+
+    def __init__(self, isInitialState=True, stateInformation=None, rules=None, cardIndices=None, seed=None):
+        """
+        :param cardIndices: Five indices into CardList.cardList, dealt red, blue, red, blue, neutral.
+         Five random cards if None, CardList.cardList itself is never changed
+        """
+        self.parent_hash = None
         if isInitialState:
-            self.__initInitialState()
-
-    def passStateInformation(self, depth, parent_hash, currentPlayer, bluePlayerCards, redPlayerCards, neutralCard, bmInfoDump):
+            if cardIndices is None:
+                cardIndices = random.Random(seed).sample(range(len(CardList.cardList)), 5)
+            self.__initInitialState(cardIndices)
+        elif stateInformation is not None:
+            self.rules = rules
+            self.passStateInformation(*stateInformation)
+        else:
+            raise Exception("Requires either initial state or state information")
+
+    def __initInitialState(self, cardIndices):
+        self.rules = OnitamaRules.get(cardIndices)
+        red = sorted((cardIndices[0], cardIndices[2]))
+        blue = sorted((cardIndices[1], cardIndices[3]))
+        neutral = cardIndices[4]
+        self.passStateInformation(0, None, CardList.cardList[neutral].startPlayerIndicator, self.rules.initialPosition,
+                                  self.rules.distributionIndex[(*blue, *red, neutral)])
+
+    def passStateInformation(self, depth, parent_hash, currentPlayer, position, cards):
+        """
+        :param position: Packed bitboards, see OnitamaRules.pack
+        :param cards: Index of the card distribution in rules.distributions
+        """
         self.depth = depth
         self.parent_hash = parent_hash
         self.currentPlayer = currentPlayer
-        self.bm = BitboardManager(infoDump=bmInfoDump)
-
-
-    def __initInitialState(self):
-        self.bm = BitboardManager(self.sizeI, self.sizeJ)
-
-        self.redPlayerCards = []
-        self.bluePlayerCards = []
-
-        self.neutralCard = None
-
-        self.__initBoard()
-        self.__initCards()
-
-        self.currentPlayer = self.__determineFirstPlayer()
-
-        self.depth = 0
-
-    def __initCards(self):
-        firstCard = random.choice(CardList.cardList)
-        self.redPlayerCards.append(firstCard)
-        CardList.cardList.remove(firstCard)
-
-        secondCard = random.choice(CardList.cardList)
-        self.bluePlayerCards.append(secondCard)
-        CardList.cardList.remove(secondCard)
-
-        thirdCard = random.choice(CardList.cardList)
-        self.redPlayerCards.append(thirdCard)
-        CardList.cardList.remove(thirdCard)
+        self.position = position
+        self.cards = cards
+        self.invalidate()
 
-        fourthCard = random.choice(CardList.cardList)
-        self.bluePlayerCards.append(fourthCard)
-        CardList.cardList.remove(fourthCard)
+    @property
+    def sizeI(self):
+        return self.rules.sizeI
 
-        self.neutralCard = random.choice(CardList.cardList)
+    @property
+    def sizeJ(self):
+        return self.rules.sizeJ
 
-    def __initBoard(self):
-        # B = Blue master, R = Red master, b = Blue pawn, r = Red pawn
-        self.bm.buildBitboard("B")
-        self.bm.buildBitboard("b")
+    @property
+    def blueTempleCoordinate(self):
+        return self.rules.blueTempleCoordinate
 
-        self.bm.buildBitboard("R")
-        self.bm.buildBitboard("r")
+    @property
+    def redTempleCoordinate(self):
+        return self.rules.redTempleCoordinate
 
-        self.__initBluePieces()
-        self.__initRedPieces()
+    @property
+    def bluePlayerCards(self):
+        return [CardList.cardList[card] for card in self.rules.distributions[self.cards][:2]]
 
-    def __determineFirstPlayer(self):
-        return self.neutralCard.startPlayerIndicator
+    @property
+    def redPlayerCards(self):
+        return [CardList.cardList[card] for card in self.rules.distributions[self.cards][2:4]]
 
-    def __initBluePieces(self):
-        # Set master piece
-        self.bm.setPiece("B", 0, 2)
+    @property
+    def neutralCard(self):
+        return CardList.cardList[self.rules.distributions[self.cards][4]]
 
-        self.bm.setPiece('b', 0, 0)
-        self.bm.setPiece('b', 0, 1)
-        self.bm.setPiece('b', 0, 3)
-        self.bm.setPiece('b', 0, 4)
-
-    def __initRedPieces(self):
-        # Set master piece
-        self.bm.setPiece("R", 4, 2)
-
-        self.bm.setPiece('r', 4, 0)
-        self.bm.setPiece('r', 4, 1)
-        self.bm.setPiece('r', 4, 3)
-        self.bm.setPiece('r', 4, 4)
+    # The shared manager loaded with this position, only valid until the next call on any state
+    @property
+    def bm(self):
+        _BOARD.setPosition(self.rules.unpack(self.position))
+        return _BOARD
 
+    @memoized
     def isEnd(self):
-        return self.value() == float('inf') or self.value() == float('-inf')
+        value = self.value()
+        return value == float('inf') or value == float('-inf')
 
     # Blue wins -> infinity
     # Red wins -> -infinity
+    @memoized
     def value(self):
+        blueMaster, _, redMaster, _ = self.rules.unpack(self.position)
         # Is blue master at red temple? -> if yes then Blue wins
-        if self.bm.isPieceSet('B', *self.redTempleCoordinate): return float('inf')
+        if blueMaster & self.rules.redTempleMask: return float('inf')
 
         # Is blue master alive? -> if not then Red wins
-        if self.bm.isEmpty('B'): return float('-inf')
+        if not blueMaster: return float('-inf')
 
         # Is red master at blue temple? -> if yes then Red wins
-        if self.bm.isPieceSet('R', *self.blueTempleCoordinate): return float('-inf')
+        if redMaster & self.rules.blueTempleMask: return float('-inf')
 
         # Is red master alive? -> if not then blue wins
-        if self.bm.isEmpty('R'): return float('inf')
+        if not redMaster: return float('inf')
 
         return None
 
-
     def isFirstPlayerTurn(self):
-        return self.__determineFirstPlayer() == self.currentPlayer
-
-    def __switchPlayerTurn(self):
-        self.currentPlayer = 'B' if self.currentPlayer == 'R' else 'R'
-
-    def __getAllPossibleMovesWithCard(self, card: Card, currentPlayer):
-        pieceMovements = card.movements
-        if currentPlayer == 'B':
-            pieceLocationsPawn = self.bm.getCoordinatesOfPieces('b')
-            pieceLocationsMaster = self.bm.getCoordinatesOfPieces('B')
-            possibleMoves = self.bm.generateAllPossibleMoves('b', pieceMovements, pieceLocationsPawn)
-            possibleMoves.update(self.bm.generateAllPossibleMoves('B', pieceMovements, pieceLocationsMaster))
-        elif currentPlayer == 'R':
-            pieceLocationsPawn = self.bm.getCoordinatesOfPieces('r')
-            pieceLocationsMaster = self.bm.getCoordinatesOfPieces('R')
-            possibleMoves = self.bm.generateAllPossibleMoves('r', pieceMovements, pieceLocationsPawn)
-            possibleMoves.update(self.bm.generateAllPossibleMoves('R', pieceMovements, pieceLocationsMaster))
-        else:
-            raise Exception('Invalid player indicator')
-        return possibleMoves
-
-    #Basically generate next states
-    def getAllPossibleNextStates(self):
-        if self.currentPlayer == 'B':
-            movesWithFirstCard = self.__getAllPossibleMovesWithCard(self.bluePlayerCards[0], 'B')
-            movesWithSecondCard = self.__getAllPossibleMovesWithCard(self.bluePlayerCards[1], 'B')
-        elif self.currentPlayer == 'R':
-            movesWithFirstCard = self.__getAllPossibleMovesWithCard(self.redPlayerCards[0], 'R')
-            movesWithSecondCard = self.__getAllPossibleMovesWithCard(self.redPlayerCards[1], 'R')
-        else:
-            raise Exception('Invalid player indicator')
-
-
-
-
-
-        return
-
-    def generateNextStates(self, movesWithFirstCard, movesWithSecondCard):
-        nextStates = []
-        for bitboardId, moveList in movesWithFirstCard.items():
-            # return state.hash(), state.value(), state.depth, state.isEnd(), state.parent_hash, state.isFirstPlayerTurn(), None
-
-
-            state = OnitamaState(isInitialState=False)
+        return self.currentPlayer == 'B'
 
+    @memoized
+    def hash(self):
+        zobristHash = self.rules.cardKeys[self.cards] ^ (RED_TO_MOVE_KEY if self.currentPlayer == 'R' else 0)
+        for keys, board in zip(self.rules.zobristKeys, self.rules.unpack(self.position)):
+            while board:
+                lowestBit = board & -board
+                zobristHash ^= keys[lowestBit.bit_length() - 1]
+                board ^= lowestBit
+        return zobristHash
+
+    # Exact key of the state: packed bitboards, card distribution (5 bits) and side to move
+    def key(self):
+        return (self.position << 5 | self.cards) << 1 | (self.currentPlayer == 'R')
+
+    def copy(self):
+        return OnitamaState(isInitialState=False, rules=self.rules, stateInformation=(
+            self.depth, self.parent_hash, self.currentPlayer, self.position, self.cards))
+
+    def getAllPossibleMoves(self):
+        """
+        :return: List of (card, fromSquare, toSquare), card indexing CardList.cardList. A player without any move
+         still exchanges a card: (card, None, None)
+        """
+        rules = self.rules
+        player = self.currentPlayer
+        distribution = rules.distributions[self.cards]
+        hand = distribution[:2] if player == 'B' else distribution[2:4]
+        blueMaster, bluePawns, redMaster, redPawns = rules.unpack(self.position)
+        own = blueMaster | bluePawns if player == 'B' else redMaster | redPawns
+
+        moves = []
+        for card in hand:
+            destinations = rules.destinations[(card, player)]
+            pieces = own
+            while pieces:
+                fromBit = pieces & -pieces
+                pieces ^= fromBit
+                fromSquare = fromBit.bit_length() - 1
+                targets = destinations[fromSquare] & ~own
+                while targets:
+                    toBit = targets & -targets
+                    targets ^= toBit
+                    moves.append((card, fromSquare, toBit.bit_length() - 1))
+        if not moves:
+            moves = [(card, None, None) for card in hand]
+        return moves
+
+    def applyMove(self, move):
+        """
+        :param move: (card, fromSquare, toSquare) from getAllPossibleMoves
+        :return: The next state, this state is left unchanged
+        """
+        card, fromSquare, toSquare = move
+        rules = self.rules
+        boards = list(rules.unpack(self.position))
+        if fromSquare is not None:
+            fromBit, toBit = 1 << fromSquare, 1 << toSquare
+            # master or pawn of the side to move, a capture clears the square on both opponent bitboards
+            master, opponentMaster = (0, 2) if self.currentPlayer == 'B' else (2, 0)
+            moved = master if boards[master] & fromBit else master + 1
+            boards[moved] ^= fromBit | toBit
+            boards[opponentMaster] &= ~toBit
+            boards[opponentMaster + 1] &= ~toBit
+        return OnitamaState(isInitialState=False, rules=rules, stateInformation=(
+            self.depth + 1, self.hash(), 'R' if self.currentPlayer == 'B' else 'B', rules.pack(*boards),
+            rules.afterCardUse[self.cards][card]))
 
+    def getAllPossibleNextStates(self):
+        return [self.applyMove(move) for move in self.getAllPossibleMoves()]
 
-            self.bm.moveWithCapture(bitboardId, moveList)
 
-            state.passStateInformation(depth=self.depth + 1, parent_hash=self.hash(), currentPlayer=self.__getOpponent())
+if __name__ == '__main__':
+    import time
 
-    def applyMove(self, move, cardUsed, bmInfoDump):
-        state = OnitamaState(isInitialState=False)
-        state.bm = BitboardManager(infoDump=bmInfoDump)
-    def __getOpponent(self):
-        return 'R' if self.currentPlayer == 'B' else 'B'
+    from ParallelSolver import depthLimitedAlphaBeta
 
-    def __switchUsedCard(self, cardUsed):
-        #return: (firstBluePlayerCard, secondBluePlayerCard, firstRedPlayerCard, secondRedPlayerCard, neutralCard) after switching cards
-        if cardUsed == self.bluePlayerCards[0]:
-            return self.neutralCard, self.bluePlayerCards[1], self.redPlayerCards[0], self.redPlayerCards[1], self.bluePlayerCards[0]
-        elif cardUsed == self.bluePlayerCards[1]:
-            return self.bluePlayerCards[0], self.neutralCard, self.redPlayerCards[0], self.redPlayerCards[1], self.bluePlayerCards[1]
-        elif cardUsed == self.redPlayerCards[0]:
-            return self.bluePlayerCards[0], self.bluePlayerCards[1], self.neutralCard, self.redPlayerCards[1], self.redPlayerCards[0]
-        elif cardUsed == self.redPlayerCards[1]:
-            return self.bluePlayerCards[0], self.bluePlayerCards[1], self.redPlayerCards[0], self.neutralCard, self.redPlayerCards[1]
-        else:
-            raise Exception('Invalid card used')
-
-    def hash(self):
-        pass
+    state = OnitamaState(seed=0)
+    print("blue:", [card.name for card in state.bluePlayerCards], "red:", [card.name for card in state.redPlayerCards],
+          "neutral:", state.neutralCard.name, "to move:", state.currentPlayer)
+    start = time.time()
+    print("4 ply score:", depthLimitedAlphaBeta(state, 4, lambda state: 0), f"{time.time() - start:.2f}s")
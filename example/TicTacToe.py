@@ -1,28 +1,130 @@
-from State import State
+from LineDetector import LineDetector
+from State import State, GameRules, memoized
 from bitboard import BitboardManager
 
 
+class MNKRules(GameRules):
+    """
+    Board size and run length of an m,n,k game (TicTacToe is 3,3,3), shared by all its states.
+    Use MNKRules.get(sizeI, sizeJ, k) to reuse the instance of a game.
+    """
+    _instances = {}
+
+    @classmethod
+    def get(cls, sizeI, sizeJ, k):
+        if (sizeI, sizeJ, k) not in cls._instances:
+            cls._instances[(sizeI, sizeJ, k)] = cls(sizeI, sizeJ, k)
+        return cls._instances[(sizeI, sizeJ, k)]
+
+    def __init__(self, sizeI, sizeJ, k):
+        self.sizeI = sizeI
+        self.sizeJ = sizeJ
+        self.k = k
+        self.squareCount = sizeI * sizeJ
+        self.boardMask = (1 << self.squareCount) - 1
+        self.secondPlayerToMove = 1 << (2 * self.squareCount)
+        self.lineDetector = LineDetector.get(sizeI, sizeJ, k)
+
+        # scratch manager, TicTacToeState.bm loads a position into it
+        self.bm = BitboardManager(sizeI, sizeJ)
+        self.bm.buildBitboard('X')
+        self.bm.buildBitboard('O')
+
+    # A position is both bitboards in a single int, O above X
+    def pack(self, xBoard, oBoard):
+        return xBoard | (oBoard << self.squareCount)
+
+    def unpack(self, position):
+        return position & self.boardMask, position >> self.squareCount
+
+    def __reduce__(self):
+        # unpickled states share the rules of their game
+        return MNKRules.get, (self.sizeI, self.sizeJ, self.k)
+
+
+# X moves first, X winning is infinity
 class TicTacToeState(State):
-    def __init__(self):
-        self.bm = BitboardManager()
-        self.sizeI = 3
-        self.sizeJ = 3
-        self.current_player = 'X'
-        self.isEnd = None
-    def initBoard(self, sizeI, sizeJ):
-        self.bm.buildBitboard('X', sizeI, sizeJ)
-        self.bm.buildBitboard('O', sizeI, sizeJ)
-    def value(self):
-        pass
+    __slots__ = ('rules', 'position', 'currentPlayer', 'depth', 'parent_hash', '_isEndMemo', '_valueMemo')
+
+    def __init__(self, sizeI=3, sizeJ=3, k=3, isInitialState=True, stateInformation=None, rules=None):
+        self.rules = MNKRules.get(sizeI, sizeJ, k) if rules is None else rules
+        self.parent_hash = None
+        if isInitialState:
+            self.passStateInformation(0, None, 'X', 0)
+        elif stateInformation is not None:
+            self.passStateInformation(*stateInformation)
+        else:
+            raise Exception("Requires either initial state or state information")
+
+    def passStateInformation(self, depth, parent_hash, currentPlayer, position):
+        self.depth = depth
+        self.parent_hash = parent_hash
+        self.currentPlayer = currentPlayer
+        self.position = position
+        self.invalidate()
+
+    @property
+    def sizeI(self):
+        return self.rules.sizeI
+
+    @property
+    def sizeJ(self):
+        return self.rules.sizeJ
+
+    # The shared manager of the rules loaded with this position, only valid until the next call on any state
+    @property
+    def bm(self):
+        self.rules.bm.setPosition(self.rules.unpack(self.position))
+        return self.rules.bm
 
     def isFirstPlayerTurn(self):
-        pass
+        return self.currentPlayer == 'X'
 
-    def getAllPossibleNextStates(self):
-        pass
+    # a full board without a line is a draw, which also ends the game
+    @memoized
+    def isEnd(self):
+        return self.value() is not None
+
+    @memoized
+    def value(self):
+        xBoard, oBoard = self.rules.unpack(self.position)
+        # only the player who just moved can have completed a line
+        if self.currentPlayer == 'O' and self.rules.lineDetector.hasLine(xBoard): return float('inf')
+
+        if self.currentPlayer == 'X' and self.rules.lineDetector.hasLine(oBoard): return float('-inf')
+
+        if xBoard | oBoard == self.rules.boardMask: return 0
+
+        return None
 
+    # The position and the side to move, an exact key
     def hash(self):
-        pass
+        return self.position | (self.rules.secondPlayerToMove if self.currentPlayer == 'O' else 0)
 
-    def isEnd(self):
-        pass
\ No newline at end of file
+    def copy(self):
+        return TicTacToeState(isInitialState=False, rules=self.rules,
+                              stateInformation=(self.depth, self.parent_hash, self.currentPlayer, self.position))
+
+    def getAllPossibleNextStates(self):
+        rules = self.rules
+        xBoard, oBoard = rules.unpack(self.position)
+        # a mark of the side to move, in its half of the position
+        shift = 0 if self.currentPlayer == 'X' else rules.squareCount
+        opponent = 'O' if self.currentPlayer == 'X' else 'X'
+        parent_hash = self.hash()
+
+        nextStates = []
+        empty = rules.boardMask & ~(xBoard | oBoard)
+        while empty:
+            square = empty & -empty
+            empty ^= square
+            nextStates.append(TicTacToeState(isInitialState=False, rules=rules, stateInformation=(
+                self.depth + 1, parent_hash, opponent, self.position | (square << shift))))
+        return nextStates
+
+
+if __name__ == '__main__':
+    from ParallelSolver import solveAlphaBeta
+
+    value, stats = solveAlphaBeta(TicTacToeState())
+    print("TicTacToe value:", value, stats.asDict())
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+import Solver
+from AsyncPipeline import runPipeline
+from TranspositionTable import TranspositionTable
+from example.Hexapawn import HexapawnState
+
+
+def divisorGraph(limit):
+    return lambda n: [child for child in (n * 2, n * 3, n * 5) if child <= limit]
+
+
+def testPipelinePersistsEveryUniqueNode():
+    persisted = []
+    threads = set()
+
+    def persist(records):
+        threads.add(threading.get_ident())
+        time.sleep(0.001)
+        persisted.extend(records)
+
+    count = asyncio.run(runPipeline([1], divisorGraph(10 ** 6), lambda n: n, lambda n: n, persist,
+                                    queueSize=2, persistBatchSize=8))
+    expected = {2 ** a * 3 ** b * 5 ** c for a in range(21) for b in range(13) for c in range(9)
+                if 2 ** a * 3 ** b * 5 ** c <= 10 ** 6}
+    assert count == len(expected)
+    assert sorted(persisted) == sorted(expected)
+    assert threading.get_ident() not in threads
+
+
+def testPipelineRaisesStageErrors():
+    def persist(records):
+        raise IOError("disk full")
+
+    try:
+        asyncio.run(runPipeline([1], divisorGraph(100), lambda n: n, lambda n: n, persist))
+    except IOError as error:
+        assert str(error) == "disk full"
+    else:
+        assert False, "expected the persist error"
+
+
+def testSolveAsyncStoresEveryState():
+    transpositionTable = TranspositionTable("memory")
+    Solver.solve(HexapawnState(3, 3), transpositionTable=transpositionTable)
+
+    asyncTable = TranspositionTable("memory")
+    count = Solver.solveAsync(HexapawnState(3, 3), asyncTable)
+    assert count == len(asyncTable)
+    # solve skips terminal states, solveAsync stores them too
+    assert all(asyncTable.contains(key) for key, _ in transpositionTable.items())
+    assert all(entry[2] for key, entry in asyncTable.items() if not transpositionTable.contains(key))
@@ -0,0 +1,17 @@
+from Benchmark import runAll, workloads
+from TranspositionTable import TranspositionTable
+
+
+def testRunAllBackends():
+    results = runAll(['hexapawn-3x3'], None)
+    assert [result['backend'] for result in results] == list(TranspositionTable.backends)
+    for result in results:
+        assert result['workload'] == 'hexapawn-3x3'
+        assert result['stores'] == result['entries'] > 0
+        assert result['peakRssBytes'] > 0
+
+
+def testRunAllWorkloads():
+    results = runAll(None, ['memory'], expectedStates=10000)
+    assert [result['workload'] for result in results] == list(workloads)
+    assert all('prefilter' in result for result in results)
@@ -1,8 +1,9 @@
+import random
 import time
 
 import pytest
 
-from bitboard import BitboardManager
+from bitboard import BitboardManager, NEIGHBORHOOD_4, NEIGHBORHOOD_8, ROOK_DIRECTIONS, BISHOP_DIRECTIONS
 from timeit import timeit
 
 
@@ -162,6 +163,7 @@ def test():
         end = time.time()
         bm.movePieceOptimized('1', 3, 1, 2, 1)
         totalTimeBitboard += end - start
+    assert bm.getOccupancy() == 1 << ((2 * 4) + 1) and bm._overlap == 0
 
     board = [['0'] * 4 for _ in range(4)]
     board[2][1] = '1'
@@ -179,3 +181,188 @@ def test():
 
     print("total time with bitboard: ", totalTimeBitboard)
     print("total time with array: ", totalTimeArray)
+
+
+def testEncodedMoves():
+    bm = BitboardManager()
+    bm.buildBitboard('1', 3, 3)
+    bm.buildBitboard('2', 3, 3)
+    bm.setAllBitsAtRow('2', 0)
+    for i, j in ((1, 1), (2, 0), (2, 2)):
+        bm.setPiece('1', i, j)
+    move = bm.encodeMove('1', 1, 1, 0, 2, isCapture=True)
+    assert move < 1 << 16
+    assert bm.decodeMove(move) == ('1', 1, 1, 0, 2, True)
+
+    moves = bm.generateEncodedMoves('1', [(-1, 0), (-1, 1), (-1, -1)])
+    assert moves.itemsize == 2
+    decoded = sorted(bm.decodeMove(move) for move in moves)
+    # captures at (0, x), the pawn at (2, 0) cannot go to (1, 1) which holds its own piece
+    assert decoded == [('1', 1, 1, 0, 0, True), ('1', 1, 1, 0, 1, True), ('1', 1, 1, 0, 2, True),
+                       ('1', 2, 0, 1, 0, False), ('1', 2, 2, 1, 2, False)]
+
+    # move codes cannot hold the squares of a 9x9 board nor a ninth bitboard
+    large = BitboardManager()
+    large.buildBitboard('1', 9, 9)
+    # ids built later get the next piece index
+    large.buildBitboard('2')
+    assert large.decodeMove(large.encodeMove('2', 0, 0, 1, 1))[0] == '2'
+    large.setPiece('1', 8, 0)
+    with pytest.raises(ValueError):
+        large.generateEncodedMoves('1', [(-1, 0)])
+    for bitboardId in '23456789':
+        large.buildBitboard(bitboardId, 3, 3)
+    large.setPiece('9', 2, 2)
+    with pytest.raises(ValueError):
+        large.generateEncodedMoves('9', [(-1, 0)])
+
+    bm.moveWithCaptureEncoded(move, ['2'])
+    assert bm.getPosition() == (0b101000100, 0b011)
+    bm.moveEncoded(bm.encodeMove('1', 2, 0, 1, 0))
+    assert bm.isPieceSet('1', 1, 0)
+
+    captured = bm.makeMoveEncoded(bm.encodeMove('2', 0, 0, 1, 0, True), ['1'])
+    assert captured == ['1']
+    bm.unmakeMoveEncoded(bm.encodeMove('2', 0, 0, 1, 0, True), captured)
+    assert bm.isPieceSet('1', 1, 0) and bm.isPieceSet('2', 0, 0)
+
+    # int piece ids are still piece ids, not move codes
+    bm.moveWithCapture(2, 0, 0, 1, 0, [1])
+    assert bm.isPieceSet('2', 1, 0) and not bm.isPieceSet('1', 1, 0)
+    with pytest.raises(TypeError):
+        bm.moveWithCapture('2', 1, 0, 0, ['1'])
+
+    large = BitboardManager(9, 9)
+    large.buildBitboard('1')
+    with pytest.raises(ValueError):
+        large.encodeMove('1', 8, 8, 7, 8)
+
+
+def testIncrementalOccupancy():
+    # every mutator keeps the unions equal to a full recount, including squares held by two bitboards
+    rng = random.Random(7)
+    bm = BitboardManager()
+    for bitboardId, side in (('K', 'white'), ('P', 'white'), ('p', 'black'), ('x', 'x')):
+        bm.buildBitboard(bitboardId, 4, 4, side=side)
+    ids = list(bm.bitboardManager)
+
+    def square():
+        return rng.randrange(4), rng.randrange(4)
+
+    for _ in range(3000):
+        bitboardId = rng.choice(ids)
+        operation = rng.randrange(9)
+        if operation == 0:
+            bm.setPiece(bitboardId, *square())
+        elif operation == 1:
+            bm.deletePiece(bitboardId, *square())
+        elif operation == 2:
+            bm.movePieceOptimized(bitboardId, *square(), *square())
+        elif operation == 3:
+            bm.moveWithCapture(bitboardId, *square(), *square(), [rng.choice(ids)])
+        elif operation == 4:
+            move = (bitboardId, *square(), *square())
+            bm.unmakeMove(move, bm.makeMove(move, [rng.choice(ids)]))
+        elif operation == 5:
+            bm.setPosition(tuple(rng.getrandbits(16) & rng.getrandbits(16) for _ in ids))
+        elif operation == 6:
+            bm.setNeighbors(bitboardId, *square())
+        elif operation == 7:
+            bm[bitboardId].data ^= rng.getrandbits(16)
+        else:
+            bm.unsetAllBitsAtRow(bitboardId, rng.randrange(4))
+        expected = {side: bm.combineBitboard([k for k in ids if bm.sideOf(k) == side])
+                    for side in ('white', 'black', 'x')}
+        assert bm.sideOccupancy == expected
+        assert bm.getOccupancy() == bm.combineBitboard(ids)
+        assert bm._overlap == bm._heldTwice(~0)
+
+
+def testOccupancyUnions():
+    bm = BitboardManager()
+    bm.buildBitboard('K', 3, 3, side='white')
+    bm.buildBitboard('P', 3, 3, side='white')
+    bm.buildBitboard('p', 3, 3, side='black')
+    bm.setPiece('K', 2, 1)
+    bm.setPiece('P', 1, 1)
+    bm.setPiece('p', 0, 0)
+    assert bm.getOccupancy('white') == bm.combineBitboard(['K', 'P']) == (1 << 7) | (1 << 4)
+    assert bm.getOccupancy() == bm.getOccupancy('white') | 1
+
+    # same side blocks, other side can be captured
+    assert not bm.isLegalMove(2, 1, 1, 1, 'K')
+    assert bm.isLegalMove(1, 1, 0, 0, 'P')
+    assert not bm.isLegalMove(0, 1, 0, 0, 'P')
+    assert bm.legalDestinations('K', (1 << 4) | (1 << 3) | 1) == (1 << 3) | 1
+
+    # unions follow moves, captures, writes to Bitboard.data and copies
+    bm.moveWithCapture('P', 1, 1, 0, 0, ['p'])
+    assert bm.getOccupancy('black') == 0 and bm.getOccupancy() == (1 << 7) | 1
+    bm['K'].data = 0
+    assert bm.getOccupancy('white') == 1
+    bm['K'].data = 0b110
+    assert not bm.isLegalMove(0, 1, 0, 2, 'K') and not bm.isLegalMove(0, 1, 0, 0, 'K')
+    assert bm._overlap == bm._heldTwice(~0) == 0
+    bm['K'].data ^= 0b11
+    assert bm.getOccupancy('white') == 0b101 and bm._overlap == 1
+    bm['K'].data = 0
+    copy = BitboardManager(infoDump=bm.dumpInfo())
+    copy.setPiece('p', 2, 2)
+    assert copy.getOccupancy('black') == 1 << 8 and bm.getOccupancy('black') == 0
+    assert copy.sideOf('K') == 'white'
+
+
+def testMorphology():
+    bm = BitboardManager(4, 5)
+    bm.buildBitboard('a')
+    bm.setPiece('a', 0, 4)
+    corner = bm['a'].data
+    # no wrap from column 4 to column 0 of the next row
+    assert bm.dilate(corner) == corner | (1 << 3) | (1 << 8) | (1 << 9)
+    assert bm.dilate(corner, NEIGHBORHOOD_4) == corner | (1 << 3) | (1 << 9)
+    block = bm.dilate(1 << 6) | bm.dilate(1 << 13)
+    assert bm.erode(block) == (1 << 6) | (1 << 13)
+    assert bm.erode(block, NEIGHBORHOOD_4) == (1 << 6) | (1 << 7) | (1 << 12) | (1 << 13)
+    assert bm.erode(bm.dilate(corner)) == 0
+
+    # column 2 is a wall with a gap on the last row
+    wall = sum(1 << (i * 5 + 2) for i in range(3))
+    free = ((1 << 20) - 1) & ~wall
+    assert bm.floodFill(1, free, NEIGHBORHOOD_4) == free
+    assert bm.floodFill(1, free & ~(1 << 17), NEIGHBORHOOD_4) == sum(1 << (i * 5 + j) for i in range(4) for j in range(2))
+    knight = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+    assert bm.attacks(1, knight) == (1 << 7) | (1 << 11)
+
+    bm.setNeighbors('a', 1, 1)
+    assert bm['a'].data == corner | bm.attacks(1 << 6, NEIGHBORHOOD_8)
+    bm.deleteNeighbors('a', 1, 1)
+    assert bm['a'].data == corner
+    bm.setNeighbors('a', -1, 0)
+    assert bm['a'].data == corner | 0b11
+
+
+def testSlidingAttacks():
+    bm = BitboardManager()
+    bm.buildBitboard('R', 4, 5, side='white')
+    bm.buildBitboard('P', 4, 5, side='white')
+    bm.buildBitboard('p', 4, 5, side='black')
+    bm.setPiece('R', 1, 1)
+    bm.setPiece('P', 1, 3)
+    bm.setPiece('p', 3, 1)
+    rook = 1 * 5 + 1
+    column = (1 << 1) | (1 << 11) | (1 << 16)
+    # the ray to the right stops on the own pawn, it is removed by legalDestinations
+    assert bm.slidingAttacks(rook, directions=ROOK_DIRECTIONS) == column | (1 << 5) | (1 << 7) | (1 << 8)
+    assert bm.slidingAttacks(rook, directions=BISHOP_DIRECTIONS) == (1 << 0) | (1 << 2) | (1 << 10) | (1 << 12) | (1 << 18)
+    assert bm.slidingAttacksFromAll(bm['R'].data, directions=ROOK_DIRECTIONS) \
+        == bm.slidingAttacks(rook, directions=ROOK_DIRECTIONS)
+
+    moves = sorted(bm.decodeMove(move)[3:] for move in bm.generateSlidingMoves('R', ROOK_DIRECTIONS))
+    assert moves == [(0, 1, False), (1, 0, False), (1, 2, False), (2, 1, False), (3, 1, True)]
+
+    # a 9x9 board has squares beyond the 6-bit fields of a move code
+    large = BitboardManager()
+    large.buildBitboard('R', 9, 9)
+    large.setPiece('R', 8, 0)
+    with pytest.raises(ValueError):
+        large.generateSlidingMoves('R', ROOK_DIRECTIONS)
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from bitboard import BitboardManager
+
+np = pytest.importorskip("numpy")
+
+from bitboardBatch import positionsToWords, wordsToPositions, wordsToPlanes, planesToWords, boardsToWords, \
+    wordsToBoards, shiftBoard, popcount, setBitIndices, flipVertical, flipHorizontal, rotate180, limbCount
+
+
+def randomPositions(n, pieces, sizeI, sizeJ, seed=0):
+    rng = random.Random(seed)
+    return [tuple(rng.getrandbits(sizeI * sizeJ) for _ in range(pieces)) for _ in range(n)]
+
+
+def testPlanesMatchMailbox():
+    bm = BitboardManager()
+    bm.translateMailboxToBitboards([['1', '.', '2'], ['.', '1', '.'], ['2', '.', '1'], ['.', '.', '.']])
+    planes = bm.translateBatchToPlanes([bm.getPosition()])
+    mailbox = bm.translateBitboardsToMailbox()
+
+    assert planes.shape == (1, 3, 4, 3)
+    for p, bitboardId in enumerate(bm.bitboardManager):
+        for i in range(4):
+            for j in range(3):
+                assert planes[0, p, i, j] == (mailbox[i][j] == bitboardId)
+
+
+def testWordsRoundTrip():
+    positions = randomPositions(50, 2, 7, 5)
+    words = positionsToWords(positions, 7, 5)
+    assert words.shape == (50, 2, 1)
+    assert wordsToPositions(words) == positions
+
+
+@pytest.mark.parametrize("sizeI,sizeJ", [(3, 3), (8, 8), (9, 9), (10, 10)])
+def testPlanesRoundTrip(sizeI, sizeJ):
+    positions = randomPositions(20, 3, sizeI, sizeJ)
+    planes = wordsToPlanes(positionsToWords(positions, sizeI, sizeJ), sizeI, sizeJ, dtype=bool)
+    assert planes.dtype == np.bool_
+    assert wordsToPositions(planesToWords(planes)) == positions
+
+
+def testManagerBatchRoundTrip():
+    bm = BitboardManager()
+    bm.buildBitboard('1', 7, 5)
+    bm.buildBitboard('2', 7, 5)
+    positions = randomPositions(10, 2, 7, 5, seed=1)
+    assert bm.translateBatchFromPlanes(bm.translateBatchToPlanes(positions)) == positions
+
+
+def shiftBoardScalar(data, offsetI, offsetJ, sizeI, sizeJ):
+    result = 0
+    for index in range(sizeI * sizeJ):
+        i, j = divmod(index, sizeJ)
+        if (data >> index) & 1 and 0 <= i + offsetI < sizeI and 0 <= j + offsetJ < sizeJ:
+            result |= 1 << ((i + offsetI) * sizeJ + j + offsetJ)
+    return result
+
+
+@pytest.mark.parametrize("sizeI,sizeJ", [(3, 3), (8, 8), (9, 9), (10, 10), (13, 11)])
+def testShiftBoardMatchesScalar(sizeI, sizeJ):
+    boards = [position[0] for position in randomPositions(10, 1, sizeI, sizeJ, seed=2)]
+    words = boardsToWords(boards, sizeI, sizeJ)
+    assert words.shape == (10, limbCount(sizeI, sizeJ))
+    for offsetI, offsetJ in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, -1), (2, -1), (-7, 3), (9, 0)]:
+        expected = [shiftBoardScalar(data, offsetI, offsetJ, sizeI, sizeJ) for data in boards]
+        assert wordsToBoards(shiftBoard(words, offsetI, offsetJ, sizeI, sizeJ)) == expected
+
+
+def testPopcountAndSetBits():
+    boards = [position[0] for position in randomPositions(5, 1, 10, 10, seed=3)]
+    words = boardsToWords(boards, 10, 10)
+    assert popcount(words).tolist() == [bin(data).count('1') for data in boards]
+
+    boardIndex, squareIndex = setBitIndices(words)
+    bm = BitboardManager()
+    for n, data in enumerate(boards):
+        assert squareIndex[boardIndex == n].tolist() == bm.getIndexOfSetBits(data)
+
+
+def testFlips():
+    bm = BitboardManager()
+    bm.buildBitboard('a', 9, 9)
+    bm.setPiece('a', 0, 1)
+    bm.setPiece('a', 8, 7)
+    bm.setPiece('a', 4, 0)
+    words = boardsToWords([bm['a'].data], 9, 9)
+
+    def pieces(flipped):
+        bm['a'].data = wordsToBoards(flipped)[0]
+        return sorted(bm.getCoordinatesOfPieces('a'))
+
+    assert pieces(flipVertical(words, 9, 9)) == [(0, 7), (4, 0), (8, 1)]
+    assert pieces(flipHorizontal(words, 9, 9)) == [(0, 7), (4, 8), (8, 1)]
+    assert pieces(rotate180(words, 9, 9)) == [(0, 1), (4, 8), (8, 7)]
@@ -0,0 +1,27 @@
+from CollisionAudit import CollisionAudit, auditSolve
+from example.Hexapawn import HexapawnState
+
+
+def testAuditFindsNarrowKeyCollisions():
+    audit = CollisionAudit(keyWidths=(4, 64))
+    for position in range(100):
+        audit.observe(position * 0x9E3779B97F4A7C15, position)
+    report = audit.report()
+    assert report[4]['positions'] == 100 and report[4]['collidingPositions'] == 100
+    assert report[64]['collidingPositions'] == 0
+    assert audit.smallestSafeWidth() == 64
+
+    # the same position seen twice is not a collision
+    audit.observe(0, 0)
+    assert audit.report()[64]['positions'] == 100
+
+
+def testAuditSolve():
+    audit = auditSolve(HexapawnState(4, 3), lambda state: (state.position, state.currentPlayer), (8, 32, 64))
+    report = audit.report()
+    assert report[64]['positions'] == audit.observed
+    assert report[8]['collisionRate'] > 0
+    assert audit.smallestSafeWidth() in (32, 64)
+
+    sampled = auditSolve(HexapawnState(4, 3), lambda state: (state.position, state.currentPlayer), (8, 64), 0.25)
+    assert 0 < sampled.report()[64]['positions'] < audit.observed
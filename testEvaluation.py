@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from Evaluation import Evaluator, MaterialEvaluator, PieceSquareEvaluator, AdvancementEvaluator, pawnGameEvaluator
+from ParallelSolver import depthLimitedAlphaBeta
+from PawnRevolt import Game
+from State import State
+from example.Hexapawn import HexapawnState
+
+
+def testPawnGameEvaluator():
+    game = Game(4, 3)
+    evaluator = pawnGameEvaluator(materialWeight=1, advancementWeight=0.5)
+    # symmetric start
+    assert evaluator.evaluate(game.bm) == 0
+    # captures a pawn that had advanced one row: +1 material, +0.5 own progress, +0.5 opponent progress gone
+    game.make_move(('1', 2, 0, 1, 0))
+    assert evaluator.evaluate(game.bm) == 2
+
+    table = PieceSquareEvaluator({'1': [[4, 4, 4], [3, 3, 3], [2, 2, 2], [1, 1, 1]]})
+    assert table.evaluate(game.bm) == 3 + 2 * 2 + 3 * 1
+    assert (MaterialEvaluator({'2': -2}) + table).evaluate(game.bm) == 10 - 10
+
+
+def testIncrementalMatchesRecompute():
+    game = Game(5, 4)
+    evaluator = pawnGameEvaluator() + PieceSquareEvaluator({'2': [[0, 1, 1, 0]] * 5})
+    game.bm.attachEvaluator(evaluator)
+    rng = random.Random(1)
+    history = []
+    while not game.is_over():
+        player = game.current_player
+        move = rng.choice(game.getAllPossibleMoves(player == '1'))
+        history.append((move, game.bm.makeMove(move, ['2' if player == '1' else '1']), game.bm.getPosition()))
+        game.current_player = '2' if player == '1' else '1'
+        assert game.bm.evaluation == pytest.approx(evaluator.evaluate(game.bm))
+
+    initial = Game(5, 4).bm.getPosition()
+    for move, captured, _ in reversed(history):
+        game.bm.unmakeMove(move, captured)
+        assert game.bm.evaluation == pytest.approx(evaluator.evaluate(game.bm))
+    assert game.bm.getPosition() == initial
+
+
+def testBatchMatchesSingle():
+    pytest.importorskip("numpy")
+    game = Game(4, 3)
+    rng = random.Random(0)
+    positions = [(rng.getrandbits(12), rng.getrandbits(12)) for _ in range(50)]
+    for evaluator in (MaterialEvaluator({'1': 1, '2': -1}), pawnGameEvaluator(),
+                      AdvancementEvaluator({'2': 1}, {'2': -2})):
+        expected = []
+        for position in positions:
+            game.bm.setPosition(position)
+            expected.append(evaluator.evaluate(game.bm))
+        assert list(evaluator.evaluateBatch(game.bm, positions)) == pytest.approx(expected)
+
+
+def testEvaluatedSearch():
+    game = Game(4, 3)
+    move, score = game.bestMove(3)
+    assert move in game.getAllEncodedMoves(True)
+    # the search restores the game
+    assert game.bm.getPosition() == Game(4, 3).bm.getPosition() and game.current_player == '1'
+    assert game.bm.evaluator is None
+
+    # deep enough to see the end of 3x3 Hexapawn, a loss for the first player
+    evaluator = pawnGameEvaluator()
+    root = HexapawnState(3, 3)
+    assert depthLimitedAlphaBeta(root, 10, lambda state: evaluator.evaluate(state.bm)) == float('-inf')
+    assert abs(depthLimitedAlphaBeta(root, 1, lambda state: evaluator.evaluate(state.bm))) < float('inf')
+
+    with pytest.raises(ValueError):
+        game.bestMove(0)
+
+
+def testChildlessStateScoredByValue():
+    class Blocked(State):
+        def isEnd(self):
+            return False
+
+        def value(self):
+            return float('-inf')
+
+        def isFirstPlayerTurn(self):
+            return True
+
+        def getAllPossibleNextStates(self):
+            return []
+
+        def hash(self):
+            return 0
+
+    # a blocked first player has lost, not drawn
+    assert depthLimitedAlphaBeta(Blocked(), 3, lambda state: 0) == float('-inf')
+
+
+def testEvaluationFollowsEveryWrite():
+    game = Game(4, 3)
+    bm = game.bm
+    evaluator = MaterialEvaluator({'1': 1, '2': -1, '3': 5})
+    bm.attachEvaluator(evaluator)
+    bm.unsetAllBitsAtRow('1', 3)
+    bm.setAllBitsAtRow('1', 2)
+    bm.setNeighbors('2', 1, 1)
+    bm.unsetAllBitsAtColumn('2', 0)
+    bm['1'].data ^= 0b1
+    assert bm.evaluation == evaluator.evaluate(bm)
+
+    # bitboards built after attachEvaluator get their weights
+    bm.buildBitboard('3')
+    bm.setPiece('3', 0, 0)
+    assert bm.evaluation == evaluator.evaluate(bm)
+
+
+def testIncompleteEvaluator():
+    class NoWeights(Evaluator):
+        pass
+
+    with pytest.raises(TypeError):
+        NoWeights()
@@ -0,0 +1,107 @@
+import os
+import pickle
+import random
+
+import pytest
+
+import Solver
+from FrontierFile import FrontierWriter, FrontierFile, FrontierSpill, writeFrontier, encodeVarint, decodeVarints
+from IntegerGame import pawnRevoltGame
+from PawnRevolt import Game
+from TranspositionTable import TranspositionTable
+
+
+def testVarints():
+    values = [0, 1, 127, 128, 300, 2 ** 64 - 1, 2 ** 71 + 5]
+    encoded = bytearray()
+    for value in values:
+        encodeVarint(value, encoded)
+    assert decodeVarints(encoded) == values
+    assert len(encoded) == 1 + 1 + 1 + 2 + 2 + 10 + 11
+
+
+def testWriteAndRead(tmp_path):
+    path = tmp_path / "keys.frontier"
+    rng = random.Random(0)
+    keys = [rng.getrandbits(71) for _ in range(5000)] + [0, 7, 7]
+    assert writeFrontier(path, keys, blockSize=100) == 5002
+
+    with FrontierFile(path) as frontier:
+        expected = sorted(set(keys))
+        assert len(frontier) == 5002
+        assert frontier.blockCount == 51
+        assert list(frontier) == expected
+        # blocks decode on their own, in any order
+        assert frontier.block(37) == expected[3700:3800]
+        assert frontier.block(50) == expected[5000:]
+        assert frontier.findBlock(expected[4321]) == 43
+        assert expected[4321] in frontier and 0 in frontier
+        assert expected[4321] + 1 not in frontier and -1 not in frontier
+
+    with FrontierWriter(tmp_path / "unsorted.frontier") as writer:
+        writer.add(5)
+        with pytest.raises(ValueError):
+            writer.add(4)
+
+    with FrontierFile(tmp_path / "unsorted.frontier") as frontier:
+        assert list(frontier) == [5]
+    writeFrontier(tmp_path / "empty.frontier", [])
+    with FrontierFile(tmp_path / "empty.frontier") as frontier:
+        assert (len(frontier), list(frontier), 3 in frontier) == (0, [], False)
+
+
+def testSmallerThanPickle(tmp_path):
+    transpositionTable = TranspositionTable("memory")
+    Solver.solveIntegers(pawnRevoltGame(4, 3), transpositionTable)
+    keys = [key for key, _ in transpositionTable.items()]
+    path = tmp_path / "states.frontier"
+    writeFrontier(path, keys)
+    assert os.path.getsize(path) * 3 < len(pickle.dumps(keys))
+
+
+def testSpill(tmp_path):
+    spill = FrontierSpill(100, tmp_path, blockSize=16)
+    rng = random.Random(1)
+    keys = [rng.getrandbits(40) for _ in range(1050)]
+    spill.extend(keys)
+    assert len(spill.runs) == 10 and len(spill) == 1050
+    assert list(spill) == sorted(set(keys))
+    spill.close()
+    assert os.listdir(tmp_path) == []
+
+
+def testSolversSpill(tmp_path):
+    integerGame = pawnRevoltGame(4, 3)
+    inMemory = TranspositionTable("memory")
+    spilled = TranspositionTable("memory")
+    stored = Solver.solveIntegers(integerGame, inMemory)
+    assert Solver.solveIntegers(integerGame, spilled, spillThreshold=50, spillDirectory=tmp_path) == stored
+    # same states at the same depths, the parent is whichever was expanded first
+    withoutParent = lambda table: {key: entry[:3] + entry[4:5] for key, entry in table.items()}
+    assert withoutParent(spilled) == withoutParent(inMemory)
+
+    spills = []
+    game = Game(4, 3)
+    spill = game._spill
+    game._spill = lambda queue, directory: spills.append(len(queue)) or spill(queue, directory)
+    transpositionTable = game.solve(TranspositionTable("memory"), spillThreshold=1000, spillDirectory=tmp_path)
+    assert spills
+    assert len(transpositionTable) == len(inMemory)
+    assert os.listdir(tmp_path) == []
+
+
+def testSpillRemovedOnError(tmp_path):
+    integerGame = pawnRevoltGame(4, 3)
+    children = integerGame.children
+    expanded = []
+
+    def failingChildren(key):
+        expanded.append(key)
+        if len(expanded) > 200:
+            raise RuntimeError("expansion failed")
+        return children(key)
+
+    integerGame.children = failingChildren
+    with pytest.raises(RuntimeError):
+        Solver.solveIntegers(integerGame, TranspositionTable("memory"), spillThreshold=20, spillDirectory=tmp_path)
+    assert os.listdir(tmp_path) == []
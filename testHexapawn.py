@@ -0,0 +1,92 @@
+import pickle
+
+import pytest
+
+import Solver
+from State import State, bytesPerNode, memoized
+from TranspositionTable import TranspositionTable
+from example.Hexapawn import HexapawnState
+
+
+def testSolveVisitsEveryState():
+    transpositionTable = TranspositionTable("memory")
+    Solver.solve(HexapawnState(3, 3), transpositionTable=transpositionTable)
+    assert len(transpositionTable) == 70
+
+
+def testInitialMoves():
+    children = HexapawnState(3, 3).getAllPossibleNextStates()
+    assert len(children) == 3
+    assert all(child.currentPlayer == '2' and child.depth == 1 for child in children)
+    assert len({child.hash() for child in children}) == 3
+
+
+def testStatesShareRules():
+    state = HexapawnState(4, 3)
+    child = state.getAllPossibleNextStates()[0]
+    assert child.rules is state.rules
+    assert not hasattr(state, '__dict__')
+    assert pickle.loads(pickle.dumps(child)).rules is state.rules
+
+
+def testBytesPerNodeExcludesRules():
+    assert bytesPerNode(HexapawnState(3, 3)) < 300
+
+
+def testBytesPerEvaluatedNode():
+    # the memoized results take a slot each and no child list is kept
+    state = HexapawnState(3, 3)
+    state.value(), state.isEnd(), state.hash()
+    assert bytesPerNode(state) < 300
+    assert not hasattr(state, '__dict__')
+
+
+def testMemoizedEvaluation(monkeypatch):
+    calls = []
+    generate = HexapawnState._HexapawnState__generateNextStates
+    monkeypatch.setattr(HexapawnState, '_HexapawnState__generateNextStates',
+                        lambda state, *players: calls.append(state.position) or generate(state, *players))
+
+    state = HexapawnState(3, 3)
+    # value and isEnd only check that a move exists, the solver's expansion generates the children once
+    assert state.value() is None and not state.isEnd() and state.value() is None and calls == []
+    children = state.getAllPossibleNextStates()
+    assert len(children) == 3 and len(calls) == 1
+    # the state does not keep its children
+    assert len(state.getAllPossibleNextStates()) == 3 and len(calls) == 2
+
+    # second player blocked, then a new position forgets the cached results
+    capture = HexapawnState(isInitialState=False, stateInformation=(0, None, '2', state.rules.pack(0b10000, 0b10)))
+    assert capture.value() == float('inf')
+    capture.passStateInformation(0, None, '1', state.position)
+    assert capture.value() is None
+
+    # states of the same position share value and isEnd
+    sharedCache = HexapawnState.useSharedCache(maxEntries=4)
+    try:
+        HexapawnState(3, 3).value()
+        calls.clear()
+        assert HexapawnState(3, 3).value() is None and calls == []
+        assert sharedCache.hits == 1
+    finally:
+        HexapawnState.useSharedCache(None)
+
+
+def testMemoSlotsChecked():
+    with pytest.raises(TypeError, match='_pawnCountMemo'):
+        class MissingSlot(HexapawnState):
+            __slots__ = ()
+
+            @memoized
+            def pawnCount(self):
+                return bin(self.position).count('1')
+
+    # a state with a __dict__ needs no slots
+    class Unslotted(State):
+        isEnd = isFirstPlayerTurn = getAllPossibleNextStates = hash = lambda self: False
+
+        @memoized
+        def value(self):
+            return 0
+
+    assert Unslotted().value() == 0
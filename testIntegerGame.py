@@ -0,0 +1,71 @@
+import pytest
+
+import Solver
+from IntegerGame import IntegerGame, hexapawnGame, pawnRevoltGame
+from ParallelSolver import solveIntegerAlphaBeta, solveAlphaBeta
+from PawnRevolt import Game
+from TranspositionTable import TranspositionTable
+from example.Hexapawn import HexapawnState
+
+
+def testHexapawnAdapterMatchesStates():
+    game = hexapawnGame(3, 3)
+    root = HexapawnState(3, 3)
+    assert game.initialKey() == root.position
+
+    # walk both trees together
+    pending = [(root, game.initialKey())]
+    while pending:
+        state, key = pending.pop()
+        assert game.unpack(key)[:2] == root.rules.unpack(state.position)
+        assert game.sideToMove(key) == state.isFirstPlayerTurn()
+        assert game.terminal(key) == state.isEnd()
+        assert game.value(key) == state.value()
+        if not state.isEnd():
+            children = {child.position: child for child in state.getAllPossibleNextStates()}
+            # the key is the packed Hexapawn position plus the side to move bit
+            childKeys = {childKey & ~game.secondPlayerToMove: childKey for childKey in game.children(key)}
+            assert sorted(childKeys) == sorted(children)
+            pending.extend((children[position], childKey) for position, childKey in childKeys.items())
+
+
+def testSolveIntegers():
+    transpositionTable = TranspositionTable("memory")
+    game = pawnRevoltGame(4, 3)
+    assert Solver.solveIntegers(game, transpositionTable) == len(transpositionTable)
+    # same states as the BitboardManager based solve
+    assert len(transpositionTable) == len(Game(4, 3).solve(TranspositionTable("memory")))
+
+    root = game.initialKey()
+    value, depth, isEnd, parent, isFirstPlayerTurn, _ = transpositionTable.retrieve(root)
+    assert (depth, isEnd, parent, isFirstPlayerTurn) == (0, False, None, True)
+    for key, (value, depth, isEnd, parent, isFirstPlayerTurn, _) in transpositionTable.items():
+        assert isEnd == game.terminal(key) and isFirstPlayerTurn == game.sideToMove(key)
+        assert key == root or key in game.children(parent)
+
+
+def testIntegerAlphaBeta():
+    for sizeI, sizeJ in ((3, 3), (4, 4)):
+        value, _ = solveIntegerAlphaBeta(hexapawnGame(sizeI, sizeJ))
+        assert value == solveAlphaBeta(HexapawnState(sizeI, sizeJ))[0]
+    # the table may be a compact one, keys of 4x3 PawnRevolt fit in 64 bits
+    value, _ = solveIntegerAlphaBeta(pawnRevoltGame(4, 3), transpositionTable=TranspositionTable("compact"))
+    assert value == float('-inf')
+
+
+def testIncompleteGame():
+    class NoValue(IntegerGame):
+        def initialKey(self):
+            return 0
+
+        def children(self, key):
+            return []
+
+        def terminal(self, key):
+            return True
+
+        def sideToMove(self, key):
+            return True
+
+    with pytest.raises(TypeError):
+        NoValue()
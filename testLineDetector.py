@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from LineDetector import LineDetector
+from bitboard import BitboardManager
+
+
+@pytest.mark.parametrize("sizeI,sizeJ,k", [(3, 3, 3), (6, 7, 4), (4, 9, 3), (1, 5, 3), (9, 9, 7), (3, 3, 1)])
+def testHasLineMatchesMasks(sizeI, sizeJ, k):
+    detector = LineDetector.get(sizeI, sizeJ, k)
+    masks = detector.lineMasks
+    rng = random.Random(0)
+    for _ in range(500):
+        bits = rng.getrandbits(sizeI * sizeJ) & rng.getrandbits(sizeI * sizeJ)
+        assert detector.hasLine(bits) == any(bits & mask == mask for mask in masks)
+
+
+def testLinesDoNotWrap():
+    detector = LineDetector.get(3, 3, 3)
+    assert len(detector.lineMasks) == 8
+    # (0, 2), (1, 0), (1, 1) are consecutive squares but not a row
+    assert not detector.hasLine(0b000011100)
+    # (0, 2), (1, 1), (2, 0) is the anti-diagonal
+    assert detector.hasLine(0b001010100)
+    assert detector.runStarts(0b001010100) == 0b100
+
+    bm = BitboardManager(3, 3)
+    bm.buildBitboard('X')
+    for j in range(3):
+        bm.setPiece('X', 2, j)
+    assert bm.hasKInARow('X', 3) and not bm.hasKInARow('X', 4)
+
+
+def testHasLineBatch():
+    pytest.importorskip("numpy")
+    detector = LineDetector.get(9, 9, 5)
+    rng = random.Random(1)
+    boards = [rng.getrandbits(81) & rng.getrandbits(81) for _ in range(200)]
+    assert list(detector.hasLineBatch(boards)) == [detector.hasLine(bits) for bits in boards]
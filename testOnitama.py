@@ -0,0 +1,63 @@
+import random
+
+from ParallelSolver import depthLimitedAlphaBeta
+from example.Onitama import OnitamaState, CardList, OnitamaRules
+
+OX, CRAB = 11, 4
+
+
+def testCardsAreNotConsumed():
+    names = [card.name for card in CardList.cardList]
+    states = [OnitamaState(seed=seed) for seed in range(20)]
+    assert [card.name for card in CardList.cardList] == names
+    assert all(len({card.name for card in state.bluePlayerCards + state.redPlayerCards + [state.neutralCard]}) == 5
+               for state in states)
+
+
+def testMovesMatchBitboardManager():
+    rng = random.Random(0)
+    state = OnitamaState(seed=1)
+    for _ in range(40):
+        if state.isEnd():
+            break
+        player = state.currentPlayer
+        bm = state.bm
+        expected = set()
+        for card in (state.bluePlayerCards if player == 'B' else state.redPlayerCards):
+            movements = card.movements if player == 'R' else bm.flipMovements(card.movements)
+            for piece in (player, player.lower()):
+                for move in bm.generateEncodedMoves(piece, movements):
+                    _, fromI, fromJ, toI, toJ, _ = bm.decodeMove(move)
+                    expected.add((CardList.cardList.index(card), fromI * 5 + fromJ, toI * 5 + toJ))
+        moves = state.getAllPossibleMoves()
+        assert set(moves) == expected or (not expected and all(move[1] is None for move in moves))
+        state = state.applyMove(rng.choice(moves))
+
+
+def testCardExchangeAndHash():
+    state = OnitamaState(cardIndices=[0, 1, 2, OX, CRAB])
+    assert [card.name for card in state.bluePlayerCards] == ['Dragon', 'Ox']
+    assert state.neutralCard.name == 'Crab' and state.currentPlayer == 'B'
+
+    move = next(move for move in state.getAllPossibleMoves() if move[0] == OX)
+    child = state.applyMove(move)
+    assert [card.name for card in child.bluePlayerCards] == ['Dragon', 'Crab'] and child.neutralCard.name == 'Ox'
+    assert child.currentPlayer == 'R' and child.parent_hash == state.hash()
+
+    # same board and side to move, other cards
+    other = OnitamaState(isInitialState=False, rules=state.rules,
+                         stateInformation=(0, None, 'B', state.position, state.rules.afterCardUse[state.cards][OX]))
+    assert other.hash() != state.hash() and other.key() != state.key()
+    assert len(state.rules.distributions) == 30
+    assert OnitamaRules.get([CRAB, OX, 2, 1, 0]) is state.rules
+
+
+def testTempleWin():
+    state = OnitamaState(cardIndices=[0, 1, 2, OX, CRAB])
+    rules = state.rules
+    # blue master one step from the red temple, blue Ox moves it forward
+    position = rules.pack(1 << 17, 0, 1 << 0, 0)
+    state = OnitamaState(isInitialState=False, rules=rules, stateInformation=(0, None, 'B', position, state.cards))
+    assert state.value() is None
+    assert depthLimitedAlphaBeta(state, 1, lambda state: 0) == float('inf')
+    assert any(child.value() == float('inf') for child in state.getAllPossibleNextStates())
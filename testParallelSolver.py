@@ -0,0 +1,41 @@
+from ParallelSolver import solveAlphaBeta, solveParallel, compareWithSerial, EXACT
+from PawnRules import PawnRules
+from PerfectIndex import WIN, LOSS
+from Retrograde import solveRetrograde
+from TranspositionTable import TranspositionTable
+from example.Hexapawn import HexapawnState
+
+
+def testAlphaBetaMatchesTablebase():
+    for sizeI, sizeJ in ((3, 3), (4, 3), (3, 4)):
+        root = HexapawnState(sizeI, sizeJ)
+        tablebase = solveRetrograde(PawnRules.hexapawn(sizeI, sizeJ), sizeJ, sizeJ)
+        expected = {WIN: float('inf'), LOSS: float('-inf')}[tablebase.result(*root.rules.unpack(root.position), True)]
+        value, stats = solveAlphaBeta(root)
+        assert value == expected
+        assert stats.nodes > 0
+
+
+def testAlphaBetaReusesTable():
+    transpositionTable = TranspositionTable("memory")
+    value, firstStats = solveAlphaBeta(HexapawnState(4, 3), transpositionTable)
+    entry = transpositionTable.retrieve(HexapawnState(4, 3).hash())
+    assert entry[0] == value and entry[6] == EXACT
+
+    again, secondStats = solveAlphaBeta(HexapawnState(4, 3), transpositionTable)
+    assert again == value
+    assert secondStats.nodes == 1 and secondStats.ttHits == 1
+
+
+def testParallelMatchesSerial():
+    root = HexapawnState(4, 4)
+    serialValue, _ = solveAlphaBeta(root.copy())
+    sharedTable = TranspositionTable("shared")
+    parallelValue, stats = solveParallel(root, processes=2, sharedTable=sharedTable)
+    assert parallelValue == serialValue
+    assert sharedTable.retrieve(root.hash())[0] == serialValue
+    assert stats.nodes > 0
+
+    report = compareWithSerial(HexapawnState(3, 3), processes=2)
+    assert report['value'] == report['parallelValue'] == float('-inf')
+    assert report['speedup'] > 0 and report['searchOverhead'] >= -1
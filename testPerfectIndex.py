@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from PerfectIndex import PawnPositionIndex, ResultDatabase, WIN, LOSS, DRAW, UNKNOWN
+from bitboard import BitboardManager
+
+
+def testRankIsABijection():
+    index = PawnPositionIndex(3, 3, 3, 3)
+    seen = set()
+    for position in range(index.size):
+        firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn = index.unrank(position)
+        assert firstPlayerBoard & secondPlayerBoard == 0
+        assert bin(firstPlayerBoard).count('1') <= 3 and bin(secondPlayerBoard).count('1') <= 3
+        assert index.rank(firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn) == position
+        seen.add((firstPlayerBoard, secondPlayerBoard, isFirstPlayerTurn))
+    assert len(seen) == index.size
+
+
+def testRankLargeBoard():
+    index = PawnPositionIndex(7, 5)
+    rng = random.Random(0)
+    for _ in range(200):
+        squares = rng.sample(range(35), rng.randint(0, 20))
+        first = sum(1 << square for square in squares[:len(squares) // 2])
+        second = sum(1 << square for square in squares[len(squares) // 2:])
+        turn = rng.random() < 0.5
+        assert index.unrank(index.rank(first, second, turn)) == (first, second, turn)
+
+
+def testRankManager():
+    bm = BitboardManager()
+    bm.buildBitboard('1', 4, 3)
+    bm.buildBitboard('2', 4, 3)
+    bm.setAllBitsAtRow('1', 3)
+    bm.setAllBitsAtRow('2', 0)
+    index = PawnPositionIndex(4, 3)
+    position = index.rankManager(bm, True)
+
+    other = BitboardManager()
+    other.buildBitboard('1', 4, 3)
+    other.buildBitboard('2', 4, 3)
+    assert index.unrankToManager(position, other) is True
+    assert other.getPosition() == bm.getPosition()
+
+    with pytest.raises(ValueError):
+        index.rank(1, 1, True)
+
+
+def testResultDatabase(tmp_path):
+    path = tmp_path / "results.db"
+    database = ResultDatabase(path, 10)
+    for position, result in enumerate([WIN, LOSS, DRAW, UNKNOWN, LOSS, WIN]):
+        database[position] = result
+    database[1] = WIN
+    database.close()
+
+    reopened = ResultDatabase(path)
+    assert [reopened[position] for position in range(10)] == [WIN, WIN, DRAW, UNKNOWN, LOSS, WIN, 0, 0, 0, 0]
+    assert reopened.counts() == {'unknown': 5, 'win': 3, 'loss': 1, 'draw': 1}
+    assert path.stat().st_size == ResultDatabase.HEADER.size + 3
+    for outside in (-64, -1, 10, 11):
+        with pytest.raises(IndexError):
+            reopened[outside] = WIN
+        with pytest.raises(IndexError):
+            reopened[outside]
+    reopened.close()
+    # the header was left alone
+    database = ResultDatabase(path)
+    assert len(database) == 10
+    database.close()
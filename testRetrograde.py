@@ -0,0 +1,87 @@
+import random
+
+from PawnRevolt import Game
+from PawnRules import PawnRules
+from PerfectIndex import ResultDatabase, WIN, LOSS
+from Retrograde import solveRetrograde
+from example.Hexapawn import HexapawnState
+
+
+def _forwardResult(state, memo):
+    # negamax over HexapawnState, WIN / LOSS for the side to move
+    key = state.hash()
+    if key not in memo:
+        value = state.value()
+        if value is not None:
+            firstPlayerWins = value == float('inf')
+            memo[key] = WIN if firstPlayerWins == state.isFirstPlayerTurn() else LOSS
+        else:
+            childResults = [_forwardResult(child, memo) for child in state.getAllPossibleNextStates()]
+            memo[key] = WIN if LOSS in childResults else LOSS
+    return memo[key]
+
+
+def testHexapawnMatchesForwardSearch():
+    tablebase = solveRetrograde(PawnRules.hexapawn(3, 3))
+    root = HexapawnState(3, 3)
+    first, second = root.rules.unpack(root.position)
+    assert tablebase.result(first, second, True) == LOSS
+    assert tablebase.counts()['unknown'] == 0
+
+    memo = {}
+    queue, seen = [root], {root.hash()}
+    while queue:
+        state = queue.pop()
+        first, second = state.rules.unpack(state.position)
+        assert tablebase.result(first, second, state.isFirstPlayerTurn()) == _forwardResult(state, memo)
+        for child in state.getAllPossibleNextStates() if not state.isEnd() else []:
+            if child.hash() not in seen:
+                seen.add(child.hash())
+                queue.append(child)
+
+
+def testBestChildrenFollowDepth():
+    rules = PawnRules.hexapawn(3, 3)
+    tablebase = solveRetrograde(rules)
+    first, second = rules.initialPosition()
+    isFirstPlayerTurn = True
+    depth = tablebase.depth(first, second, isFirstPlayerTurn)
+    # best play from both sides ends the game in exactly depth moves
+    for _ in range(depth):
+        first, second = tablebase.bestChildren(first, second, isFirstPlayerTurn)[0]
+        isFirstPlayerTurn = not isFirstPlayerTurn
+    assert rules.result(first, second, isFirstPlayerTurn) == LOSS
+    assert tablebase.depth(first, second, isFirstPlayerTurn) == 0
+
+
+def testPawnRevoltChildrenMatchGame():
+    rules = PawnRules.pawnRevolt(4, 3)
+    game = Game(4, 3)
+    rng = random.Random(0)
+    for _ in range(200):
+        squares = rng.sample(range(12), rng.randint(2, 8))
+        first = sum(1 << square for square in squares[:len(squares) // 2])
+        second = sum(1 << square for square in squares[len(squares) // 2:])
+        isFirstPlayerTurn = rng.random() < 0.5
+        game.loadState((first, second, '1' if isFirstPlayerTurn else '2', None, '', None, None))
+        expected = sorted((state[0], state[1]) for state in game.getAllNextStates(isFirstPlayerTurn))
+        assert sorted(rules.children(first, second, isFirstPlayerTurn)) == expected
+
+        # every child lists the position among its predecessors unless the position is already over
+        if rules.terminalResult(first, second, isFirstPlayerTurn) is None:
+            for child in expected:
+                assert (first, second) in rules.predecessors(*child, not isFirstPlayerTurn)
+
+
+def testParallelSweepWithPieceLimit(tmp_path):
+    rules = PawnRules.pawnRevolt(4, 3)
+    serial = solveRetrograde(rules, 2, 2)
+    parallel = solveRetrograde(rules, 2, 2, processes=2, chunkSize=256)
+    assert parallel.results == serial.results and parallel.depths == serial.depths
+    # pawns only move forward, so no game is drawn
+    assert serial.counts()['draw'] == 0
+
+    serial.save(tmp_path / "pawnrevolt.db")
+    database = ResultDatabase(tmp_path / "pawnrevolt.db")
+    assert all(database[position] == result for position, result in enumerate(serial.results))
+    database.close()
@@ -0,0 +1,54 @@
+import Solver
+from IntegerGame import hexapawnGame, pawnRevoltGame
+from PerfectIndex import WIN
+from RuleCompiler import compileRules, RuleSpec, PieceRule, FIRST_PLAYER, SECOND_PLAYER
+from TranspositionTable import TranspositionTable
+
+
+def testHexapawnMatchesPawnRules():
+    for sizeI, sizeJ in ((3, 3), (4, 4)):
+        compiled, game = compileRules(RuleSpec.hexapawn(sizeI, sizeJ)), hexapawnGame(sizeI, sizeJ)
+        # both use the same key layout
+        assert compiled.initialKey() == game.initialKey()
+        pending, seen = [game.initialKey()], set()
+        while pending:
+            key = pending.pop()
+            assert compiled.value(key) == game.value(key)
+            if game.terminal(key):
+                continue
+            children = game.children(key)
+            assert sorted(compiled.children(key)) == sorted(children)
+            assert compiled.moveCount(key) == len(children)
+            for child in children:
+                if child not in seen:
+                    seen.add(child)
+                    pending.append(child)
+
+
+def testSolvePawnRevolt():
+    compiled = compileRules(RuleSpec.pawnRevolt(4, 3))
+    assert Solver.solveIntegers(compiled, TranspositionTable("memory")) \
+        == Solver.solveIntegers(pawnRevoltGame(4, 3), TranspositionTable("memory"))
+
+
+def testPromotionAndCaptureOnly():
+    king = [(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1) if (i, j) != (0, 0)]
+    spec = RuleSpec(3, 3, [
+        PieceRule('P', FIRST_PLAYER, moveOffsets=[(-1, 0)], captureOffsets=[(-1, -1)], promotion=(0, 'K')),
+        PieceRule('K', FIRST_PLAYER, offsets=king),
+        PieceRule('p', SECOND_PLAYER, moveOffsets=[(1, 0)]),
+    ])
+    compiled = compileRules(spec)
+    assert 'p0 & 0x1f8' in compiled.source
+
+    # white pawn on (1, 1), black pawns on (0, 0) and (0, 1): the pawn is blocked ahead and captures on (0, 0)
+    key = compiled.pack((1 << 4, 0, 0b11), True)
+    children = [compiled.unpack(child) for child in compiled.children(key)]
+    assert children == [((0, 1 << 0, 0b10), False)]
+
+    # on an empty row ahead the pawn promotes, and the king then moves to any neighbor
+    key = compiled.pack((1 << 4, 0, 1 << 8), True)
+    (child,) = compiled.children(key)
+    assert compiled.unpack(child) == ((0, 1 << 1, 1 << 8), False)
+    assert compiled.moveCount(compiled.pack((0, 1 << 4, 1 << 0), True)) == 8
+    assert compiled.result(compiled.pack((1 << 4, 0, 0), True)) == WIN
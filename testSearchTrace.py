@@ -0,0 +1,52 @@
+import pytest
+
+import Solver
+from SearchTrace import TraceRecorder, readTrace, summarizeTrace, RECORD, HEADER, TT_STORE
+from TranspositionTable import TranspositionTable
+from example.Hexapawn import HexapawnState
+
+
+def testFullTraceMatchesSolve(tmp_path):
+    path = tmp_path / "solve.trace"
+    transpositionTable = TranspositionTable("memory")
+    with TraceRecorder(path, flushBytes=256) as trace:
+        Solver.solve(HexapawnState(4, 3), transpositionTable=transpositionTable, trace=trace)
+    assert path.stat().st_size == HEADER.size + trace.records * RECORD.size
+
+    summary = summarizeTrace(path)
+    events = summary['events']
+    assert events['ttStore'] == len(transpositionTable) == events['expand']
+    assert summary['storesPerDepth'][0] == 1
+    assert sum(summary['storesPerDepth'].values()) == len(transpositionTable)
+    assert summary['branchingFactor'] == events['child'] / events['expand']
+    assert 0 < summary['duplicateRate'] < 1
+
+    _, records = readTrace(path)
+    stored = {key for event, key, _, _, _ in records if event == TT_STORE}
+    assert stored == {key for key, _ in transpositionTable.items()}
+
+
+def testSamplingKeepsWholeStates(tmp_path):
+    with TraceRecorder(tmp_path / "full.trace") as trace:
+        Solver.solve(HexapawnState(4, 3), transpositionTable=TranspositionTable("memory"), trace=trace)
+    full = summarizeTrace(tmp_path / "full.trace")
+
+    path = tmp_path / "sampled.trace"
+    with TraceRecorder(path, sampleRate=0.25) as trace:
+        Solver.solve(HexapawnState(4, 3), transpositionTable=TranspositionTable("memory"), trace=trace)
+    sampled = summarizeTrace(path)
+    assert sampled['sampleRate'] == 0.25
+    assert 0 < sampled['events']['ttStore'] < full['events']['ttStore']
+
+    # a sampled state has all of its events, unsampled ones have none
+    _, records = readTrace(path)
+    assert all(trace.isSampled(key) for event, key, _, _, _ in records if event == TT_STORE)
+
+
+def testRejectsOtherFiles(tmp_path):
+    path = tmp_path / "other"
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        readTrace(path)
+    with pytest.raises(ValueError):
+        TraceRecorder(tmp_path / "trace", sampleRate=0)
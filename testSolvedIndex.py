@@ -0,0 +1,98 @@
+import json
+import threading
+import urllib.request
+
+from SolvedIndex import exportSolvedIndex, SolvedIndex, makeServer, VALUE_FIRST_PLAYER_WIN
+from TranspositionTable import TranspositionTable
+
+
+def buildTable():
+    table = TranspositionTable("memory")
+    table.store(2 ** 64 - 1, float('inf'), 3, True, None, True, 17)
+    table.store(5, float('-inf'), 1, False, 2 ** 64 - 1, False, None)
+    table.store(123456789, 0, 2, False, 5, True, 4)
+    table.store(42, None, 2, False, 5, True, None)
+    return table
+
+
+def testExportAndLookup(tmp_path):
+    path = tmp_path / "solved.idx"
+    assert exportSolvedIndex(buildTable(), path) == 4
+
+    index = SolvedIndex(path)
+    assert len(index) == 4
+    assert index.lookup(2 ** 64 - 1) == (float('inf'), 17)
+    assert index.lookup(5) == (float('-inf'), None)
+    assert index.lookup(123456789) == (0, 4)
+    assert index.lookup(42) == (None, None)
+    assert index.lookup(6) is None
+    assert index.lookup(-1) is None
+    assert 42 in index and 43 not in index
+    index.close()
+
+
+def testShelveTableExport(tmp_path):
+    table = TranspositionTable("shelve", str(tmp_path / "table.db"))
+    table.store(7, float('inf'), 0, True, None, True, 1)
+    exportSolvedIndex(table, tmp_path / "solved.idx")
+    table.close()
+
+    index = SolvedIndex(tmp_path / "solved.idx")
+    assert index.lookup(7) == (float('inf'), 1)
+    index.close()
+
+
+def testServerBatchQuery(tmp_path):
+    path = tmp_path / "solved.idx"
+    exportSolvedIndex(buildTable(), path)
+    index = SolvedIndex(path)
+    server = makeServer(index, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/lookup"
+        request = urllib.request.Request(url, data=json.dumps([2 ** 64 - 1, 6]).encode(), method='POST')
+        with urllib.request.urlopen(request) as response:
+            results = json.loads(response.read())
+        assert results[0] == {'key': 2 ** 64 - 1, 'found': True, 'value': VALUE_FIRST_PLAYER_WIN, 'bestMove': 17}
+        assert results[1] == {'key': 6, 'found': False}
+
+        with urllib.request.urlopen(url + "?key=5") as response:
+            assert json.loads(response.read())['bestMove'] is None
+    finally:
+        server.shutdown()
+        server.server_close()
+        index.close()
+
+
+def testWideKeys(tmp_path):
+    from PawnRevolt import Game
+
+    # nested szudzik pairs of the default 7x5 board do not fit in 64 bits
+    game = Game()
+    stateHash = game.stateHash()
+    assert stateHash.bit_length() > 64
+    table = buildTable()
+    table.store(stateHash, None, 0, False, None, True, None)
+    table.store(2 ** 64, float('-inf'), 0, True, None, True, 3)
+    assert exportSolvedIndex(table, tmp_path / "solved.idx") == 6
+
+    index = SolvedIndex(tmp_path / "solved.idx")
+    assert index.lookup(stateHash) == (None, None)
+    assert index.lookup(2 ** 64) == (float('-inf'), 3)
+    assert index.lookup(2 ** 64 - 1) == (float('inf'), 17)
+    assert index.lookup(stateHash + 1) is None
+    assert index.lookup(2 ** 1000) is None and 2 ** 1000 not in index
+    index.close()
+
+    # many keys sharing their high limb, found by the limb after it
+    table = TranspositionTable("memory")
+    keys = [high << 64 | low for high in (0, 1, 2 ** 40) for low in range(0, 300, 3)]
+    for key in keys:
+        table.store(key, 0, 0, False, None, True, key % 1000)
+    exportSolvedIndex(table, tmp_path / "many.idx")
+    index = SolvedIndex(tmp_path / "many.idx")
+    assert [index.lookup(key) for key in keys] == [(0, key % 1000) for key in keys]
+    assert not any(key + 1 in index for key in keys)
+    assert (2 ** 40 + 1) << 64 not in index
+    index.close()
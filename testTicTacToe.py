@@ -0,0 +1,27 @@
+import Solver
+from ParallelSolver import solveAlphaBeta
+from TranspositionTable import TranspositionTable
+from example.TicTacToe import TicTacToeState
+
+
+def testSolveVisitsEveryState():
+    transpositionTable = TranspositionTable("memory")
+    Solver.solve(TicTacToeState(), transpositionTable=transpositionTable)
+    # 5478 reachable positions, 958 of them are over and are not stored
+    assert len(transpositionTable) == 4520
+
+
+def testTerminalValues():
+    state = TicTacToeState()
+    rules = state.rules
+    xWins = TicTacToeState(isInitialState=False, stateInformation=(5, None, 'O', rules.pack(0b000000111, 0b000011000)))
+    assert xWins.isEnd() and xWins.value() == float('inf')
+    # X O X / X O O / O X X
+    draw = TicTacToeState(isInitialState=False, stateInformation=(9, None, 'O', rules.pack(0b110001101, 0b001110010)))
+    assert draw.isEnd() and draw.value() == 0
+    assert len(state.getAllPossibleNextStates()) == 9 and not state.isEnd()
+
+
+def testSolvedValues():
+    assert solveAlphaBeta(TicTacToeState())[0] == 0
+    assert solveAlphaBeta(TicTacToeState(3, 4, 3))[0] == float('inf')
@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+import Solver
+from BloomFilter import BloomFilter
+from TranspositionTable import TranspositionTable, LRUTable, CompactTable
+from example.Hexapawn import HexapawnState
+
+
+def testLRUEvictsLeastRecentlyUsed():
+    backing = {}
+    table = LRUTable(backing, maxBytes=None, maxEntries=2)
+    table[1] = 'a'
+    table[2] = 'b'
+    assert 1 in table
+    table[3] = 'c'
+
+    assert list(table.entries) == [1, 3]
+    assert backing == {2: 'b'}
+    assert table.evictions == 1 and table.writeBacks == 1
+
+
+def testLRUPromotesColdEntries():
+    backing = {1: 'a'}
+    table = LRUTable(backing, maxBytes=None, maxEntries=2)
+    assert table[1] == 'a'
+    assert 1 in table
+    assert 4 not in table
+    assert table.stats()['hits'] == 1
+    assert table.stats()['misses'] == 2
+
+    # clean entries are not written back
+    table[2] = 'b'
+    table[3] = 'c'
+    assert table.evictions == 1 and table.writeBacks == 0
+
+
+def testLRUMemoryCap():
+    table = LRUTable(maxBytes=2000)
+    for key in range(1000):
+        table[key] = (None, key, False, None, True, None)
+    assert table.bytes <= 2000
+    assert 0 < len(table) < 1000
+    assert 999 in table and 0 not in table
+
+
+def testTieredShelveTable(tmp_path):
+    name = str(tmp_path / "table.db")
+    transpositionTable = TranspositionTable("shelve", name, cacheBytes=4000)
+    for key in range(100):
+        transpositionTable.store(key, None, key, False, None, True, None)
+    assert transpositionTable.cacheStats()['evictions'] > 0
+    assert transpositionTable.retrieve(0)[1] == 0
+    assert transpositionTable.retrieve(99)[1] == 99
+    transpositionTable.close()
+
+    reopened = TranspositionTable("shelve", name)
+    assert len(reopened) == 100
+    assert reopened.retrieve(50)[1] == 50
+    reopened.close()
+
+
+def testBloomFilterFalsePositiveRate():
+    bloomFilter = BloomFilter(10000, 0.01)
+    for key in range(0, 20000, 2):
+        bloomFilter.add(key)
+    assert all(key in bloomFilter for key in range(0, 20000, 2))
+    falsePositives = sum(key in bloomFilter for key in range(1, 200000, 2))
+    assert falsePositives / 100000 < 0.02
+
+
+def testPrefilterSkipsBackendOnDefiniteMiss(tmp_path):
+    name = str(tmp_path / "table.db")
+    transpositionTable = TranspositionTable("shelve", name, expectedStates=1000)
+    for key in range(500):
+        transpositionTable.store(key * 7919, None, 0, False, None, True, None)
+    assert all(transpositionTable.contains(key * 7919) for key in range(500))
+    assert not any(transpositionTable.contains(key * 7919 + 1) for key in range(500))
+
+    stats = transpositionTable.prefilterStats()
+    assert stats['queries'] == 1000
+    assert stats['negatives'] + stats['falsePositives'] == 500
+    assert stats['measuredFalsePositiveRate'] < 0.05
+    transpositionTable.close()
+
+    # states stored by an earlier run are loaded into the filter
+    reopened = TranspositionTable("shelve", name, expectedStates=1000)
+    assert reopened.retrieve(7919) is not None
+    reopened.close()
+
+
+def testCompactEntriesRoundTrip():
+    transpositionTable = TranspositionTable("compact")
+    rng = random.Random(3)
+    expected = {}
+    for _ in range(5000):
+        key = rng.getrandbits(64)
+        entry = (rng.choice(CompactTable.VALUES), rng.choice([None, rng.randrange(1000)]), rng.random() < 0.5, None,
+                 rng.random() < 0.5, rng.choice([None, rng.randrange(0xFFFF)]), *rng.choice([(), (rng.randrange(4),)]))
+        transpositionTable.store(key, *entry)
+        expected[key] = entry
+    assert len(transpositionTable) == len(expected)
+    assert all(transpositionTable.retrieve(key) == entry for key, entry in expected.items())
+    assert dict(transpositionTable.items()) == expected
+    # parent hashes are not kept
+    transpositionTable.store(1, 0, 2, False, 12345, True, None)
+    assert transpositionTable.retrieve(1) == (0, 2, False, None, True, None)
+    with pytest.raises(ValueError):
+        transpositionTable.store(2, 0.5, 0, False, None, True, None)
+
+
+def testCompactKeyWidth():
+    narrow = TranspositionTable("compact-32")
+    narrow.store(5, float('inf'), 1, True, None, True, None)
+    # only the low 32 bits identify an entry
+    assert narrow.contains(5 | 1 << 40)
+    wide = TranspositionTable("compact-128")
+    wide.store(5 | 1 << 100, float('inf'), 1, True, None, True, None)
+    assert not wide.contains(5) and wide.contains(5 | 1 << 100)
+
+
+def testCompactSolveMatchesMemory():
+    memory = TranspositionTable("memory")
+    compact = TranspositionTable("compact")
+    Solver.solve(HexapawnState(4, 3), transpositionTable=memory)
+    Solver.solve(HexapawnState(4, 3), transpositionTable=compact)
+    assert len(compact) == len(memory)
+    for key, (value, depth, isEnd, _, isFirstPlayerTurn, _) in memory.items():
+        assert compact.retrieve(key)[:3] == (value, depth, isEnd) and compact.retrieve(key)[4] == isFirstPlayerTurn
+
+
+def testBestMoveHoldsEncodedMove():
+    from PawnRevolt import Game
+    game = Game(4, 3)
+    move, _ = game.bestMove(2)
+    compact = TranspositionTable("compact")
+    compact.store(game.stateHash(), None, 0, False, None, True, move)
+    assert compact.retrieve(game.stateHash())[5] == move
+    game.make_move(move)
+    assert game.current_player == '2'
@@ -0,0 +1,117 @@
+import multiprocessing
+import random
+
+import pytest
+
+from WireFormat import encodePositions, WireBatch, toSharedMemory, HEADER
+from bitboard import BitboardManager
+
+
+def buildManager(sizeI=7, sizeJ=5):
+    bm = BitboardManager(sizeI, sizeJ, useZobrist=True, zobristSeed=3)
+    bm.buildBitboard('1')
+    bm.buildBitboard('2')
+    return bm
+
+
+def randomPositions(bm, count, seed=0):
+    rng = random.Random(seed)
+    squareCount = bm.sizeI * bm.sizeJ
+    return [(rng.getrandbits(squareCount), rng.getrandbits(squareCount)) for _ in range(count)]
+
+
+def testRoundTrip():
+    bm = buildManager()
+    positions = randomPositions(bm, 50)
+    batch = WireBatch(encodePositions(bm, positions, extras=[(k, 2 ** 64 - 1 - k) for k in range(50)]))
+    assert len(batch) == 50
+    assert batch.pieceIds == ['1', '2']
+    assert list(batch.positions()) == positions
+    assert batch.extra(7) == (7, 2 ** 64 - 8)
+
+    rebuilt = batch.manager()
+    assert rebuilt.zobristTable == bm.zobristTable
+    assert rebuilt.getPosition() == positions[0]
+    bm.setPosition(positions[0])
+    assert rebuilt.zobrist_hash() == bm.zobrist_hash()
+
+    # several limbs per bitboard, no zobrist table
+    large = BitboardManager(9, 9)
+    large.buildBitboard('a')
+    large.buildBitboard('b')
+    positions = randomPositions(large, 20)
+    batch = WireBatch(encodePositions(large, positions, includeZobrist=False))
+    assert batch.zobristTable() is None
+    assert list(batch.positions()) == positions
+
+    with pytest.raises(ValueError):
+        WireBatch(bytes(HEADER.size))
+
+
+def testSidesKept():
+    # Onitama style sides: a master and its students cannot capture each other
+    bm = BitboardManager(5, 5)
+    for piece in 'BbRr':
+        bm.buildBitboard(piece, side=piece.upper())
+    bm.setPiece('B', 0, 0)
+    bm.setPiece('b', 0, 1)
+    bm.setPiece('r', 1, 0)
+
+    batch = WireBatch(encodePositions(bm, [bm.getPosition()], includeZobrist=False))
+    assert batch.sides == ['B', 'B', 'R', 'R']
+    rebuilt = batch.manager()
+    assert rebuilt.sides == bm.sides
+    assert not rebuilt.isLegalMove(0, 0, 0, 1, 'B')
+    assert rebuilt.isLegalMove(0, 0, 1, 0, 'B')
+
+
+def testZobristSentOnce():
+    bm = buildManager()
+    one = encodePositions(bm, randomPositions(bm, 1))
+    many = encodePositions(bm, randomPositions(bm, 101))
+    recordBytes = 2 * 8
+    assert len(many) - len(one) == 100 * recordBytes
+    assert len(one) - len(encodePositions(bm, randomPositions(bm, 1), includeZobrist=False)) == 2 * 35 * 8
+
+
+def testNumpyView():
+    np = pytest.importorskip("numpy")
+    from bitboardBatch import wordsToPositions
+
+    bm = buildManager(9, 9)
+    positions = randomPositions(bm, 30)
+    buffer = encodePositions(bm, positions, extras=[(k,) for k in range(30)])
+    words = WireBatch(buffer).words()
+    assert words.shape == (30, 2, 2)
+    assert np.shares_memory(words, np.frombuffer(buffer, dtype=np.uint8))
+    assert wordsToPositions(words) == positions
+
+
+def _readShared(name, queue):
+    from multiprocessing import shared_memory
+    sharedMemory = shared_memory.SharedMemory(name=name)
+    batch = WireBatch(sharedMemory.buf)
+    queue.send((list(batch.positions()), batch.zobristTable() is not None))
+    batch.release()
+    sharedMemory.close()
+
+
+def testTransport():
+    bm = buildManager()
+    positions = randomPositions(bm, 40)
+    buffer = encodePositions(bm, positions)
+
+    receiving, sending = multiprocessing.Pipe(duplex=False)
+    sending.send_bytes(buffer)
+    assert list(WireBatch(receiving.recv_bytes()).positions()) == positions
+
+    sharedMemory = toSharedMemory(buffer)
+    try:
+        receiving, sending = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_readShared, args=(sharedMemory.name, sending))
+        process.start()
+        assert receiving.recv() == (positions, True)
+        process.join()
+    finally:
+        sharedMemory.close()
+        sharedMemory.unlink()